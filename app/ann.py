@@ -0,0 +1,309 @@
+# app/ann.py
+"""
+Video embeddings + an IVF (inverted file) approximate nearest-neighbour index.
+
+Embeddings come from interactions (truncated SVD of the user x video matrix)
+or from the Pixabay tag string stored in Video.title (signed feature hashing).
+All vectors are L2-normalised, so inner product == cosine similarity.
+
+The index is a directory of plain .npy files. Vectors are stored sorted by
+their inverted list, so probing a list is one contiguous slice, and every
+file is opened with mmap_mode="r": all API workers share the same page cache.
+
+Every build goes into a fresh directory under ANN_INDEX_DIR and the CURRENT
+file is swapped with os.replace, as in app/coview.py: files a worker has
+mapped are never rewritten in place. Workers pick up a new build within
+ANN_RELOAD_INTERVAL seconds.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import svds
+from sqlmodel import Session, select
+
+from .config import ANN_INDEX_DIR, ANN_RELOAD_INTERVAL
+from .models import Video
+
+ANN_KEEP_BUILDS = 2   # the live build and the previous one (a worker may still be loading it)
+DEFAULT_DIM = 64
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+# ======================
+# Embeddings
+# ======================
+
+def normalize(X: np.ndarray) -> np.ndarray:
+    X = np.asarray(X, dtype=np.float32)
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    return np.divide(X, norms, out=np.zeros_like(X), where=norms > 0)
+
+
+def interaction_embeddings(R: sp.csr_matrix, dim: int = DEFAULT_DIM) -> np.ndarray:
+    """
+    Matrix factorisation R ~ U s V^T; video vectors are V * sqrt(s).
+    Row i of the result belongs to column i of R.
+    """
+    R = R.astype(np.float32)
+    if min(R.shape) == 0:
+        return np.zeros((R.shape[1], 1), dtype=np.float32)
+    if dim < min(R.shape) - 1:
+        _, s, vt = svds(R, k=dim)
+    else:
+        # svds needs k < min(R.shape); a matrix this thin is cheap to decompose densely
+        _, s, vt = np.linalg.svd(R.toarray(), full_matrices=False)
+        s, vt = s[:dim], vt[:dim]
+    return normalize(vt.T * np.sqrt(s))
+
+
+def text_embeddings(titles: Iterable[str], dim: int = DEFAULT_DIM) -> np.ndarray:
+    """Signed hashing of tag tokens ("sea, waves, ocean") into `dim` buckets."""
+    rows, cols, vals = [], [], []
+    n = 0
+    for i, title in enumerate(titles):
+        n = i + 1
+        for tok in _TOKEN.findall((title or "").lower()):
+            h = zlib.crc32(tok.encode())
+            rows.append(i)
+            cols.append(h % dim)
+            vals.append(1.0 if (h >> 31) & 1 else -1.0)
+    X = sp.csr_matrix((vals, (rows, cols)), shape=(n, dim), dtype=np.float32)
+    return normalize(X.toarray())
+
+
+# ======================
+# IVF index
+# ======================
+
+def _assign(X: np.ndarray, centroids: np.ndarray, chunk: int = 65_536) -> np.ndarray:
+    out = np.empty(len(X), dtype=np.int32)
+    for start in range(0, len(X), chunk):
+        out[start:start + chunk] = np.argmax(X[start:start + chunk] @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(X: np.ndarray, n_lists: int, iters: int = 20,
+                    sample: int = 100_000, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a random sample of X."""
+    rng = np.random.default_rng(seed)
+    if len(X) > sample:
+        X = X[rng.choice(len(X), sample, replace=False)]
+    n_lists = min(n_lists, len(X))
+    centroids = X[rng.choice(len(X), n_lists, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(X, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, X)
+        counts = np.bincount(labels, minlength=n_lists)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = X[rng.choice(len(X), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def _current_version(root: Path) -> Optional[str]:
+    try:
+        return (root / "CURRENT").read_text().strip() or None
+    except OSError:
+        return None
+
+
+def _publish(root: Path, version: str) -> None:
+    """Point CURRENT at a finished build, then drop all but the newest ANN_KEEP_BUILDS."""
+    tmp = root / "CURRENT.tmp"
+    tmp.write_text(version)
+    os.replace(tmp, root / "CURRENT")
+    builds = sorted((p for p in root.iterdir() if p.is_dir() and p.name.isdigit()), key=lambda p: int(p.name))
+    for old in builds[:-ANN_KEEP_BUILDS]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+class IVFIndex:
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray,
+                 vectors: np.ndarray, ids: np.ndarray, version: str = ""):
+        self.centroids = centroids     # (n_lists, dim)
+        self.offsets = offsets         # (n_lists + 1,) list l = rows offsets[l]:offsets[l+1]
+        self.vectors = vectors         # (n, dim) float32, sorted by list
+        self.ids = ids                 # (n,) Video.id, same order as vectors
+        self.version = version         # build directory name; "" when in memory or unversioned
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, ids: np.ndarray, n_lists: Optional[int] = None,
+              path: Optional[Path] = None, iters: int = 20) -> "IVFIndex":
+        """
+        Train centroids and bucket vectors. With `path` (the index root), the
+        sorted vectors are written straight into a memory-mapped file in a new
+        build directory, CURRENT is switched to it, and the returned index
+        reads from it (the same pages load() later maps).
+        """
+        vectors = normalize(vectors)
+        ids = np.asarray(ids, dtype=np.int64)
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        centroids = train_centroids(vectors, n_lists, iters=iters)
+        labels = _assign(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(labels, minlength=len(centroids)))
+
+        if path is None:
+            return cls(centroids, offsets, vectors[order], ids[order])
+
+        root = Path(path)
+        version = f"{time.time_ns()}"
+        build_dir = root / version
+        build_dir.mkdir(parents=True)
+        mm = np.lib.format.open_memmap(
+            build_dir / "vectors.npy", mode="w+", dtype=np.float32, shape=vectors.shape
+        )
+        chunk = 65_536
+        for start in range(0, len(order), chunk):
+            mm[start:start + chunk] = vectors[order[start:start + chunk]]
+        mm.flush()
+        del mm
+        np.save(build_dir / "ids.npy", ids[order])
+        np.save(build_dir / "centroids.npy", centroids)
+        np.save(build_dir / "offsets.npy", offsets)
+        _publish(root, version)
+        return cls.load(root, version)
+
+    def save(self, root: Path = ANN_INDEX_DIR) -> str:
+        """Write a new build directory, then point CURRENT at it."""
+        root = Path(root)
+        version = f"{time.time_ns()}"
+        build_dir = root / version
+        build_dir.mkdir(parents=True)
+        for name in ("vectors", "ids", "centroids", "offsets"):
+            np.save(build_dir / f"{name}.npy", np.asarray(getattr(self, name)))
+        _publish(root, version)
+        self.version = version
+        return version
+
+    @classmethod
+    def load(cls, root: Path, version: Optional[str] = None) -> "IVFIndex":
+        """Map a build: `version`, else the one CURRENT names, else files directly in `root`."""
+        root = Path(root)
+        version = version or _current_version(root) or ""
+        build_dir = root / version if version else root
+        return cls(
+            centroids=np.load(build_dir / "centroids.npy"),
+            offsets=np.load(build_dir / "offsets.npy"),
+            vectors=np.load(build_dir / "vectors.npy", mmap_mode="r"),
+            ids=np.load(build_dir / "ids.npy", mmap_mode="r"),
+            version=version,
+        )
+
+    def search(self, query: np.ndarray, k: int = 20, nprobe: int = 8,
+               exclude: Optional[Iterable[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (video_ids, scores) of the approximate top-k by cosine."""
+        q = normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        nprobe = min(nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+
+        slices = [(self.offsets[l], self.offsets[l + 1]) for l in lists]
+        rows = np.concatenate([np.arange(a, b) for a, b in slices])
+        if rows.size == 0:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+        scores = np.concatenate([self.vectors[a:b] @ q for a, b in slices])
+        if exclude is not None:
+            scores[np.isin(self.ids[rows], np.fromiter(exclude, dtype=np.int64))] = -np.inf
+
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top = top[np.isfinite(scores[top])]
+        return np.asarray(self.ids[rows[top]]), scores[top]
+
+    def vector_for(self, video_ids: List[int]) -> np.ndarray:
+        """Stored vectors for the given ids (unknown ids are skipped)."""
+        pos = np.flatnonzero(np.isin(self.ids, np.asarray(video_ids, dtype=np.int64)))
+        return np.asarray(self.vectors[pos])
+
+
+def brute_force(vectors: np.ndarray, ids: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k ids by cosine; the ground truth for recall@k."""
+    q = normalize(query.reshape(1, -1))[0]
+    scores = normalize(vectors) @ q
+    top = np.argpartition(-scores, k - 1)[:k]
+    return np.asarray(ids)[top[np.argsort(-scores[top])]]
+
+
+# ======================
+# Serving
+# ======================
+
+_index: Optional[IVFIndex] = None
+_index_root: Path = ANN_INDEX_DIR
+_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def load_index(path: Path = ANN_INDEX_DIR) -> Optional[IVFIndex]:
+    """Memory-map the live build if there is one (and remember `path` for reloads)."""
+    global _index, _index_root, _checked_at
+    root = Path(path)
+    with _index_lock:
+        _index_root, _checked_at = root, time.monotonic()
+        version = _current_version(root)
+        if version is None and not (root / "offsets.npy").exists():
+            return _index
+        if _index is None or _index.version != (version or ""):
+            _index = IVFIndex.load(root, version)
+        return _index
+
+
+def get_index() -> Optional[IVFIndex]:
+    """The mapped index; CURRENT is re-read at most every ANN_RELOAD_INTERVAL seconds."""
+    if time.monotonic() - _checked_at >= ANN_RELOAD_INTERVAL:
+        load_index(_index_root)
+    return _index
+
+
+def build_from_db(db: Session, source: str = "interactions", dim: int = DEFAULT_DIM,
+                  path: Path = ANN_INDEX_DIR) -> IVFIndex:
+    if source == "interactions":
+        from .recommender import build_user_item_matrix, load_interactions
+
+        R, _, video_ids = build_user_item_matrix(*load_interactions(db))
+        vectors = interaction_embeddings(R, dim)
+    else:
+        rows = db.exec(select(Video.id, Video.title).order_by(Video.id)).all()
+        video_ids = np.asarray([r[0] for r in rows], dtype=np.int64)
+        vectors = text_embeddings((r[1] for r in rows), dim)
+    return IVFIndex.build(vectors, video_ids, path=path)
+
+
+def main():
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Build the video embedding ANN index")
+    parser.add_argument("--out", default=str(ANN_INDEX_DIR))
+    parser.add_argument("--source", choices=("interactions", "text"), default="interactions")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    with Session(engine) as db:
+        index = build_from_db(db, args.source, args.dim, Path(args.out))
+    print(
+        f"Indexed {len(index)} videos into {len(index.centroids)} lists "
+        f"in {time.perf_counter() - t0:.2f}s -> {args.out}/{index.version}"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# app/async_crud.py
+"""
+`async def` mirrors of crud.py for the asyncpg engine.
+Statements are shared with crud.py so both paths stay identical.
+catalogue_changed() takes a file lock and updates the search index, so it
+runs in the threadpool, off the event loop.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .crud import (
+    BULK_CHUNK_SIZE,
+    as_rows,
+    catalogue_changed,
+    interactions_page_stmt,
+    video_upsert_rows,
+    video_upsert_stmt,
+    videos_page_stmt,
+)
+from .metrics import timed
+from .models import Video, Interaction, ActionEnum, VideoStats
+from .schemas import VideoCreate
+from .stats import video_stats_stmt
+
+
+# ======================
+# Videos
+# ======================
+
+@timed("crud")
+async def get_video_by_id(db: AsyncSession, video_id: int) -> Optional[Video]:
+    return await db.get(Video, video_id)
+
+@timed("crud")
+async def get_video_by_pixabay_id(db: AsyncSession, px_id: int) -> Optional[Video]:
+    stmt = select(Video).where(Video.pixabay_id == px_id)
+    return (await db.exec(stmt)).first()
+
+@timed("crud")
+async def get_videos_by_ids(db: AsyncSession, ids: List[int]) -> List[Video]:
+    if not ids:
+        return []
+    stmt = select(Video).where(Video.id.in_(ids))
+    by_id = {v.id: v for v in (await db.exec(stmt)).all()}
+    return [by_id[i] for i in ids if i in by_id]
+
+@timed("crud")
+async def get_video_stats(db: AsyncSession, ids: List[int]) -> Dict[int, VideoStats]:
+    if not ids:
+        return {}
+    return {s.video_id: s for s in (await db.exec(video_stats_stmt(ids))).all()}
+
+@timed("crud")
+async def list_videos(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 20,
+    after: Optional[Tuple[datetime, int]] = None,
+) -> List[dict]:
+    return as_rows(await db.exec(videos_page_stmt(skip, limit, after)))
+
+@timed("crud")
+async def create_or_update_video(db: AsyncSession, data: VideoCreate) -> Video:
+    existing = await get_video_by_pixabay_id(db, data.pixabay_id)
+    if existing:
+        existing.title = data.title
+        existing.description = data.description
+        existing.source_url = data.source_url
+        existing.thumb_url = data.thumb_url
+        db.add(existing)
+        await db.commit()
+        await db.refresh(existing)
+        await run_in_threadpool(catalogue_changed, upserted=[(existing.id, data.title, data.description)])
+        return existing
+
+    video = Video(
+        pixabay_id=data.pixabay_id,
+        title=data.title,
+        description=data.description,
+        source_url=data.source_url,
+        thumb_url=data.thumb_url,
+        uploaded_at=datetime.utcnow(),
+    )
+    db.add(video)
+    await db.commit()
+    await db.refresh(video)
+    await run_in_threadpool(catalogue_changed, upserted=[(video.id, data.title, data.description)])
+    return video
+
+@timed("crud")
+async def bulk_upsert_videos(
+    db: AsyncSession, items: List[VideoCreate], chunk_size: int = BULK_CHUNK_SIZE
+) -> List[int]:
+    rows = video_upsert_rows(items)
+    if not rows:
+        return []
+    id_by_px = {}
+    for start in range(0, len(rows), chunk_size):
+        stmt = video_upsert_stmt(db.sync_session, rows[start:start + chunk_size])
+        id_by_px.update({px: vid for vid, px in (await db.exec(stmt)).all()})
+    await db.commit()
+    docs = [(id_by_px[r["pixabay_id"]], r["title"], r["description"]) for r in rows]
+    await run_in_threadpool(catalogue_changed, upserted=docs)
+    return [id_by_px[item.pixabay_id] for item in items]
+
+@timed("crud")
+async def delete_video(db: AsyncSession, video_id: int) -> bool:
+    video = await db.get(Video, video_id)
+    if not video:
+        return False
+    # interactions.video_id is NOT NULL: without this the delete hits an IntegrityError
+    await db.exec(delete(Interaction).where(Interaction.video_id == video_id))
+    await db.exec(delete(VideoStats).where(VideoStats.video_id == video_id))
+    await db.delete(video)
+    await db.commit()
+    await run_in_threadpool(catalogue_changed, deleted=[video_id])
+    return True
+
+
+# ======================
+# Interactions
+# ======================
+
+@timed("crud")
+async def get_interactions_by_user(
+    db: AsyncSession,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 50,
+    after: Optional[Tuple[datetime, int]] = None,
+    actions: Optional[List[ActionEnum]] = None,
+) -> List[dict]:
+    stmt = interactions_page_stmt(Interaction.user_id == user_id, limit, after, actions)
+    if after is None:
+        stmt = stmt.offset(skip)
+    return as_rows(await db.exec(stmt))
+
+@timed("crud")
+async def list_interactions_by_video(
+    db: AsyncSession,
+    video_id: int,
+    limit: int = 50,
+    after: Optional[Tuple[datetime, int]] = None,
+    actions: Optional[List[ActionEnum]] = None,
+) -> List[dict]:
+    stmt = interactions_page_stmt(Interaction.video_id == video_id, limit, after, actions)
+    return as_rows(await db.exec(stmt))
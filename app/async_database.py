@@ -0,0 +1,33 @@
+# app/async_database.py
+"""
+Optional asyncio database layer (SQLAlchemy async engine on asyncpg).
+Enabled with RECONOVA_ASYNC_DB=1; the sync engine in database.py stays available.
+"""
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .config import ASYNC_DATABASE_URL, DATABASE_REPLICA_URL
+from .database import engine_options
+
+
+def make_async_engine(url: str, name: str = "async_primary"):
+    return create_async_engine(url, **engine_options(url, name, is_async=True))
+
+
+async_engine = make_async_engine(ASYNC_DATABASE_URL)
+async_read_engine = (
+    make_async_engine(DATABASE_REPLICA_URL.replace("+psycopg2", "+asyncpg"), "async_replica")
+    if DATABASE_REPLICA_URL else async_engine
+)
+
+
+async def get_async_session():
+    """Yield an AsyncSession bound to the async engine."""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_read_session():
+    """AsyncSession on the read replica (or the primary when none is configured)."""
+    async with AsyncSession(async_read_engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,57 @@
+# app/async_deps.py
+"""Async counterparts of deps.py for the async routers (same snapshot cache)."""
+from fastapi import Depends, HTTPException, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .models import User
+from .oauth2 import oauth2_scheme, decode_access_token
+from .async_database import get_async_session
+from .metrics import timed
+from .deps import (
+    CurrentUser, cached_user, credentials_exception, remember, user_from_claims, user_from_row,
+)
+
+@timed("auth")
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_async_session),
+) -> CurrentUser:
+    snapshot = cached_user(token)
+    if snapshot is not None:
+        return snapshot
+    payload = decode_access_token(token, credentials_exception())
+    snapshot = user_from_claims(payload)
+    if snapshot is None:
+        snapshot = user_from_row(await session.get(User, int(payload["user_id"])))
+    return remember(token, snapshot, payload)
+
+async def _confirm_admin(token: str, current: CurrentUser, session: AsyncSession) -> CurrentUser:
+    if not current.from_claims:
+        return current
+    payload = decode_access_token(token, credentials_exception())
+    return remember(token, user_from_row(await session.get(User, current.id)), payload)
+
+@timed("auth")
+async def require_admin(
+    token: str = Depends(oauth2_scheme),
+    current: CurrentUser = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    if current.is_admin:
+        current = await _confirm_admin(token, current, session)
+    if not current.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Admin only.")
+    return current
+
+@timed("auth")
+async def ensure_self_or_admin(
+    user_id: int,
+    token: str = Depends(oauth2_scheme),
+    current: CurrentUser = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    if current.id == user_id:
+        return current
+    if current.is_admin and (await _confirm_admin(token, current, session)).is_admin:
+        return current
+    raise HTTPException(403, "Not allowed")
@@ -0,0 +1,77 @@
+# app/cache.py
+"""
+Small in-process caches shared by the routers.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from .config import AUTH_CACHE_TTL, RECO_CACHE_TTL
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+    get/set/invalidate are O(1); clear() swaps the whole table at once.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at < self._clock():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Recommendation results: key = recommender.cache_key(user_id) -> List[VideoRead]
+recommendation_cache = LRUTTLCache(maxsize=50_000, ttl=RECO_CACHE_TTL)
+# user_id -> recommender.SeenVideos (liked/completed ids), kept current by recommender.record_feedback
+seen_cache = LRUTTLCache(maxsize=100_000, ttl=3600.0)
+# Bearer token -> deps.CurrentUser; entries never outlive the token's exp
+auth_cache = LRUTTLCache(maxsize=100_000, ttl=AUTH_CACHE_TTL)
+# Trending/popular rails: key = (rail, window, action, snapshot version) -> List[VideoRead]
+trending_cache = LRUTTLCache(maxsize=1_000, ttl=120.0)
+# Rendered /videos pages and video documents: key includes the catalogue version -> (etag, body)
+catalogue_cache = LRUTTLCache(maxsize=10_000, ttl=3600.0)
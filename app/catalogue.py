@@ -0,0 +1,152 @@
+# app/catalogue.py
+"""
+Catalogue version: ETags and the rendered-page cache for GET /videos[/{id}]
+and /videos/search.
+
+The catalogue only changes through crud's video upsert/bulk upsert/delete
+(admin endpoints and the Pixabay importer). Each of them calls
+catalogue.bump() after its commit, which increments a counter kept in
+CATALOGUE_VERSION_FILE under an flock. Every API worker preads that file
+(one syscall, descriptor kept open) per request, so:
+  * the version is the ETag; a matching If-None-Match gets a 304 before any
+    database work
+  * rendered pages are cached per version in catalogue_cache, and a version
+    change seen by any worker clears its cache, whichever process bumped it
+
+The file holds "<token> <counter>"; the random token is picked when the file
+is created, so a deleted file cannot bring back ETags clients already hold.
+"""
+from __future__ import annotations
+
+import fcntl
+import logging
+import os
+import secrets
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Hashable, Optional, Tuple
+
+from starlette.responses import Response
+
+from .cache import catalogue_cache
+from .config import CATALOGUE_VERSION_FILE
+from .media import etag_matches
+
+log = logging.getLogger(__name__)
+
+CACHE_CONTROL = "no-cache"   # clients revalidate every time; a 304 costs no query
+_WIDTH = 64                  # fixed-size record, rewritten in place with one pwrite
+
+
+def _parse(raw: bytes) -> Optional[Tuple[str, int]]:
+    try:
+        token, counter = raw.decode("ascii").split()
+        return token, int(counter)
+    except ValueError:
+        return None   # empty (new file) or caught mid-write
+
+
+def _format(token: str, counter: int) -> bytes:
+    return f"{token} {counter}".ljust(_WIDTH - 1).encode("ascii") + b"\n"
+
+
+class CatalogueVersion:
+    def __init__(self, path: Path = CATALOGUE_VERSION_FILE):
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+        self._unavailable = False
+        self._raw = b""
+        self._value = "0"
+        self._local = 0       # bumps that could not reach the file (unwritable path)
+        self._lock = threading.Lock()
+
+    def _open(self) -> Optional[int]:
+        if self._fd is None and not self._unavailable:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError:
+                log.exception("Catalogue version file %s unavailable; versions stay per-process", self.path)
+                self._unavailable = True
+        return self._fd
+
+    def _with_local(self, value: str) -> str:
+        return f"{value}+{self._local}" if self._local else value
+
+    def current(self) -> str:
+        fd = self._open()
+        raw = os.pread(fd, _WIDTH, 0) if fd is not None else self._raw
+        if raw != self._raw:
+            parsed = _parse(raw)
+            if parsed is not None:
+                with self._lock:
+                    self._raw = raw
+                    value = f"{parsed[0]}.{parsed[1]}"
+                    if value != self._value:
+                        self._value = value
+                        catalogue_cache.clear()
+        return self._with_local(self._value)
+
+    def bump(self) -> Tuple[str, str]:
+        """Next version; returns (before, after) exactly, even with concurrent bumps elsewhere."""
+        fd = self._open()
+        with self._lock:
+            if fd is None:
+                before = self._with_local(self._value)
+                self._local += 1
+                catalogue_cache.clear()
+                return before, self._with_local(self._value)
+            # the thread lock covers this process, flock the other ones
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                token, counter = _parse(os.pread(fd, _WIDTH, 0)) or (secrets.token_hex(4), 0)
+                os.pwrite(fd, _format(token, counter + 1), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        self.current()
+        return self._with_local(f"{token}.{counter}"), self._with_local(f"{token}.{counter + 1}")
+
+
+catalogue = CatalogueVersion()
+
+
+# ======================
+# Conditional GET + page cache
+# ======================
+
+@dataclass(frozen=True)
+class CachedPage:
+    body: bytes
+    headers: Dict[str, str]
+
+
+def etag_for(version: str) -> str:
+    return f'"cat-{version}"'
+
+
+def lookup(key: Hashable, if_none_match: Optional[str],
+           build: Optional[str] = None) -> Tuple[str, Optional[Response]]:
+    """
+    (version, response): a 304 or the cached page for `key` at the current
+    version, or None when the caller has to render (then pass it to store()).
+    `build` versions data the page depends on beyond the catalogue (e.g. the
+    co-view table); it becomes part of the version, and so of the ETag.
+    """
+    version = catalogue.current()
+    if build is not None:
+        version = f"{version}+{build}"
+    etag = etag_for(version)
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return version, Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    page = catalogue_cache.get((version, key))
+    if page is not None:
+        return version, Response(page.body, headers=page.headers)
+    return version, None
+
+
+def store(key: Hashable, version: str, response: Response) -> Response:
+    response.headers["ETag"] = etag_for(version)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    catalogue_cache.set((version, key), CachedPage(response.body, dict(response.headers)))
+    return response
@@ -0,0 +1,282 @@
+# app/coview.py
+"""
+"Up next": the videos people watched right after a given one.
+
+Offline (python -m app.coview): one pass over interactions in timestamp
+order. Rows are streamed through a server-side cursor (yield_per), and only
+each active user's latest video is kept. A user moving from video a to
+video b within COVIEW_SESSION_GAP seconds is a transition a -> b. It is
+weighted by every action the user then takes on b (recommender's
+ACTION_WEIGHTS), so a complete counts for more than a view. Each source
+video keeps a space-saving summary of COVIEW_CAPACITY counters, so memory
+stays O(videos x capacity) whatever the table size.
+
+The best COVIEW_TOP_K targets per video are published as CSR arrays in .npy
+files, in a fresh build directory under COVIEW_DIR:
+
+    offsets.npy  int64, max video id + 2: video v's targets are rows offsets[v]:offsets[v+1]
+    targets.npy  int64 target video ids, best first
+    scores.npy   float32 summed transition weights
+
+The CURRENT file names the live build and is swapped with os.replace.
+Workers mmap the arrays, so every worker shares one page cache. A lookup is
+two array reads and a slice. Workers pick up a new build within
+COVIEW_RELOAD_INTERVAL seconds.
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlmodel import Session, select
+
+from .config import (
+    COVIEW_CAPACITY,
+    COVIEW_DIR,
+    COVIEW_RELOAD_INTERVAL,
+    COVIEW_SESSION_GAP,
+    COVIEW_TOP_K,
+)
+from .models import Interaction
+from .recommender import ACTION_WEIGHTS
+
+COVIEW_FETCH_ROWS = 50_000
+COVIEW_KEEP_BUILDS = 2   # the live build and the previous one (a worker may still be loading it)
+
+
+# ======================
+# Building
+# ======================
+
+class SpaceSaving:
+    """Weighted space-saving summary (Metwally et al.): the heavy hitters in `capacity` counters."""
+    __slots__ = ("counts", "capacity")
+
+    def __init__(self, capacity: int):
+        self.counts: Dict[int, float] = {}
+        self.capacity = capacity
+
+    def add(self, item: int, weight: float) -> None:
+        counts = self.counts
+        if item in counts:
+            counts[item] += weight
+        elif len(counts) < self.capacity:
+            counts[item] = weight
+        else:
+            # the newcomer inherits the smallest count (an upper bound on what it missed)
+            victim = min(counts, key=counts.__getitem__)
+            counts[item] = counts.pop(victim) + weight
+
+    def top(self, k: int) -> List[Tuple[int, float]]:
+        return heapq.nlargest(k, self.counts.items(), key=itemgetter(1))
+
+
+class CoviewBuilder:
+    def __init__(self, capacity: int = COVIEW_CAPACITY, session_gap: float = COVIEW_SESSION_GAP):
+        self.capacity = capacity
+        self.session_gap = session_gap
+        self.summaries: Dict[int, SpaceSaving] = {}
+        # user -> (current video, the video they came from or None, last event time)
+        self._last: Dict[int, Tuple[int, Optional[int], float]] = {}
+        self.rows = 0
+        self.transitions = 0
+
+    def add_rows(self, rows: Iterable[tuple]) -> None:
+        """(user_id, video_id, action, timestamp) rows, in timestamp order."""
+        weights = ACTION_WEIGHTS
+        gap = self.session_gap
+        last = self._last
+        src: List[int] = []
+        dst: List[int] = []
+        w: List[float] = []
+        t = None
+        for user_id, video_id, action, timestamp in rows:
+            t = timestamp.timestamp()
+            state = last.get(user_id)
+            came_from = None
+            if state is not None and t - state[2] <= gap:
+                came_from = state[1] if video_id == state[0] else state[0]
+            if came_from is not None:
+                src.append(came_from)
+                dst.append(video_id)
+                w.append(weights[action])
+            last[user_id] = (video_id, came_from, t)
+            self.rows += 1
+        if t is None:
+            return
+        self._merge(src, dst, w)
+        # users idle for longer than the gap can only start a new session
+        if len(last) > 100_000:
+            cutoff = t - gap
+            self._last = {u: s for u, s in last.items() if s[2] >= cutoff}
+
+    def _merge(self, src: List[int], dst: List[int], w: List[float]) -> None:
+        if not src:
+            return
+        # sum repeated pairs of the batch first: one summary update per distinct pair
+        pairs = (np.asarray(src, dtype=np.int64) << 32) | np.asarray(dst, dtype=np.int64)
+        uniq, inverse = np.unique(pairs, return_inverse=True)
+        sums = np.bincount(inverse, weights=np.asarray(w, dtype=np.float64))
+        summaries, capacity = self.summaries, self.capacity
+        for pair, total in zip(uniq.tolist(), sums.tolist()):
+            source = pair >> 32
+            summary = summaries.get(source)
+            if summary is None:
+                summary = summaries[source] = SpaceSaving(capacity)
+            summary.add(pair & 0xFFFFFFFF, total)
+        self.transitions += len(src)
+
+    def finish(self, top_k: int = COVIEW_TOP_K) -> "CoviewTable":
+        size = max(self.summaries, default=-1) + 2
+        counts = np.zeros(size, dtype=np.int64)
+        targets: List[int] = []
+        scores: List[float] = []
+        for source in sorted(self.summaries):
+            best = self.summaries[source].top(top_k)
+            counts[source + 1] = len(best)
+            targets.extend(v for v, _ in best)
+            scores.extend(s for _, s in best)
+        return CoviewTable(
+            offsets=np.cumsum(counts),
+            targets=np.asarray(targets, dtype=np.int64),
+            scores=np.asarray(scores, dtype=np.float32),
+        )
+
+
+def build(db: Session, top_k: int = COVIEW_TOP_K, capacity: int = COVIEW_CAPACITY,
+          session_gap: float = COVIEW_SESSION_GAP) -> Tuple["CoviewTable", CoviewBuilder]:
+    """One streaming pass over interactions; the table is never loaded whole."""
+    stmt = (
+        select(Interaction.user_id, Interaction.video_id, Interaction.action, Interaction.timestamp)
+        .order_by(Interaction.timestamp, Interaction.id)
+        .execution_options(stream_results=True, yield_per=COVIEW_FETCH_ROWS)
+    )
+    builder = CoviewBuilder(capacity, session_gap)
+    for chunk in db.exec(stmt).partitions():
+        builder.add_rows(chunk)
+    return builder.finish(top_k), builder
+
+
+# ======================
+# Table
+# ======================
+
+@dataclass
+class CoviewTable:
+    offsets: np.ndarray
+    targets: np.ndarray
+    scores: np.ndarray
+    version: str = ""     # build directory name; "" until saved/loaded
+
+    def __len__(self) -> int:
+        """Number of source videos with at least one transition."""
+        return int(np.count_nonzero(np.diff(self.offsets)))
+
+    def next_for(self, video_id: int, k: int = COVIEW_TOP_K) -> List[int]:
+        if not 0 <= video_id < len(self.offsets) - 1:
+            return []
+        start, end = int(self.offsets[video_id]), int(self.offsets[video_id + 1])
+        return self.targets[start:min(end, start + k)].tolist()
+
+    def scored_for(self, video_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(target ids, scores) of one video, best first."""
+        if not 0 <= video_id < len(self.offsets) - 1:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+        start, end = int(self.offsets[video_id]), int(self.offsets[video_id + 1])
+        return np.asarray(self.targets[start:end]), np.asarray(self.scores[start:end])
+
+    def save(self, root: Path = COVIEW_DIR) -> str:
+        """Write a new build directory, then point CURRENT at it."""
+        root = Path(root)
+        version = f"{time.time_ns()}"
+        build_dir = root / version
+        build_dir.mkdir(parents=True)
+        for name in ("offsets", "targets", "scores"):
+            np.save(build_dir / f"{name}.npy", getattr(self, name))
+        tmp = root / "CURRENT.tmp"
+        tmp.write_text(version)
+        os.replace(tmp, root / "CURRENT")
+        self.version = version
+        builds = sorted((p for p in root.iterdir() if p.is_dir() and p.name.isdigit()), key=lambda p: int(p.name))
+        for old in builds[:-COVIEW_KEEP_BUILDS]:
+            shutil.rmtree(old, ignore_errors=True)
+        return version
+
+    @classmethod
+    def load(cls, root: Path, version: str) -> "CoviewTable":
+        build_dir = Path(root) / version
+        return cls(
+            offsets=np.load(build_dir / "offsets.npy", mmap_mode="r"),
+            targets=np.load(build_dir / "targets.npy", mmap_mode="r"),
+            scores=np.load(build_dir / "scores.npy", mmap_mode="r"),
+            version=version,
+        )
+
+
+# ======================
+# Serving
+# ======================
+
+_table: Optional[CoviewTable] = None
+_root: Path = COVIEW_DIR
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _current_version(root: Path) -> Optional[str]:
+    try:
+        return (root / "CURRENT").read_text().strip() or None
+    except OSError:
+        return None
+
+
+def load_coview(root: Path = COVIEW_DIR) -> Optional[CoviewTable]:
+    """Map the live build if there is one (and remember `root` for reloads)."""
+    global _table, _root, _checked_at
+    root = Path(root)
+    with _lock:
+        _root, _checked_at = root, time.monotonic()
+        version = _current_version(root)
+        if version is not None and (_table is None or _table.version != version):
+            _table = CoviewTable.load(root, version)
+        return _table
+
+
+def get_table() -> Optional[CoviewTable]:
+    """The mapped table; CURRENT is re-read at most every COVIEW_RELOAD_INTERVAL seconds."""
+    if time.monotonic() - _checked_at >= COVIEW_RELOAD_INTERVAL:
+        load_coview(_root)
+    return _table
+
+
+def main():
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Build the co-view 'up next' table")
+    parser.add_argument("--out", default=str(COVIEW_DIR))
+    parser.add_argument("--top-k", type=int, default=COVIEW_TOP_K)
+    parser.add_argument("--capacity", type=int, default=COVIEW_CAPACITY)
+    parser.add_argument("--session-gap", type=float, default=COVIEW_SESSION_GAP)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    with Session(engine) as db:
+        table, builder = build(db, args.top_k, max(args.capacity, args.top_k), args.session_gap)
+    version = table.save(Path(args.out))
+    print(
+        f"Built co-view table {version}: {builder.rows} interactions, {builder.transitions} "
+        f"transitions, {len(table)} videos with up-next lists, {len(table.targets)} entries "
+        f"in {time.perf_counter() - t0:.2f}s -> {args.out}"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -2,33 +2,81 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Optional
+from typing import Iterable, List, Optional, Tuple
 
+from sqlalchemy import delete, func, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
-from .models import User, Video , Interaction, ActionEnum
-from .schemas import UserCreate, VideoCreate
+from .catalogue import catalogue
+from .metrics import timed
+from .models import User, Video , Interaction, ActionEnum, VideoStats
+from .schemas import InteractionRead, UserCreate, UserOut, VideoCreate, VideoRead
+from .search import Doc, memory_search, query_tokens, search_index, search_stmt, use_postgres
 from .utils import hash_password
 
+BULK_CHUNK_SIZE = 1000
+
+
+def dialect_insert(db: Session, model):
+    """INSERT construct with ON CONFLICT support for the session's backend."""
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    return insert(model)
+
+
+# ======================
+# Row fast path for list endpoints
+# ======================
+
+def read_columns(model, schema) -> tuple:
+    """The table columns `schema` outputs, in schema field order."""
+    return tuple(
+        getattr(model, name) for name in schema.model_fields if name in model.__table__.columns
+    )
+
+def as_rows(result) -> List[dict]:
+    """Column-select results as plain dicts: no ORM objects, no identity map."""
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+USER_OUT_COLUMNS = read_columns(User, UserOut)
+VIDEO_READ_COLUMNS = read_columns(Video, VideoRead)
+INTERACTION_READ_COLUMNS = read_columns(Interaction, InteractionRead)
+
 
 # ======================
 # Users
 # ======================
 
+@timed("crud")
 def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
     return db.get(User, user_id)
 
+@timed("crud")
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     stmt = select(User).where(User.email == email)
     return db.exec(stmt).first()
 
-def list_users(db: Session, skip: int = 0, limit: int = 20) -> List[User]:
-    stmt = select(User).offset(skip).limit(limit)
-    return db.exec(stmt).all()
+@timed("crud")
+def list_users(
+    db: Session, skip: int = 0, limit: int = 20, after_id: Optional[int] = None
+) -> List[dict]:
+    """
+    UserOut rows ordered by id; pass `after_id` (keyset) instead of `skip`
+    for deep pages.
+    """
+    stmt = select(*USER_OUT_COLUMNS).order_by(User.id)
+    if after_id is not None:
+        stmt = stmt.where(User.id > after_id)
+    else:
+        stmt = stmt.offset(skip)
+    return as_rows(db.exec(stmt.limit(limit)))
 
-def create_user(db: Session, user: UserCreate) -> User:
-    hashed_password = hash_password(user.password)
+@timed("crud")
+def create_user(db: Session, user: UserCreate, hashed_password: Optional[str] = None) -> User:
+    """`hashed_password`: pass one computed off-thread (utils.hash_password_async)."""
+    hashed_password = hashed_password or hash_password(user.password)
     db_user = User(
         email=user.email,
         hashed_password=hashed_password,
@@ -39,31 +87,88 @@ def create_user(db: Session, user: UserCreate) -> User:
     db.refresh(db_user)
     return db_user
 
+@timed("crud")
+def set_password_hash(db: Session, user: User, hashed_password: str) -> User:
+    user.hashed_password = hashed_password
+    db.add(user)
+    db.commit()
+    return user
+
 
 # ======================
 # Videos
 # ======================
 
+@timed("crud")
 def get_video_by_id(db: Session, video_id: int) -> Optional[Video]:
     return db.get(Video, video_id)
 
+@timed("crud")
 def get_video_by_pixabay_id(db: Session, px_id: int) -> Optional[Video]:
     stmt = select(Video).where(Video.pixabay_id == px_id)
     return db.exec(stmt).first()
 
-def list_videos(db: Session, skip: int = 0, limit: int = 20) -> List[Video]:
-    stmt = (
-        select(Video)
-        .order_by(Video.uploaded_at.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    return db.exec(stmt).all()
+@timed("crud")
+def get_videos_by_ids(db: Session, ids: List[int]) -> List[Video]:
+    """Fetch videos in one query, returned in the order of `ids` (missing ids skipped)."""
+    if not ids:
+        return []
+    stmt = select(Video).where(Video.id.in_(ids))
+    by_id = {v.id: v for v in db.exec(stmt).all()}
+    return [by_id[i] for i in ids if i in by_id]
+
+@timed("crud")
+def get_video_rows_by_ids(db: Session, ids: List[int]) -> List[dict]:
+    """get_videos_by_ids as VideoRead rows (see RowsResponse)."""
+    if not ids:
+        return []
+    by_id = {r["id"]: r for r in as_rows(db.exec(select(*VIDEO_READ_COLUMNS).where(Video.id.in_(ids))))}
+    return [by_id[i] for i in ids if i in by_id]
+
+@timed("crud")
+def list_videos(
+    db: Session,
+    skip: int = 0,
+    limit: int = 20,
+    after: Optional[Tuple[datetime, int]] = None,
+) -> List[dict]:
+    """
+    VideoRead rows, newest first, ordered by (uploaded_at, id).
+    `after` is the (uploaded_at, id) of the last row already seen (keyset);
+    without it the legacy OFFSET `skip` is used.
+    """
+    return as_rows(db.exec(videos_page_stmt(skip, limit, after)))
+
+def videos_page_stmt(skip: int, limit: int, after: Optional[Tuple[datetime, int]]):
+    # shared with async_crud
+    stmt = select(*VIDEO_READ_COLUMNS).order_by(Video.uploaded_at.desc(), Video.id.desc())
+    if after is not None:
+        stmt = stmt.where(tuple_(Video.uploaded_at, Video.id) < after)
+    else:
+        stmt = stmt.offset(skip)
+    return stmt.limit(limit)
 
+@timed("crud")
+def search_videos(db: Session, q: str, skip: int, limit: int, version: str) -> List[dict]:
+    """VideoRead rows matching `q`, best first (see app/search.py)."""
+    tokens = query_tokens(q)
+    if not tokens:
+        return []
+    if use_postgres(db):
+        return as_rows(db.exec(search_stmt(tokens, skip, limit, VIDEO_READ_COLUMNS)))
+    return get_video_rows_by_ids(db, memory_search(db, tokens, skip, limit, version))
+
+def catalogue_changed(upserted: Iterable[Doc] = (), deleted: Iterable[int] = ()) -> None:
+    """After a committed video write: new catalogue version, search index kept in step."""
+    before, after = catalogue.bump()
+    search_index.apply(before, after, upserted, deleted)
+
+@timed("crud")
 def create_or_update_video(db: Session, data: VideoCreate) -> Video:
     """
     Idempotent upsert keyed by unique pixabay_id.
     If a row exists, update metadata; otherwise insert a new one.
+    For many videos at once use bulk_upsert_videos.
     """
     existing = get_video_by_pixabay_id(db, data.pixabay_id)
     if existing:
@@ -74,6 +179,7 @@ def create_or_update_video(db: Session, data: VideoCreate) -> Video:
         db.add(existing)
         db.commit()
         db.refresh(existing)
+        catalogue_changed(upserted=[(existing.id, data.title, data.description)])
         return existing
 
     video = Video(
@@ -87,14 +193,68 @@ def create_or_update_video(db: Session, data: VideoCreate) -> Video:
     db.add(video)
     db.commit()
     db.refresh(video)
+    catalogue_changed(upserted=[(video.id, data.title, data.description)])
     return video
 
+@timed("crud")
+def bulk_upsert_videos(
+    db: Session, items: List[VideoCreate], chunk_size: int = BULK_CHUNK_SIZE
+) -> List[int]:
+    """
+    Upsert many videos with one INSERT ... ON CONFLICT (pixabay_id) DO UPDATE
+    per chunk and a single commit. Returns Video.id for each item, in order.
+    uploaded_at is only set on insert, matching create_or_update_video.
+    """
+    rows = video_upsert_rows(items)
+    if not rows:
+        return []   # nothing changed: keep the catalogue version (and every ETag)
+    id_by_px = {}
+    for start in range(0, len(rows), chunk_size):
+        stmt = video_upsert_stmt(db, rows[start:start + chunk_size])
+        id_by_px.update({px: vid for vid, px in db.exec(stmt).all()})
+    db.commit()
+    catalogue_changed(upserted=[(id_by_px[r["pixabay_id"]], r["title"], r["description"]) for r in rows])
+    return [id_by_px[item.pixabay_id] for item in items]
+
+def video_upsert_rows(items: List[VideoCreate]) -> List[dict]:
+    latest = {item.pixabay_id: item for item in items}   # last write wins
+    now = datetime.utcnow()
+    return [
+        {
+            "pixabay_id": item.pixabay_id,
+            "title": item.title,
+            "description": item.description,
+            "source_url": item.source_url,
+            "thumb_url": item.thumb_url,
+            "uploaded_at": now,
+        }
+        for item in latest.values()
+    ]
+
+def video_upsert_stmt(db: Session, rows: List[dict]):
+    # shared with async_crud (which passes its sync_session for the dialect)
+    stmt = dialect_insert(db, Video).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[Video.pixabay_id],
+        set_={
+            "title": stmt.excluded.title,
+            "description": stmt.excluded.description,
+            "source_url": stmt.excluded.source_url,
+            "thumb_url": stmt.excluded.thumb_url,
+        },
+    ).returning(Video.id, Video.pixabay_id)
+
+@timed("crud")
 def delete_video(db: Session, video_id: int) -> bool:
     video = db.get(Video, video_id)
     if not video:
         return False
+    # interactions.video_id is NOT NULL: without this the delete hits an IntegrityError
+    db.exec(delete(Interaction).where(Interaction.video_id == video_id))
+    db.exec(delete(VideoStats).where(VideoStats.video_id == video_id))
     db.delete(video)
     db.commit()
+    catalogue_changed(deleted=[video_id])
     return True
 
 
@@ -102,6 +262,28 @@ def delete_video(db: Session, video_id: int) -> bool:
 # Interactions
 # ======================
 
+def committed_interaction_id(db: Session) -> int:
+    """
+    Highest Interaction.id below which every id is committed or rolled back.
+
+    Postgres hands out ids from a sequence before commit, so a row with a
+    smaller id can become visible after a larger one. Taking a SHARE ROW
+    EXCLUSIVE lock waits for every transaction that is inserting right now
+    (and holds new ones back for the moment it takes to read max(id)); any
+    id allocated later is larger. SQLite allocates ids under its single
+    write lock, so the newest visible id is already such a bound.
+    """
+    newest = select(func.max(Interaction.id))
+    if db.get_bind().dialect.name != "postgresql":
+        return db.exec(newest).one() or 0
+    with db.get_bind().connect() as conn:
+        conn.execute(text(f"LOCK TABLE {Interaction.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+        bound = conn.execute(newest).scalar() or 0
+        conn.commit()
+    return bound
+
+
+@timed("crud")
 def create_interaction(
     db: Session,
     *,
@@ -138,29 +320,55 @@ def create_interaction(
     db.refresh(inter)
     return inter
 
+@timed("crud")
 def get_interactions_by_user(
-    db: Session, user_id: int, skip: int = 0, limit: int = 50
-) -> List[Interaction]:
-    stmt = (
-        select(Interaction)
-        .where(Interaction.user_id == user_id)
-        .order_by(Interaction.timestamp.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    return db.exec(stmt).all()
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 50,
+    after: Optional[Tuple[datetime, int]] = None,
+    actions: Optional[List[ActionEnum]] = None,
+) -> List[dict]:
+    """
+    InteractionRead rows, newest first by (timestamp, id); `after` is a keyset
+    cursor position. `actions` filters in SQL, so a page always holds up to
+    `limit` matches.
+    """
+    stmt = interactions_page_stmt(Interaction.user_id == user_id, limit, after, actions)
+    if after is None:
+        stmt = stmt.offset(skip)
+    return as_rows(db.exec(stmt))
 
+@timed("crud")
 def list_interactions_by_video(
-    db: Session, video_id: int, limit: int = 50
-) -> List[Interaction]:
+    db: Session,
+    video_id: int,
+    limit: int = 50,
+    after: Optional[Tuple[datetime, int]] = None,
+    actions: Optional[List[ActionEnum]] = None,
+) -> List[dict]:
+    stmt = interactions_page_stmt(Interaction.video_id == video_id, limit, after, actions)
+    return as_rows(db.exec(stmt))
+
+def interactions_page_stmt(
+    owner_clause,
+    limit: int,
+    after: Optional[Tuple[datetime, int]] = None,
+    actions: Optional[List[ActionEnum]] = None,
+):
+    # shared by the user/video history queries here and in async_crud
     stmt = (
-        select(Interaction)
-        .where(Interaction.video_id == video_id)
-        .order_by(Interaction.timestamp.desc())
-        .limit(limit)
+        select(*INTERACTION_READ_COLUMNS)
+        .where(owner_clause)
+        .order_by(Interaction.timestamp.desc(), Interaction.id.desc())
     )
-    return db.exec(stmt).all()
+    if actions:
+        stmt = stmt.where(Interaction.action.in_(actions))
+    if after is not None:
+        stmt = stmt.where(tuple_(Interaction.timestamp, Interaction.id) < after)
+    return stmt.limit(limit)
 
+@timed("crud")
 def get_interaction(
     db: Session, *, user_id: int, video_id: int, action: ActionEnum
 ) -> Optional[Interaction]:
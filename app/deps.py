@@ -1,30 +1,222 @@
+import fcntl
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession, object_session
+from .config import AUTH_EPOCH_FILE
 from .models import User
-from .oauth2 import oauth2_scheme, verify_access_token
+from .oauth2 import oauth2_scheme, decode_access_token
 from .database import get_session
+from .cache import auth_cache
+from .metrics import timed
 from sqlmodel import Session
 
-def get_current_user(token: str= Depends(oauth2_scheme), session: Session = Depends(get_session)):
-    credentials_exception = HTTPException(
+log = logging.getLogger(__name__)
+
+
+# ======================
+# Authenticated-user snapshots
+# ======================
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """What the routers need from the caller; cached per bearer token."""
+    id: int
+    is_admin: bool
+    checked_at: float      # time.time() when this was read from the token/DB
+    from_claims: bool      # True: is_admin comes from the token, not the DB
+
+class AuthEpoch:
+    """
+    time.time() of the latest admin-flag change or user deletion made by any
+    worker on this host, kept in AUTH_EPOCH_FILE: bumped under an flock,
+    read with one pread per check (as catalogue.py does for its version).
+    Snapshots and claim-only tokens older than it are stale in every worker,
+    so each active token costs one user lookup after such a change.
+    Workers on other hosts do not see the file: there a change still takes
+    up to AUTH_CACHE_TTL (cached snapshots) or the token lifetime (claims).
+    """
+    _WIDTH = 32
+
+    def __init__(self, path: Path = AUTH_EPOCH_FILE):
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+        self._unavailable = False
+        self._local = 0.0     # this process's latest change, if the file cannot be used
+
+    def _open(self) -> Optional[int]:
+        if self._fd is None and not self._unavailable:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError:
+                log.exception("Auth epoch file %s unavailable; user changes stay per-process", self.path)
+                self._unavailable = True
+        return self._fd
+
+    @staticmethod
+    def _parse(raw: bytes) -> float:
+        try:
+            return float(raw)
+        except ValueError:
+            return 0.0    # empty (new file)
+
+    def current(self) -> float:
+        fd = self._open()
+        if fd is None:
+            return self._local
+        return max(self._local, self._parse(os.pread(fd, self._WIDTH, 0)))
+
+    def bump(self, at: float) -> None:
+        self._local = max(self._local, at)
+        fd = self._open()
+        if fd is None:
+            return
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            latest = max(at, self._parse(os.pread(fd, self._WIDTH, 0)))
+            os.pwrite(fd, f"{latest:.6f}".ljust(self._WIDTH - 1).encode("ascii") + b"\n", 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+auth_epoch = AuthEpoch()
+
+# user id -> time.time() of the last change made by this process
+_user_changed_at: Dict[int, float] = {}
+_changed_lock = threading.Lock()
+
+def invalidate_user_auth(user_id: int) -> None:
+    """Make every cached snapshot and claim-only token of this user older than now stale."""
+    now = time.time()
+    with _changed_lock:
+        _user_changed_at[user_id] = now
+    auth_epoch.bump(now)
+
+def _changed(session: Optional[OrmSession], user_id: int) -> None:
+    # applied once the transaction commits: a worker that reloads the row
+    # earlier would cache the old value as fresh
+    if session is None:
+        invalidate_user_auth(user_id)
+    else:
+        session.info.setdefault("auth_changed", set()).add(user_id)
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target):
+    # only the admin flag is part of a snapshot (a password re-hash is not)
+    if inspect(target).attrs.is_admin.history.has_changes():
+        _changed(object_session(target), target.id)
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    _changed(object_session(target), target.id)
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_user_changes(session):
+    for user_id in session.info.pop("auth_changed", ()):
+        invalidate_user_auth(user_id)
+
+@event.listens_for(OrmSession, "after_rollback")
+def _drop_user_changes(session):
+    session.info.pop("auth_changed", None)
+
+def _changed_since(user_id: int) -> float:
+    return max(_user_changed_at.get(user_id, 0.0), auth_epoch.current())
+
+def _fresh(snapshot: CurrentUser) -> bool:
+    return snapshot.checked_at >= _changed_since(snapshot.id)
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    token_data = verify_access_token(token, credentials_exception)
-    user = session.get(User, token_data.id)
-    return user if user else None
+def cached_user(token: str) -> Optional[CurrentUser]:
+    snapshot = auth_cache.get(token)
+    return snapshot if snapshot is not None and _fresh(snapshot) else None
+
+def user_from_claims(payload: dict) -> Optional[CurrentUser]:
+    """
+    Snapshot straight from the token when it carries is_admin and was issued
+    after the user's last change; None means the DB has to be asked.
+    """
+    user_id = int(payload["user_id"])
+    iat = payload.get("iat")
+    if "is_admin" not in payload or iat is None or iat < _changed_since(user_id):
+        return None
+    return CurrentUser(user_id, bool(payload["is_admin"]), time.time(), from_claims=True)
+
+def user_from_row(user: Optional[User]) -> CurrentUser:
+    if user is None:
+        raise credentials_exception()
+    return CurrentUser(user.id, user.is_admin, time.time(), from_claims=False)
 
-def require_admin(current = Depends(get_current_user)):
+def remember(token: str, snapshot: CurrentUser, payload: Optional[dict] = None) -> CurrentUser:
+    ttl = auth_cache.ttl
+    if payload is not None and payload.get("exp"):
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        auth_cache.set(token, snapshot, ttl=ttl)
+    return snapshot
+
+def _confirm_admin(token: str, current: CurrentUser, session: Session) -> CurrentUser:
+    # is_admin from the token alone is not trusted for admin-only access:
+    # check the row once, then cache the DB-backed snapshot for this token
+    # (no longer than the token itself is valid)
+    if not current.from_claims:
+        return current
+    payload = decode_access_token(token, credentials_exception())
+    return remember(token, user_from_row(session.get(User, current.id)), payload)
+
+
+# ======================
+# Dependencies
+# ======================
+
+@timed("auth")
+def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> CurrentUser:
+    """
+    Cached token -> CurrentUser; on a miss the JWT is verified and, when its
+    claims suffice, the database is not touched at all.
+    """
+    snapshot = cached_user(token)
+    if snapshot is not None:
+        return snapshot
+    payload = decode_access_token(token, credentials_exception())
+    snapshot = user_from_claims(payload) or user_from_row(session.get(User, int(payload["user_id"])))
+    return remember(token, snapshot, payload)
+
+@timed("auth")
+def require_admin(
+    token: str = Depends(oauth2_scheme),
+    current: CurrentUser = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    if current.is_admin:
+        current = _confirm_admin(token, current, session)
     if not current.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Admin only.")
     return current
 
+@timed("auth")
 def ensure_self_or_admin(
     user_id: int,
-    current = Depends(get_current_user)
+    token: str = Depends(oauth2_scheme),
+    current: CurrentUser = Depends(get_current_user),
+    session: Session = Depends(get_session),
 ):
-    if current.is_admin or current.id == user_id:
+    if current.id == user_id:
+        return current
+    if current.is_admin and _confirm_admin(token, current, session).is_admin:
         return current
     raise HTTPException(403, "Not allowed")
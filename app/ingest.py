@@ -0,0 +1,216 @@
+# app/ingest.py
+"""
+Write-behind ingestion for high-rate interaction events.
+
+Events are validated against an in-memory set of video ids, queued in a
+bounded buffer, and flushed by a background thread as one multi-row
+INSERT ... ON CONFLICT DO NOTHING per batch (on size or on a timer).
+Only the rows the INSERT actually returns reach the trending counters, so
+a repeated (user, video, action) is never counted twice.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from .config import INGEST_BATCH_SIZE, INGEST_FLUSH_INTERVAL, INGEST_MAX_QUEUE
+from .crud import dialect_insert
+from .models import ActionEnum, Interaction, Video
+from .trending import trending
+
+log = logging.getLogger(__name__)
+
+
+# ======================
+# Known video ids
+# ======================
+
+class VideoIdSet:
+    """
+    Process-local set of existing Video.id values.
+    Misses fall back to the database (videos imported by another process):
+    one query per call, however many ids missed, and positive answers are
+    remembered. Unknown ids are not, so a video created later is found.
+    """
+
+    def __init__(self):
+        self._ids: set = set()
+        self._lock = threading.Lock()
+
+    def load(self, engine) -> int:
+        with Session(engine) as db:
+            ids = set(db.exec(select(Video.id)).all())
+        with self._lock:
+            self._ids = ids
+        return len(ids)
+
+    def add(self, video_id: int) -> None:
+        with self._lock:
+            self._ids.add(video_id)
+
+    def discard(self, video_id: int) -> None:
+        with self._lock:
+            self._ids.discard(video_id)
+
+    def _remember(self, found: Iterable[int]) -> None:
+        with self._lock:
+            self._ids.update(found)
+
+    def existing(self, db: Session, video_ids: Iterable[int]) -> Set[int]:
+        """The subset of `video_ids` that exist."""
+        wanted = set(video_ids)
+        missing = wanted - self._ids
+        if missing:
+            self._remember(db.exec(select(Video.id).where(Video.id.in_(missing))).all())
+        return {v for v in wanted if v in self._ids}
+
+    async def existing_async(self, db, video_ids: Iterable[int]) -> Set[int]:
+        """existing() for an AsyncSession."""
+        wanted = set(video_ids)
+        missing = wanted - self._ids
+        if missing:
+            self._remember((await db.exec(select(Video.id).where(Video.id.in_(missing)))).all())
+        return {v for v in wanted if v in self._ids}
+
+    def exists(self, db: Session, video_id: int) -> bool:
+        return video_id in self.existing(db, (video_id,))
+
+    async def exists_async(self, db, video_id: int) -> bool:
+        """exists() for an AsyncSession."""
+        return video_id in await self.existing_async(db, (video_id,))
+
+
+# ======================
+# Write-behind buffer
+# ======================
+
+Row = Dict[str, object]
+
+
+def _insert_ignore(db: Session, rows: List[Row]):
+    """Multi-row insert that skips duplicates and returns the rows it did insert."""
+    return (
+        dialect_insert(db, Interaction).values(rows).on_conflict_do_nothing()
+        .returning(Interaction.user_id, Interaction.video_id, Interaction.action)
+    )
+
+
+class InteractionWriter:
+    def __init__(self, batch_size: int = INGEST_BATCH_SIZE,
+                 flush_interval: float = INGEST_FLUSH_INTERVAL,
+                 max_queue: int = INGEST_MAX_QUEUE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._buf: deque = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._engine = None
+        self.flushed = 0
+        self.dropped = 0
+
+    def start(self, engine) -> None:
+        if self._thread is not None:
+            return
+        self._engine = engine
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="interaction-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush everything still queued, then stop the worker."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def offer(self, events: Iterable[Tuple[int, int, ActionEnum]]) -> bool:
+        """
+        Queue (user_id, video_id, action) events, all or nothing.
+        Returns False when the bounded buffer has no room (caller should shed load),
+        or when the writer was never started. Once stop() has begun, the
+        events are inserted synchronously instead, as nothing would flush them.
+        """
+        now = datetime.utcnow()
+        rows = [
+            {"user_id": u, "video_id": v, "action": a, "timestamp": now}
+            for u, v, a in events
+        ]
+        with self._cond:
+            stopping = self._stopping
+            if not stopping:
+                if self._engine is None:
+                    return False
+                if len(self._buf) + len(rows) > self.max_queue:
+                    self.dropped += len(rows)
+                    return False
+                self._buf.extend(rows)
+                if len(self._buf) >= self.batch_size:
+                    self._cond.notify()
+        if stopping and rows:
+            self.flush(rows)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def _take(self) -> List[Row]:
+        n = min(self.batch_size, len(self._buf))
+        return [self._buf.popleft() for _ in range(n)]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._buf) < self.batch_size and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take()
+                done = self._stopping and not self._buf
+            if batch:
+                try:
+                    self.flush(batch)
+                except Exception:
+                    log.exception("Dropping %d interactions after flush failure", len(batch))
+                    self.dropped += len(batch)
+            if done:
+                return
+
+    def flush(self, rows: List[Row]) -> int:
+        """One multi-row INSERT ... ON CONFLICT DO NOTHING for the batch; returns rows inserted."""
+        # collapse duplicates inside the batch; the DB handles the rest
+        unique = list({(r["user_id"], r["video_id"], r["action"]): r for r in rows}.values())
+        inserted = []
+        with Session(self._engine) as db:
+            try:
+                inserted = db.exec(_insert_ignore(db, unique)).all()
+                db.commit()
+            except IntegrityError:
+                # a video was deleted after validation: keep the rows that still exist
+                db.rollback()
+                video_ids = {r["video_id"] for r in unique}
+                alive = set(db.exec(select(Video.id).where(Video.id.in_(video_ids))).all())
+                unique = [r for r in unique if r["video_id"] in alive]
+                if unique:
+                    inserted = db.exec(_insert_ignore(db, unique)).all()
+                    db.commit()
+        trending.record_many(inserted)
+        self.flushed += len(inserted)
+        return len(inserted)
+
+
+video_ids = VideoIdSet()
+interaction_writer = InteractionWriter()
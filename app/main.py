@@ -1,11 +1,20 @@
 from fastapi import FastAPI
-from .database import create_db_and_tables
-from .routers import videos, user, auth, interactions
-from pathlib import Path
-from fastapi.staticfiles import StaticFiles
+from .database import create_db_and_tables, engine
+from .config import ASYNC_DB, MEDIA_ROOT
+from .routers import (
+    user, auth, recommendations, admin, media, metrics, search, coview, trending as trending_router,
+)
+from .recommender import load_model
+from .ann import load_index
+from .coview import load_coview
+from .ingest import video_ids, interaction_writer
+from .thumbnails import derived_cache, shutdown_pool
+from .utils import password_pool
+from .trending import trending
+from .stats import stats_refresher
+from .metrics import MetricsMiddleware
 
 # Where media will live on the EC2 instance (root EBS is fine to start)
-MEDIA_ROOT = Path("/var/app/media")
 THUMBS_DIR = MEDIA_ROOT / "thumbs"
 CLIPS_DIR  = MEDIA_ROOT / "clips"
 
@@ -15,16 +24,48 @@ for p in (THUMBS_DIR, CLIPS_DIR):
 
 
 app = FastAPI()
+# per-route latency/size/query counts, exposed at GET /metrics
+app.add_middleware(MetricsMiddleware)
 
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    load_model()
+    load_index()
+    load_coview()
+    video_ids.load(engine)
+    interaction_writer.start(engine)
+    derived_cache.load()
+    trending.start(engine)
+    stats_refresher.start(engine)
 
-app.mount("/media", StaticFiles(directory=str(MEDIA_ROOT)), name="media")
+@app.on_event("shutdown")
+def on_shutdown():
+    # flush queued write-behind interactions before the process exits
+    interaction_writer.stop()
+    trending.stop()
+    stats_refresher.stop()
+    shutdown_pool()
+    password_pool.shutdown()
 
+if ASYNC_DB:
+    # async def handlers on the asyncpg engine for the high-traffic routes
+    from .routers import async_videos as videos, async_interactions as interactions
+else:
+    from .routers import videos, interactions
+
+# before videos: /videos/{video_id} would otherwise match /videos/trending, /videos/search
+app.include_router(trending_router.router)
+app.include_router(search.router)
+app.include_router(coview.router)
 app.include_router(videos.router)
 app.include_router(user.router)
 app.include_router(interactions.router)
+app.include_router(recommendations.router)
 app.include_router(auth.router)
+app.include_router(admin.router)
+# /media: Range, ETag/304, immutable caching (replaces the StaticFiles mount)
+app.include_router(media.router)
+app.include_router(metrics.router)
 
 
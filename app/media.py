@@ -0,0 +1,284 @@
+# app/media.py
+"""
+Serving files from MEDIA_ROOT (thumbnails + clips).
+
+Replaces the StaticFiles mount:
+  * single byte ranges (206 / 416) and If-Range, so players can seek
+  * strong ETag (the sha256 recorded at download time, else size + mtime)
+    and Last-Modified, answered with 304 when the client copy is current;
+    the validator is cached per (path, size, mtime) so a hit is one stat()
+  * a year-long `immutable` Cache-Control for `{pixabay_id}.mp4/.jpg`,
+    whose bytes never change under the same name
+  * zero-copy sendfile (ASGI `http.response.zerocopysend`) or `pathsend`
+    when the server offers them, else 256 KiB preads in a worker thread
+  * .meta/ sidecars and in-progress .part files are never served
+
+With MEDIA_X_ACCEL_PREFIX set, a GET is answered with headers only plus
+`X-Accel-Redirect: <prefix><path under MEDIA_ROOT>` and nginx streams the file
+(including ranges), e.g.
+
+    location /_media/ { internal; alias /var/app/media/; }
+"""
+from __future__ import annotations
+
+import mimetypes
+import os
+import re
+import stat
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Mapping, Optional, Tuple
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from .cache import LRUTTLCache
+from .config import MEDIA_ROOT, MEDIA_X_ACCEL_PREFIX
+
+MEDIA_KINDS = ("thumbs", "clips")
+CHUNK_SIZE = 256 * 1024
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+# no leading dot (.meta/ sidecars), no path separators
+_SAFE_NAME = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9_.-]*")
+_PARTIAL_SUFFIXES = (".part", ".tmp")
+# names the ingester derives from the Pixabay id: content is fixed for the name
+_IMMUTABLE_NAME = re.compile(r"\d+\.(?:mp4|jpg)")
+_BYTE_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+# (path, size, mtime_ns) -> ETag; the sidecar is read once per file version
+_etags = LRUTTLCache(maxsize=20_000, ttl=3600.0)
+
+
+# ======================
+# Lookup + validators
+# ======================
+
+@dataclass
+class MediaFile:
+    path: Path
+    rel: str            # path under MEDIA_ROOT, e.g. "clips/123.mp4"
+    size: int
+    mtime: float
+    etag: str
+    last_modified: str
+    content_type: str
+    cache_control: str
+
+
+def _sidecar_etag(path: Path, size: int) -> Optional[str]:
+    # sidecars are written by app.pixabay._download next to the file
+    from .pixabay import read_meta
+
+    meta = read_meta(path)
+    if meta and meta.get("size") == size and meta.get("sha256"):
+        return f'"{meta["sha256"][:32]}"'
+    return None
+
+
+def _etag_for(path: Path, st: os.stat_result) -> str:
+    key = (str(path), st.st_size, st.st_mtime_ns)
+    etag = _etags.get(key)
+    if etag is None:
+        etag = _sidecar_etag(path, st.st_size) or f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        _etags.set(key, etag)
+    return etag
+
+
+def safe_name(name: str) -> bool:
+    return bool(_SAFE_NAME.fullmatch(name)) and not name.endswith(_PARTIAL_SUFFIXES)
+
+
+def resolve(kind: str, name: str, root: Path = MEDIA_ROOT) -> Optional[MediaFile]:
+    """Stat a servable file; None for unknown kinds, unsafe/partial names or misses."""
+    if kind not in MEDIA_KINDS or not safe_name(name):
+        return None
+    return stat_file(Path(root), f"{kind}/{name}")
+
+
+def stat_file(root: Path, rel: str, immutable: Optional[bool] = None) -> Optional[MediaFile]:
+    """
+    MediaFile for root/rel (rel must already be validated). `immutable`
+    defaults to whether the file name is an ingester `{pixabay_id}` name.
+    """
+    path = root / rel
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    if immutable is None:
+        immutable = bool(_IMMUTABLE_NAME.fullmatch(path.name))
+    return MediaFile(
+        path=path,
+        rel=rel,
+        size=st.st_size,
+        mtime=st.st_mtime,
+        etag=_etag_for(path, st),
+        last_modified=formatdate(st.st_mtime, usegmt=True),
+        content_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+        cache_control=IMMUTABLE_CACHE_CONTROL if immutable else DEFAULT_CACHE_CONTROL,
+    )
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison: W/"x" matches "x"
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
+def _not_modified_since(header: str, mtime: float) -> bool:
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(mtime) <= since
+
+
+def is_not_modified(headers: Mapping[str, str], f: MediaFile) -> bool:
+    """RFC 9110: If-None-Match wins; If-Modified-Since only when it is absent."""
+    inm = headers.get("if-none-match")
+    if inm is not None:
+        return etag_matches(inm, f.etag)
+    ims = headers.get("if-modified-since")
+    return ims is not None and _not_modified_since(ims, f.mtime)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Single `bytes=` range -> (start, end) inclusive, or None to send the whole
+    file (no header, other units, malformed or multi-range requests).
+    Raises RangeNotSatisfiable when the range starts past the end or selects
+    no bytes (any range of an empty file).
+    """
+    if not header:
+        return None
+    m = _BYTE_RANGE.fullmatch(header.strip())
+    if not m or m.group(1) == m.group(2) == "":
+        return None
+    first, last = m.groups()
+    if first == "":
+        # suffix range: the last N bytes
+        n = int(last)
+        if n == 0 or size == 0:
+            raise RangeNotSatisfiable()   # no byte to send (an empty file has none)
+        return max(0, size - n), size - 1
+    start = int(first)
+    end = size - 1 if last == "" else min(int(last), size - 1)
+    if last != "" and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def _if_range_ok(header: Optional[str], f: MediaFile) -> bool:
+    # If-Range needs an exact (strong) validator match, else send the full file
+    if header is None:
+        return True
+    header = header.strip()
+    if header.startswith('"'):
+        return header == f.etag
+    return header == f.last_modified
+
+
+# ======================
+# Responses
+# ======================
+
+class FileSpanResponse(Response):
+    """
+    Sends bytes [start, start + length) of a file. Headers must already carry
+    Content-Length/Content-Type; the body goes out zero-copy when possible.
+    """
+
+    def __init__(self, path: Path, start: int, length: int, status_code: int,
+                 headers: Mapping[str, str], send_body: bool = True, whole_file: bool = False):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.start = start
+        self.length = length
+        self.send_body = send_body
+        self.whole_file = whole_file
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code,
+                    "headers": self.raw_headers})
+        if not self.send_body or self.length == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopysend", "file": f,
+                            "offset": self.start, "count": self.length})
+            return
+        if self.whole_file and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        # one worker-thread hop per chunk: pread needs no seek and no shared offset
+        offset, remaining = self.start, self.length
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(os.pread, fd, min(CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk,
+                            "more_body": remaining > 0})
+        finally:
+            os.close(fd)
+        if remaining > 0:
+            # file shrank underneath us; close the body rather than hang
+            await send({"type": "http.response.body", "body": b""})
+
+
+def media_response(f: MediaFile, request_headers: Mapping[str, str], method: str = "GET",
+                   x_accel_prefix: Optional[str] = MEDIA_X_ACCEL_PREFIX) -> Response:
+    """304 / 206 / 416 / 200 for one resolved file, per the request's conditional headers."""
+    headers = {
+        "etag": f.etag,
+        "last-modified": f.last_modified,
+        "cache-control": f.cache_control,
+        "accept-ranges": "bytes",
+    }
+    if is_not_modified(request_headers, f):
+        return Response(status_code=304, headers=headers)
+
+    if x_accel_prefix and method == "GET":
+        # nginx handles Range and the body; we only supplied validators + caching
+        headers["content-type"] = f.content_type
+        headers["x-accel-redirect"] = f"{x_accel_prefix.rstrip('/')}/{f.rel}"
+        return Response(status_code=200, headers=headers)
+
+    byte_range = None
+    if method == "GET" and _if_range_ok(request_headers.get("if-range"), f):
+        try:
+            byte_range = parse_range(request_headers.get("range"), f.size)
+        except RangeNotSatisfiable:
+            headers["content-range"] = f"bytes */{f.size}"
+            return Response(status_code=416, headers=headers)
+
+    headers["content-type"] = f.content_type
+    send_body = method != "HEAD"
+    if byte_range is None:
+        headers["content-length"] = str(f.size)
+        return FileSpanResponse(f.path, 0, f.size, 200, headers,
+                                send_body=send_body, whole_file=True)
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{f.size}"
+    headers["content-length"] = str(end - start + 1)
+    return FileSpanResponse(f.path, start, end - start + 1, 206, headers, send_body=send_body)
@@ -0,0 +1,342 @@
+# app/metrics.py
+"""
+Per-process request metrics in the Prometheus text format (GET /metrics).
+
+  * MetricsMiddleware: latency/size histograms and counts per (method, route
+    template), requests in flight, DB queries and DB time per request
+  * SQLAlchemy cursor events on every Engine: query count/time, attributed
+    to the current request through a ContextVar (the threadpool used for
+    sync handlers and the asyncio greenlets both carry it over)
+  * span()/timed(): named spans (auth, crud, serialize)
+  * requests slower than METRICS_SLOW_REQUEST_MS are logged with the SQL
+    they issued (statements only, never parameters)
+
+Recording is a bisect plus a few additions under a lock; rendering happens
+only when /metrics is scraped. Each worker process keeps its own numbers,
+so scrape every worker (or run one per port).
+"""
+from __future__ import annotations
+
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import METRICS_SLOW_REQUEST_MS
+
+log = logging.getLogger(__name__)
+
+METRICS_SLOW_MAX_STATEMENTS = 50
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ======================
+# Metric types
+# ======================
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # label values -> per-bucket counts (+Inf last), then the sum
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_num(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+REQUESTS = Counter("http_requests_total", "HTTP requests.", ("method", "route", "status"))
+LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "HTTP response body size.",
+                          ("method", "route"), SIZE_BUCKETS)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served.")
+REQUEST_QUERIES = Histogram("http_request_db_queries", "DB queries issued per HTTP request.",
+                            ("route",), COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "DB time per HTTP request.", ("route",))
+QUERIES = Counter("db_queries_total", "DB statements executed (all callers).")
+QUERY_SECONDS = Histogram("db_query_duration_seconds", "DB statement latency (all callers).")
+SPANS = Histogram("span_duration_seconds", "Time spent in named spans.", ("span", "name"))
+
+
+# ======================
+# Per-request context
+# ======================
+
+@dataclass
+class RequestMetrics:
+    started: float
+    queries: int = 0
+    db_seconds: float = 0.0
+    statements: List[Tuple[float, str]] = field(default_factory=list)   # (seconds, SQL)
+    spans: Dict[str, float] = field(default_factory=dict)               # "kind:name" -> seconds
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def current_request() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def record_span(kind: str, name: str, seconds: float) -> None:
+    SPANS.observe((kind, name), seconds)
+    req = _current.get()
+    if req is not None:
+        key = f"{kind}:{name}"
+        req.spans[key] = req.spans.get(key, 0.0) + seconds
+
+
+@contextmanager
+def span(kind: str, name: str = ""):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(kind, name, time.perf_counter() - started)
+
+
+def timed(kind: str) -> Callable:
+    """Decorator: record each call of a (sync or async) function as a span."""
+    def decorate(fn):
+        name = fn.__name__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    record_span(kind, name, time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_span(kind, name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+# ======================
+# SQLAlchemy events
+# ======================
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    QUERIES.inc()
+    QUERY_SECONDS.observe((), elapsed)
+    req = _current.get()
+    if req is not None:
+        req.queries += 1
+        req.db_seconds += elapsed
+        if METRICS_SLOW_REQUEST_MS and len(req.statements) < METRICS_SLOW_MAX_STATEMENTS:
+            req.statements.append((elapsed, statement))
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # the statement failed: after_cursor_execute will not run for it
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+# ======================
+# Middleware
+# ======================
+
+def _route_label(scope: Scope) -> str:
+    # FastAPI puts the matched route in the scope; templates keep cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        req = RequestMetrics(started=time.perf_counter())
+        token = _current.set(req)
+        status, size, declared = 500, 0, None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, size, declared
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name.lower() == b"content-length":
+                        declared = int(value)
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            _current.reset(token)
+            elapsed = time.perf_counter() - req.started
+            method, route = scope["method"], _route_label(scope)
+            REQUESTS.inc((method, route, str(status)))
+            LATENCY.observe((method, route), elapsed)
+            # sendfile-style responses (zerocopysend/pathsend) only declare their size
+            RESPONSE_SIZE.observe((method, route), declared if declared is not None else size)
+            REQUEST_QUERIES.observe((route,), req.queries)
+            REQUEST_DB_SECONDS.observe((route,), req.db_seconds)
+            if METRICS_SLOW_REQUEST_MS and elapsed * 1000 >= METRICS_SLOW_REQUEST_MS:
+                _log_slow(method, scope.get("path", ""), route, status, elapsed, req)
+
+
+def _log_slow(method: str, path: str, route: str, status: int, elapsed: float,
+              req: RequestMetrics) -> None:
+    spans = ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in sorted(req.spans.items()))
+    lines = [
+        f"Slow request {method} {path} ({route}) -> {status} in {elapsed * 1000:.1f} ms; "
+        f"{req.queries} queries, {req.db_seconds * 1000:.1f} ms in DB; spans: {spans or '-'}"
+    ]
+    lines += [f"  {secs * 1000:8.2f} ms  {' '.join(sql.split())}" for secs, sql in req.statements]
+    if req.queries > len(req.statements):
+        lines.append(f"  ... {req.queries - len(req.statements)} more statements")
+    log.warning("\n".join(lines))
+
+
+# ======================
+# Exposition
+# ======================
+
+_POOL_FAMILIES = (
+    ("db_pool_checkouts_total", "counter", "Connections checked out of the pool.", "checkouts"),
+    ("db_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection.",
+     "wait_seconds_total"),
+    ("db_pool_checked_out", "gauge", "Connections currently checked out.", "checked_out"),
+)
+
+
+def _pool_lines() -> List[str]:
+    from .database import pool_metrics   # lazy: importing it creates the engines
+
+    pools = pool_metrics()
+    lines: List[str] = []
+    for name, kind, help, key in _POOL_FAMILIES:
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        lines += [f"{name}{_labels(('pool',), (pool,))} {_num(stats[key])}"
+                  for pool, stats in pools.items() if key in stats]
+    return lines
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    lines += _pool_lines()
+    return "\n".join(lines) + "\n"
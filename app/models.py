@@ -3,6 +3,7 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional, List
 
+from sqlalchemy import Column, ForeignKey, Index, Integer, UniqueConstraint, text
 from sqlmodel import SQLModel, Field, Relationship
 
 
@@ -20,8 +21,20 @@ class User(SQLModel, table=True):
         from_attributes = True
 
 
+# Full-text document of a video (title holds the Pixabay tags). app/search.py
+# queries this exact expression so Postgres can use the GIN index below.
+VIDEO_SEARCH_DOCUMENT = "to_tsvector('simple'::regconfig, title || ' ' || coalesce(description, ''))"
+
+
 class Video(SQLModel, table=True):
     __tablename__ = "video"
+    __table_args__ = (
+        # keyset pagination of the feed: ORDER BY uploaded_at DESC, id DESC
+        Index("ix_video_uploaded_at_id", "uploaded_at", "id"),
+        # GET /videos/search; other backends use the in-process index instead
+        Index("ix_video_search", text(VIDEO_SEARCH_DOCUMENT),
+              postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     pixabay_id: int = Field(unique=True, index=True)
@@ -49,12 +62,21 @@ class ActionEnum(str, Enum):
 
 class Interaction(SQLModel, table=True):
     __tablename__ = "interactions"
+    __table_args__ = (
+        # one row per (user, video, action); crud.create_interaction relies on it
+        UniqueConstraint("user_id", "video_id", "action", name="uq_interactions_user_video_action"),
+        # user history: WHERE user_id = ? ORDER BY timestamp DESC, id DESC (keyset order)
+        Index("ix_interactions_user_id_timestamp_id", "user_id", "timestamp", "id"),
+        # video events: WHERE video_id = ? [AND action IN (...)] ORDER BY timestamp DESC
+        Index("ix_interactions_video_id_action_timestamp", "video_id", "action", "timestamp"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
 
     # Foreign keys only; no relationship() / Relationship()
-    user_id: int = Field(foreign_key="users.id", index=True)
-    video_id: int = Field(foreign_key="video.id", index=True)
+    # (single-column indexes are covered by the composite ones above)
+    user_id: int = Field(foreign_key="users.id")
+    video_id: int = Field(foreign_key="video.id")
 
     action: ActionEnum
     timestamp: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -64,3 +86,33 @@ class Interaction(SQLModel, table=True):
 
     class Config:
         from_attributes = True
+
+
+class VideoStats(SQLModel, table=True):
+    """Per-video engagement aggregate, maintained by app/stats.py (not by request handlers)."""
+    __tablename__ = "video_stats"
+
+    # the stats row goes with its video
+    video_id: int = Field(
+        sa_column=Column(Integer, ForeignKey("video.id", ondelete="CASCADE"), primary_key=True)
+    )
+    views: int = 0
+    likes: int = 0
+    completes: int = 0
+    bookmarks: int = 0
+    shares: int = 0
+    unique_viewers: int = 0        # distinct users with any interaction on the video
+    last_interaction_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Config:
+        from_attributes = True
+
+
+class StatsWatermark(SQLModel, table=True):
+    """Highest Interaction.id already folded into an aggregate table, per aggregate."""
+    __tablename__ = "stats_watermark"
+
+    name: str = Field(primary_key=True)
+    last_id: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
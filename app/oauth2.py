@@ -12,19 +12,24 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 def create_access_token(data: dict):
     to_encode = data.copy()
-    to_encode["exp"] = datetime.utcnow() + timedelta(minutes=EXPIRATION_MINUTES)
+    now = datetime.utcnow()
+    to_encode["iat"] = now     # lets deps tell tokens issued before a user change
+    to_encode["exp"] = now + timedelta(minutes=EXPIRATION_MINUTES)
 
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-# Verify the access token
-def verify_access_token(token: str, credentials_exception):
+# Verify the access token and return all of its claims
+def decode_access_token(token: str, credentials_exception) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        id: str = payload.get("user_id")
-        if id is None:
-            raise credentials_exception
-        token_data = TokenData(id=str(id))
     except JWTError:
         raise credentials_exception
-    return token_data
+    if payload.get("user_id") is None:
+        raise credentials_exception
+    return payload
+
+# Verify the access token
+def verify_access_token(token: str, credentials_exception):
+    payload = decode_access_token(token, credentials_exception)
+    return TokenData(id=str(payload["user_id"]))
 
@@ -0,0 +1,79 @@
+# app/pagination.py
+"""
+Opaque keyset (cursor) tokens.
+
+A cursor encodes the sort key of the last row on a page, e.g.
+(uploaded_at, id) for videos; the next page starts strictly after it, so
+deep pages cost the same as the first one (no OFFSET scan).
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Query, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 100   # upper bound for `limit` on paged list endpoints
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> list:
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+    if not isinstance(values, list):
+        raise ValueError("Malformed cursor")
+    return values
+
+
+def decode_time_cursor(token: str) -> Tuple[datetime, int]:
+    """(timestamp, id) cursor used by videos and interactions."""
+    values = decode_cursor(token)
+    try:
+        ts, row_id = values
+        return datetime.fromisoformat(ts), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+
+
+def decode_id_cursor(token: str) -> int:
+    values = decode_cursor(token)
+    try:
+        (row_id,) = values
+        return int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+
+
+# ---- FastAPI dependencies ----
+
+def _bad_cursor() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def time_cursor(cursor: Optional[str] = Query(None)) -> Optional[Tuple[datetime, int]]:
+    if cursor is None:
+        return None
+    try:
+        return decode_time_cursor(cursor)
+    except ValueError:
+        raise _bad_cursor()
+
+def id_cursor(cursor: Optional[str] = Query(None)) -> Optional[int]:
+    if cursor is None:
+        return None
+    try:
+        return decode_id_cursor(cursor)
+    except ValueError:
+        raise _bad_cursor()
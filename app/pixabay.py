@@ -1,28 +1,44 @@
 import time
 import argparse
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, Tuple, Optional
+from typing import Dict, Iterable, List, Tuple, Optional
 
 import requests
-from sqlmodel import Session
+from sqlmodel import Session, select
+from app.config import MEDIA_ROOT
 from app.database import engine
+from app.models import Video
 from app.schemas import VideoCreate
-from app.crud import create_or_update_video
+from app.crud import bulk_upsert_videos
+from app.thumbnails import THUMB_PREGENERATE, parse_variants, pregenerate
 import math
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+log = logging.getLogger(__name__)
+
+# connections kept per host by the shared session (>= download concurrency)
+HTTP_POOL_SIZE = 32
+
 # one shared session with retries (handles 429/5xx gracefully)
 _session = requests.Session()
 _adapter = HTTPAdapter(max_retries=Retry(
     total=3, backoff_factor=0.5,
     status_forcelist=(429, 500, 502, 503, 504)
-))
+), pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
 _session.mount("https://", _adapter)
 _session.mount("http://", _adapter)
 
-MEDIA_ROOT = Path("/var/app/media")
 THUMBS_DIR = MEDIA_ROOT / "thumbs"
 CLIPS_DIR  = MEDIA_ROOT / "clips"
 
@@ -32,18 +48,105 @@ def ensure_dirs():
     THUMBS_DIR.mkdir(parents=True, exist_ok=True)
     CLIPS_DIR.mkdir(parents=True, exist_ok=True)
 
-def _download(url: str, dest: Path, retries: int = 3, timeout: int = 30) -> None:
+# ======================
+# Resumable downloads
+# ======================
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+def _meta_path(dest: Path) -> Path:
+    # sidecar with source url, size and sha256: <dir>/.meta/<name>.json
+    return dest.parent / ".meta" / f"{dest.name}.json"
+
+def read_meta(dest: Path) -> Optional[dict]:
+    try:
+        return json.loads(_meta_path(dest).read_text())
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(dest: Path, meta: dict) -> None:
+    path = _meta_path(dest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, path)
+
+def _sha256_file(path: Path, hasher=None):
+    hasher = hasher or hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+    return hasher
+
+def _download(url: str, dest: Path, retries: int = 3, timeout: int = 30) -> int:
+    """
+    Download url to dest via `<dest>.part`: resume an existing partial file
+    with a Range request, check the byte count against Content-Length /
+    Content-Range, record size + sha256 in the sidecar, then rename into
+    place atomically. Returns the bytes fetched by this call.
+    """
+    part = dest.with_name(dest.name + ".part")
+    # url first, so verify_media can resume a .part left behind by a crash
+    _write_meta(dest, {"url": url})
+    fetched = 0
     for attempt in range(retries):
-        r = requests.get(url, stream=True, timeout=timeout)
-        if r.status_code == 200:
-            with open(dest, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            return
-        time.sleep(1 + attempt)
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with _session.get(url, stream=True, timeout=timeout, headers=headers) as r:
+                if r.status_code == 416:
+                    # stale/oversized partial file: start over
+                    part.unlink(missing_ok=True)
+                    continue
+                if r.status_code == 206:
+                    m = _CONTENT_RANGE.match(r.headers.get("Content-Range", ""))
+                    if not m or int(m.group(1)) != offset:
+                        part.unlink(missing_ok=True)
+                        continue
+                    expected = int(m.group(3)) if m.group(3) != "*" else None
+                    hasher = _sha256_file(part)
+                    mode = "ab"
+                elif r.status_code == 200:
+                    length = r.headers.get("Content-Length")
+                    expected = int(length) if length and length.isdigit() else None
+                    hasher = hashlib.sha256()
+                    mode = "wb"
+                else:
+                    time.sleep(1 + attempt)
+                    continue
+
+                with open(part, mode) as f:
+                    for chunk in r.iter_content(chunk_size=64 * 1024):
+                        if chunk:
+                            f.write(chunk)
+                            hasher.update(chunk)
+                            fetched += len(chunk)
+        except requests.RequestException:
+            time.sleep(1 + attempt)
+            continue
+
+        size = part.stat().st_size
+        if expected is not None and size != expected:
+            # truncated transfer; the next attempt resumes from `size`
+            time.sleep(1 + attempt)
+            continue
+        _write_meta(dest, {"url": url, "size": size, "sha256": hasher.hexdigest()})
+        os.replace(part, dest)
+        return fetched
     raise RuntimeError(f"Failed to download {url} -> {dest}")
 
+def verify_file(dest: Path) -> bool:
+    """True when dest exists and matches the size + sha256 recorded at download time."""
+    meta = read_meta(dest)
+    if not dest.exists():
+        return False
+    if not meta or "sha256" not in meta:
+        return dest.stat().st_size > 0   # imported before checksums were recorded
+    return (
+        dest.stat().st_size == meta["size"]
+        and _sha256_file(dest).hexdigest() == meta["sha256"]
+    )
+
 def _safe_name(px_id: int, ext: str) -> str:
     return f"{px_id}{ext}"
 
@@ -76,16 +179,27 @@ def build_thumb_from_picture_id(hit: dict, w: int = 640, h: int = 360) -> Option
         return f"https://i.vimeocdn.com/video/{pid}_{w}x{h}.jpg"
     return None
 
+# API calls from every thread share one rate-limit window
+_rate_lock = threading.Lock()
+_rate_not_before = 0.0   # time.monotonic() before which no API call may start
+
 def _respect_rate_limit(resp):
     # Pixabay returns these (case-insensitive)
+    global _rate_not_before
     try:
         remaining = int(resp.headers.get("X-RateLimit-Remaining", "100"))
         reset = int(resp.headers.get("X-RateLimit-Reset", "0"))
     except ValueError:
         return
     if remaining <= 1:
-        # sleep until the window resets (plus a tiny buffer)
-        time.sleep(reset + 1)
+        # hold every caller until the window resets (plus a tiny buffer)
+        with _rate_lock:
+            _rate_not_before = max(_rate_not_before, time.monotonic() + reset + 1)
+
+def _wait_for_rate_limit():
+    delay = _rate_not_before - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
 
 
 def fetch_pixabay_page(query: str, page: int, per_page: int = 20) -> dict:
@@ -101,11 +215,25 @@ def fetch_pixabay_page(query: str, page: int, per_page: int = 20) -> dict:
         "lang": "en",
     }
     url = "https://pixabay.com/api/videos/"
-    r = requests.get(url, params=params, timeout=30)
+    _wait_for_rate_limit()
+    r = _session.get(url, params=params, timeout=30)
     r.raise_for_status()
     _respect_rate_limit(r)
     return r.json()
 
+def fetch_pixabay_hit(px_id: int) -> Optional[dict]:
+    """Look a single video up by its Pixabay id (used to re-fetch lost media)."""
+    _wait_for_rate_limit()
+    r = _session.get(
+        "https://pixabay.com/api/videos/",
+        params={"key": PIXABAY_API_KEY, "id": px_id},
+        timeout=30,
+    )
+    r.raise_for_status()
+    _respect_rate_limit(r)
+    hits = r.json().get("hits", [])
+    return hits[0] if hits else None
+
 def iterate_hits(query: str, pages: int, per_page: int) -> Iterable[dict]:
     first = fetch_pixabay_page(query, 1, per_page)
     for hit in first.get("hits", []):
@@ -122,57 +250,295 @@ def iterate_hits(query: str, pages: int, per_page: int) -> Iterable[dict]:
             yield hit
 
 
-def ingest_query(query: str, pages: int = 1, per_page: int = 20) -> int:
+def prepare_hit(hit: dict) -> Tuple[VideoCreate, int]:
+    """Download the hit's media (if missing) and build its VideoCreate; returns (payload, bytes)."""
+    px_id = int(hit["id"])
+    title = hit.get("tags") or f"Pixabay {px_id}"
+    description = f'By {hit.get("user")}' if hit.get("user") else None
+
+    # UPDATED: get clip & thumb from video renditions (not previewURL)
+    clip_remote, thumb_remote = choose_clip_and_thumb(hit["videos"])
+    if not thumb_remote:
+        # fallback to previewURL if present, else build from picture_id
+        thumb_remote = hit.get("previewURL") or build_thumb_from_picture_id(hit)
+
+    # Local filenames
+    thumb_name = _safe_name(px_id, ".jpg")
+    clip_name  = _safe_name(px_id, ".mp4")
+
+    thumb_dest = THUMBS_DIR / thumb_name
+    clip_dest  = CLIPS_DIR / clip_name
+
+    # Download only if missing (idempotent)
+    downloaded = 0
+    if thumb_remote and not thumb_dest.exists():
+        downloaded += _download(thumb_remote, thumb_dest)
+    if clip_remote and not clip_dest.exists():
+        downloaded += _download(clip_remote, clip_dest)
+
+    # Local URLs served by FastAPI/Nginx
+    local_thumb_url = f"/media/thumbs/{thumb_name}" if thumb_remote else None
+    local_clip_url  = f"/media/clips/{clip_name}"
+
+    payload = VideoCreate(
+        pixabay_id=px_id,
+        title=title,
+        description=description,
+        source_url=local_clip_url,
+        thumb_url=local_thumb_url,
+    )
+    return payload, downloaded
+
+
+# ======================
+# Pipelined importer
+# ======================
+
+@dataclass
+class IngestStats:
+    imported: int = 0
+    failed: int = 0
+    bytes_downloaded: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        secs = max(self.seconds, 1e-9)
+        return (
+            f"{self.imported} imported, {self.failed} failed in {self.seconds:.1f}s "
+            f"({self.imported / secs:.1f} videos/s, "
+            f"{self.bytes_downloaded / secs / 1e6:.1f} MB/s)"
+        )
+
+_DONE = object()
+
+def ingest_queries(
+    queries: List[str],
+    pages: int = 1,
+    per_page: int = 20,
+    concurrency: int = 8,
+    batch_size: int = 50,
+    thumb_variants: Optional[List[Tuple[int, str]]] = None,
+) -> IngestStats:
+    """
+    Three stages connected by bounded queues (a full queue blocks the stage
+    before it, so memory stays flat):
+
+      page fetcher (1 thread, shared rate limit)
+        -> `concurrency` download workers (shared HTTP session)
+        -> DB writer (this thread), one bulk upsert per `batch_size` videos
+
+    `thumb_variants` [(width, fmt), ...] are rendered by the download workers
+    right after the thumbnail lands, so the first feed request is a cache hit.
+    """
+    ensure_dirs()
+    stats = IngestStats()
+    started = time.perf_counter()
+    hits_q: "queue.Queue" = queue.Queue(maxsize=concurrency * 2)
+    rows_q: "queue.Queue" = queue.Queue(maxsize=batch_size * 2)
+    abort = threading.Event()   # set when the DB writer fails; stages wind down
+
+    def fetch_pages():
+        try:
+            for q in queries:
+                for hit in iterate_hits(q, pages, per_page):
+                    if abort.is_set():
+                        return
+                    hits_q.put(hit)
+        except Exception:
+            log.exception("Page fetch failed; importing what was fetched so far")
+        finally:
+            for _ in range(concurrency):
+                hits_q.put(_DONE)
+
+    def download_worker():
+        while True:
+            hit = hits_q.get()
+            if hit is _DONE:
+                rows_q.put(_DONE)
+                return
+            if abort.is_set():
+                rows_q.put(None)
+                continue
+            try:
+                item = prepare_hit(hit)
+            except Exception:
+                log.exception("Skipping Pixabay hit %s", hit.get("id"))
+                rows_q.put(None)
+                continue
+            if thumb_variants:
+                _pregenerate_thumbs(int(hit["id"]), thumb_variants)
+            rows_q.put(item)
+
+    fetcher = threading.Thread(target=fetch_pages, name="pixabay-pages", daemon=True)
+    fetcher.start()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="pixabay-dl") as pool:
+        for _ in range(concurrency):
+            pool.submit(download_worker)
+
+        finished = 0
+        pending: List[VideoCreate] = []
+        error = None
+        with Session(engine) as db:
+            while finished < concurrency:
+                item = rows_q.get()
+                if item is _DONE:
+                    finished += 1
+                    continue
+                if item is None:
+                    stats.failed += 1
+                    continue
+                if error is not None:
+                    continue   # keep draining so the workers can exit
+                payload, nbytes = item
+                pending.append(payload)
+                stats.bytes_downloaded += nbytes
+                if len(pending) >= batch_size:
+                    try:
+                        stats.imported += _write_batch(db, pending)
+                    except Exception as exc:
+                        error = exc
+                        abort.set()
+                    pending = []
+            if pending and error is None:
+                stats.imported += _write_batch(db, pending)
+    fetcher.join()
+    if error is not None:
+        raise error
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+def _write_batch(db: Session, payloads: List[VideoCreate]) -> int:
+    # one INSERT ... ON CONFLICT DO UPDATE and one commit per batch
+    return len(bulk_upsert_videos(db, payloads))
+
+def _pregenerate_thumbs(px_id: int, variants: List[Tuple[int, str]]) -> None:
+    thumb = THUMBS_DIR / _safe_name(px_id, ".jpg")
+    if not thumb.exists():
+        return
+    try:
+        pregenerate(thumb, variants)
+    except Exception:
+        # a bad thumbnail is still imported; the variant endpoint falls back to it
+        log.exception("Thumbnail variants failed for %s", thumb)
+
+def ingest_query(query: str, pages: int = 1, per_page: int = 20, concurrency: int = 8,
+                 pregenerate_thumbs: bool = False) -> int:
+    variants = parse_variants(THUMB_PREGENERATE) if pregenerate_thumbs else None
+    return ingest_queries([query], pages, per_page, concurrency, thumb_variants=variants).imported
+
+# ======================
+# verify-media
+# ======================
+
+@dataclass
+class VerifyStats:
+    ok: int = 0
+    repaired: int = 0
+    failed: int = 0
+
+def _repair_from_meta(dest: Path) -> bool:
+    meta = read_meta(dest)
+    if not meta or not meta.get("url"):
+        return False
+    if dest.exists():
+        # corrupt complete file: drop it (a .part, if any, is resumed)
+        dest.unlink()
+    _download(meta["url"], dest)
+    return verify_file(dest)
+
+def _check(dest: Path) -> str:
+    if verify_file(dest):
+        return "ok"
+    try:
+        return "repaired" if _repair_from_meta(dest) else "unrepairable"
+    except Exception:
+        log.exception("Re-fetch failed for %s", dest)
+        return "failed"
+
+def verify_media(workers: int = 8) -> VerifyStats:
+    """
+    Check every media file the catalogue references (plus any file with a
+    sidecar) in parallel; re-download corrupt or missing ones from the
+    recorded source url, or look the video up on Pixabay when none exists.
+    """
     ensure_dirs()
-    imported = 0
     with Session(engine) as db:
-        for hit in iterate_hits(query, pages, per_page):
-            px_id = int(hit["id"])
-            title = hit.get("tags") or f"Pixabay {px_id}"
-            description = f'By {hit.get("user")}' if hit.get("user") else None
-
-            # UPDATED: get clip & thumb from video renditions (not previewURL)
-            clip_remote, thumb_remote = choose_clip_and_thumb(hit["videos"])
-            if not thumb_remote:
-                # fallback to previewURL if present, else build from picture_id
-                thumb_remote = hit.get("previewURL") or build_thumb_from_picture_id(hit)
-
-            # Local filenames
-            thumb_name = _safe_name(px_id, ".jpg")
-            clip_name  = _safe_name(px_id, ".mp4")
-
-            thumb_dest = THUMBS_DIR / thumb_name
-            clip_dest  = CLIPS_DIR / clip_name
-
-            # Download only if missing (idempotent)
-            if thumb_remote and not thumb_dest.exists():
-                _download(thumb_remote, thumb_dest)
-            if clip_remote and not clip_dest.exists():
-                _download(clip_remote, clip_dest)
-
-            # Local URLs served by FastAPI/Nginx
-            local_thumb_url = f"/media/thumbs/{thumb_name}" if thumb_remote else None
-            local_clip_url  = f"/media/clips/{clip_name}"
-
-            payload = VideoCreate(
-                pixabay_id=px_id,
-                title=title,
-                description=description,
-                source_url=local_clip_url,
-                thumb_url=local_thumb_url,
-            )
-            create_or_update_video(db, payload)
-            imported += 1
-    return imported
+        px_ids = db.exec(select(Video.pixabay_id)).all()
+
+    targets: Dict[Path, int] = {}
+    for px_id in px_ids:
+        targets[CLIPS_DIR / _safe_name(px_id, ".mp4")] = px_id
+        targets[THUMBS_DIR / _safe_name(px_id, ".jpg")] = px_id
+    for directory in (THUMBS_DIR, CLIPS_DIR):
+        for meta in (directory / ".meta").glob("*.json"):
+            name = meta.name[:-len(".json")]
+            targets.setdefault(directory / name, None)
+
+    stats = VerifyStats()
+    lookup: Dict[int, List[Path]] = {}   # px_id -> its files still bad after the sidecar pass
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify") as pool:
+        for (dest, px_id), outcome in zip(targets.items(), pool.map(_check, targets)):
+            if outcome == "ok":
+                stats.ok += 1
+            elif outcome == "repaired":
+                stats.repaired += 1
+            elif outcome == "unrepairable" and px_id is not None:
+                lookup.setdefault(px_id, []).append(dest)
+            else:
+                stats.failed += 1
+
+        # no usable sidecar: ask the API for fresh media urls and download again
+        def refetch(item: Tuple[int, List[Path]]) -> bool:
+            px_id, dests = item
+            try:
+                hit = fetch_pixabay_hit(px_id)
+                if hit is None:
+                    return False
+                for dest in dests:
+                    dest.unlink(missing_ok=True)   # prepare_hit only fetches missing files
+                prepare_hit(hit)
+            except Exception:
+                log.exception("Pixabay re-fetch failed for %s", px_id)
+                return False
+            # e.g. a hit without any thumbnail url leaves the thumb missing
+            return all(verify_file(dest) for dest in dests)
+
+        items = sorted(lookup.items())
+        for (_, dests), ok in zip(items, pool.map(refetch, items)):
+            if ok:
+                stats.repaired += len(dests)
+            else:
+                stats.failed += len(dests)
+    return stats
 
 def main():
     parser = argparse.ArgumentParser(description="Import Pixabay videos")
-    parser.add_argument("--query", required=True, help="Search term (e.g., 'nature')")
+    parser.add_argument("--query", action="append",
+                        help="Search term (e.g., 'nature'); repeat for several queries")
     parser.add_argument("--pages", type=int, default=1)
     parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Parallel media downloads")
+    parser.add_argument("--batch-size", type=int, default=50,
+                        help="Videos per DB transaction")
+    parser.add_argument("--thumb-variants", nargs="?", const=THUMB_PREGENERATE, default=None,
+                        help="Pre-render thumbnail variants, e.g. '320:webp,480:webp' "
+                             "(no value: THUMB_PREGENERATE)")
+    parser.add_argument("--verify-media", action="store_true",
+                        help="Check THUMBS_DIR/CLIPS_DIR and re-fetch corrupt or missing files")
     args = parser.parse_args()
-    n = ingest_query(args.query, args.pages, args.per_page)
-    print(f"Imported/updated {n} items for query='{args.query}'")
+
+    if args.verify_media:
+        result = verify_media(args.concurrency)
+        print(f"verify-media: {result.ok} ok, {result.repaired} repaired, {result.failed} failed")
+        return
+    if not args.query:
+        parser.error("--query is required unless --verify-media is given")
+
+    variants = parse_variants(args.thumb_variants) if args.thumb_variants else None
+    stats = ingest_queries(args.query, args.pages, args.per_page,
+                           args.concurrency, args.batch_size, thumb_variants=variants)
+    print(f"Imported/updated for queries={args.query}: {stats.summary()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,840 @@
+# app/recommender.py
+"""
+Item-item collaborative filtering over the interactions table, and the
+candidate pipeline that blends it with the other sources.
+
+Offline:  build a sparse user x video matrix R from Interaction rows, compute
+          cosine similarity S = norm(R)^T norm(R) and keep the top-N
+          neighbours of every video.
+Online:   scores(user) = R[user] @ S  -> one sparse row times a sparse matrix.
+          recommend() runs it next to co-view, embedding, popular and recent
+          candidates and blends them (see "Candidate pipeline").
+"""
+from __future__ import annotations
+
+import argparse
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sqlmodel import Session, select
+
+from .cache import recommendation_cache, seen_cache
+from .config import (
+    RECO_MODEL_PATH, RECO_MODEL_RELOAD_INTERVAL, RECO_PIPELINE_BUDGET_MS, RECO_PIPELINE_WORKERS,
+    RECO_STATE_PATH,
+)
+from .crud import committed_interaction_id
+from .metrics import Counter, record_span
+from .models import ActionEnum, Interaction
+
+log = logging.getLogger(__name__)
+
+# Implicit-feedback strength per action: view < like < bookmark/share < complete
+ACTION_WEIGHTS: Dict[ActionEnum, float] = {
+    ActionEnum.view: 1.0,
+    ActionEnum.like: 3.0,
+    ActionEnum.bookmark: 4.0,
+    ActionEnum.share: 4.0,
+    ActionEnum.complete: 5.0,
+}
+
+DEFAULT_NEIGHBOURS = 50
+
+
+# ======================
+# Matrix building
+# ======================
+
+def action_weights(actions: np.ndarray) -> np.ndarray:
+    """Map an array of ActionEnum/str values to float32 weights."""
+    lookup = {a.value: w for a, w in ACTION_WEIGHTS.items()}
+    return np.fromiter(
+        (lookup[getattr(a, "value", a)] for a in actions),
+        dtype=np.float32,
+        count=len(actions),
+    )
+
+
+def load_interactions(db: Session) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pull (user_id, video_id, weight) columns for every interaction.
+    Only the three columns are selected; no ORM objects are built.
+    """
+    stmt = select(Interaction.user_id, Interaction.video_id, Interaction.action)
+    rows = db.exec(stmt).all()
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    users, videos, actions = zip(*rows)
+    return (
+        np.asarray(users, dtype=np.int64),
+        np.asarray(videos, dtype=np.int64),
+        action_weights(np.asarray(actions, dtype=object)),
+    )
+
+
+def build_user_item_matrix(
+    user_ids: np.ndarray, video_ids: np.ndarray, weights: np.ndarray
+) -> Tuple[sp.csr_matrix, np.ndarray, np.ndarray]:
+    """
+    Return (R, row_user_ids, col_video_ids).
+    Several actions on the same (user, video) pair are summed.
+    """
+    row_users, rows = np.unique(user_ids, return_inverse=True)
+    col_videos, cols = np.unique(video_ids, return_inverse=True)
+    R = sp.coo_matrix(
+        (weights.astype(np.float32), (rows, cols)),
+        shape=(len(row_users), len(col_videos)),
+    ).tocsr()
+    R.sum_duplicates()
+    return R, row_users, col_videos
+
+
+def top_k_per_row(M: sp.csr_matrix, k: int) -> sp.csr_matrix:
+    """
+    Keep the k largest entries of every row, fully vectorized:
+    sort all non-zeros by (row, -value) and drop those ranked >= k.
+    """
+    M = M.tocsr()
+    M.eliminate_zeros()
+    if M.nnz == 0:
+        return M
+    row_of = np.repeat(np.arange(M.shape[0]), np.diff(M.indptr))
+    order = np.lexsort((-M.data, row_of))
+    rank = np.arange(M.nnz) - M.indptr[row_of[order]]
+    keep = order[rank < k]
+    pruned = sp.csr_matrix(
+        (M.data[keep], (row_of[keep], M.indices[keep])), shape=M.shape
+    )
+    pruned.sort_indices()
+    return pruned
+
+
+def cosine_neighbours(C: sp.spmatrix, k: int = DEFAULT_NEIGHBOURS) -> sp.csr_matrix:
+    """
+    Turn an item x item co-occurrence matrix C = R^T R into a cosine
+    similarity matrix pruned to the top-k neighbours per item.
+    """
+    C = C.tocsr().astype(np.float32)
+    norms = np.sqrt(C.diagonal())
+    inv = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    S = sp.diags(inv) @ C @ sp.diags(inv)
+    S = S.tocsr()
+    S.setdiag(0)
+    return top_k_per_row(S, k)
+
+
+# ======================
+# Model
+# ======================
+
+@dataclass
+class ItemItemModel:
+    R: sp.csr_matrix                 # users x videos, interaction weights
+    S: sp.csr_matrix                 # videos x videos, top-N cosine neighbours
+    user_ids: np.ndarray             # row -> User.id
+    video_ids: np.ndarray            # col -> Video.id
+    version: int = field(default_factory=lambda: time.time_ns())
+    _user_row: Dict[int, int] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        if not self._user_row:
+            self._user_row = {int(u): i for i, u in enumerate(self.user_ids)}
+
+    @property
+    def n_videos(self) -> int:
+        return len(self.video_ids)
+
+    def scores(self, user_id: int) -> Optional[np.ndarray]:
+        """Dense score vector over all videos, or None for unknown users."""
+        row = self._user_row.get(user_id)
+        if row is None:
+            return None
+        return np.asarray((self.R[row] @ self.S).todense()).ravel()
+
+    def recommend(
+        self, user_id: int, k: int = 20, exclude_seen: bool = True
+    ) -> List[int]:
+        """Top-k Video.id values for a user ([] when there is no history)."""
+        scores = self.scores(user_id)
+        if scores is None:
+            return []
+        if exclude_seen:
+            row = self._user_row[user_id]
+            seen = self.R.indices[self.R.indptr[row]:self.R.indptr[row + 1]]
+            scores[seen] = 0.0
+
+        candidates = np.flatnonzero(scores > 0)
+        if candidates.size == 0:
+            return []
+        if candidates.size > k:
+            part = np.argpartition(-scores[candidates], k - 1)[:k]
+            candidates = candidates[part]
+        best = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return self.video_ids[best].tolist()
+
+    # ---- persistence (precomputed offline, loaded by the API workers) ----
+
+    def save(self, path: Path) -> None:
+        """Write next to `path`, then os.replace: a worker loading meanwhile sees the old file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                R_data=self.R.data, R_indices=self.R.indices, R_indptr=self.R.indptr,
+                R_shape=np.asarray(self.R.shape),
+                S_data=self.S.data, S_indices=self.S.indices, S_indptr=self.S.indptr,
+                S_shape=np.asarray(self.S.shape),
+                user_ids=self.user_ids,
+                video_ids=self.video_ids,
+                version=np.asarray(self.version, dtype=np.int64),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ItemItemModel":
+        with np.load(Path(path)) as z:
+            R = sp.csr_matrix(
+                (z["R_data"], z["R_indices"], z["R_indptr"]), shape=tuple(z["R_shape"])
+            )
+            S = sp.csr_matrix(
+                (z["S_data"], z["S_indices"], z["S_indptr"]), shape=tuple(z["S_shape"])
+            )
+            return cls(
+                R=R, S=S,
+                user_ids=z["user_ids"],
+                video_ids=z["video_ids"],
+                version=int(z["version"]),
+            )
+
+
+def fit(
+    user_ids: np.ndarray,
+    video_ids: np.ndarray,
+    weights: np.ndarray,
+    neighbours: int = DEFAULT_NEIGHBOURS,
+) -> ItemItemModel:
+    R, row_users, col_videos = build_user_item_matrix(user_ids, video_ids, weights)
+    S = cosine_neighbours(R.T @ R, neighbours)
+    return ItemItemModel(R=R, S=S, user_ids=row_users, video_ids=col_videos)
+
+
+def build_model(db: Session, neighbours: int = DEFAULT_NEIGHBOURS) -> ItemItemModel:
+    """Full offline build from the interactions table."""
+    return fit(*load_interactions(db), neighbours=neighbours)
+
+
+# ======================
+# Incremental updates
+# ======================
+
+INCREMENTAL_BATCH = 100_000
+
+
+def _index_ids(ids: np.ndarray, index: Dict[int, int], known: List[int]) -> np.ndarray:
+    """Map external ids to matrix positions, appending unseen ids to `known`."""
+    uniq, inverse = np.unique(ids, return_inverse=True)
+    pos = np.empty(len(uniq), dtype=np.int64)
+    for j, raw in enumerate(uniq.tolist()):
+        p = index.get(raw)
+        if p is None:
+            p = index[raw] = len(known)
+            known.append(raw)
+        pos[j] = p
+    return pos[inverse]
+
+
+class IncrementalState:
+    """
+    Co-occurrence state that can absorb new interactions without a rebuild.
+
+    Keeps R (users x videos) and the full, unpruned C = R^T R. A batch of new
+    rows D (same shape as R) changes C by
+
+        C' = (R + D)^T (R + D) = C + R^T D + D^T R + D^T D
+
+    i.e. one rank-1 update per new (user, video) cell, applied as a batch and
+    touching only the rows of the users in the batch. Neighbour lists are then
+    re-derived from C. `watermark` is the highest Interaction.id applied.
+
+    Deleted rows (e.g. cascaded by delete_video) are not subtracted; a full
+    rebuild (`build_model`) remains the periodic fallback.
+    """
+
+    def __init__(self):
+        self.R = sp.csr_matrix((0, 0), dtype=np.float64)
+        self.C = sp.csr_matrix((0, 0), dtype=np.float64)
+        self.user_ids: List[int] = []
+        self.video_ids: List[int] = []
+        self._user_index: Dict[int, int] = {}
+        self._video_index: Dict[int, int] = {}
+        self.watermark = 0
+
+    def apply(self, user_ids: np.ndarray, video_ids: np.ndarray, weights: np.ndarray) -> None:
+        if len(user_ids) == 0:
+            return
+        rows = _index_ids(np.asarray(user_ids), self._user_index, self.user_ids)
+        cols = _index_ids(np.asarray(video_ids), self._video_index, self.video_ids)
+        n_users, n_videos = len(self.user_ids), len(self.video_ids)
+        self.R.resize((n_users, n_videos))
+        self.C.resize((n_videos, n_videos))
+
+        D = sp.csr_matrix(
+            (np.asarray(weights, dtype=np.float64), (rows, cols)), shape=(n_users, n_videos)
+        )
+        D.sum_duplicates()
+
+        # Only the touched users contribute to the cross terms
+        touched = np.unique(rows)
+        R_t, D_t = self.R[touched], D[touched]
+        cross = R_t.T @ D_t
+        self.C = (self.C + cross + cross.T + D_t.T @ D_t).tocsr()
+        self.R = (self.R + D).tocsr()
+
+    def apply_rows(self, rows: List[tuple]) -> None:
+        """Apply (id, user_id, video_id, action) rows and advance the watermark."""
+        if not rows:
+            return
+        ids, users, videos, actions = zip(*rows)
+        self.apply(
+            np.asarray(users, dtype=np.int64),
+            np.asarray(videos, dtype=np.int64),
+            action_weights(np.asarray(actions, dtype=object)),
+        )
+        self.watermark = max(self.watermark, int(max(ids)))
+
+    def consume(self, db: Session, batch_size: int = INCREMENTAL_BATCH) -> int:
+        """
+        Apply every committed interaction with id > watermark, in id order.
+        Stops at crud.committed_interaction_id(): an id still in flight is
+        picked up by the next run instead of being skipped for good.
+        Returns the row count.
+        """
+        bound = committed_interaction_id(db)
+        applied = 0
+        while True:
+            stmt = (
+                select(Interaction.id, Interaction.user_id, Interaction.video_id, Interaction.action)
+                .where(Interaction.id > self.watermark, Interaction.id <= bound)
+                .order_by(Interaction.id)
+                .limit(batch_size)
+            )
+            rows = db.exec(stmt).all()
+            if not rows:
+                return applied
+            self.apply_rows(rows)
+            applied += len(rows)
+
+    def to_model(self, neighbours: int = DEFAULT_NEIGHBOURS) -> ItemItemModel:
+        return ItemItemModel(
+            R=self.R.astype(np.float32),
+            S=cosine_neighbours(self.C, neighbours),
+            user_ids=np.asarray(self.user_ids, dtype=np.int64),
+            video_ids=np.asarray(self.video_ids, dtype=np.int64),
+        )
+
+    # ---- persistence: state and watermark are written together, atomically ----
+
+    def save(self, path: Path = RECO_STATE_PATH) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                R_data=self.R.data, R_indices=self.R.indices, R_indptr=self.R.indptr,
+                R_shape=np.asarray(self.R.shape),
+                C_data=self.C.data, C_indices=self.C.indices, C_indptr=self.C.indptr,
+                C_shape=np.asarray(self.C.shape),
+                user_ids=np.asarray(self.user_ids, dtype=np.int64),
+                video_ids=np.asarray(self.video_ids, dtype=np.int64),
+                watermark=np.asarray(self.watermark, dtype=np.int64),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path = RECO_STATE_PATH) -> "IncrementalState":
+        state = cls()
+        with np.load(Path(path)) as z:
+            state.R = sp.csr_matrix(
+                (z["R_data"], z["R_indices"], z["R_indptr"]), shape=tuple(z["R_shape"])
+            )
+            state.C = sp.csr_matrix(
+                (z["C_data"], z["C_indices"], z["C_indptr"]), shape=tuple(z["C_shape"])
+            )
+            state.user_ids = z["user_ids"].tolist()
+            state.video_ids = z["video_ids"].tolist()
+            state.watermark = int(z["watermark"])
+        state._user_index = {u: i for i, u in enumerate(state.user_ids)}
+        state._video_index = {v: i for i, v in enumerate(state.video_ids)}
+        return state
+
+    @classmethod
+    def load_or_empty(cls, path: Path = RECO_STATE_PATH) -> "IncrementalState":
+        return cls.load(path) if Path(path).exists() else cls()
+
+
+def update_model_incremental(
+    engine,
+    neighbours: int = DEFAULT_NEIGHBOURS,
+    state_path: Path = RECO_STATE_PATH,
+    model_path: Optional[Path] = RECO_MODEL_PATH,
+) -> Tuple[ItemItemModel, int]:
+    """
+    Resume from the persisted state, apply rows past its watermark, persist
+    the new state, then publish the refreshed model. Returns (model, rows_applied).
+    """
+    state = IncrementalState.load_or_empty(state_path)
+    with Session(engine) as db:
+        applied = state.consume(db)
+    state.save(state_path)
+    model = get_model() if applied == 0 else None
+    if model is None:
+        model = state.to_model(neighbours)
+        publish_model(model, model_path)
+    return model, applied
+
+
+# ======================
+# Serving
+# ======================
+
+_model: Optional[ItemItemModel] = None
+_model_lock = threading.Lock()
+_model_path: Optional[Path] = None
+_model_file: Optional[Tuple[int, int]] = None   # (inode, mtime_ns) of the file _model came from
+_checked_at = 0.0
+_load_lock = threading.Lock()
+
+
+def _file_version(path: Path) -> Optional[Tuple[int, int]]:
+    # save() renames a new file into place, so a new model means a new inode
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def get_model() -> Optional[ItemItemModel]:
+    """
+    The serving model. The file given to load_model() is re-checked at most
+    every RECO_MODEL_RELOAD_INTERVAL seconds, so a model published by the
+    offline job or by another worker's rebuild is picked up here too.
+    """
+    if _model_path is not None and time.monotonic() - _checked_at >= RECO_MODEL_RELOAD_INTERVAL:
+        load_model(_model_path)
+    return _model
+
+
+def set_model(model: ItemItemModel) -> None:
+    """
+    Swap in a freshly built model and drop every cached result in the same
+    critical section, so no request can see the new version with old results.
+    """
+    global _model
+    with _model_lock:
+        _model = model
+        recommendation_cache.clear()
+
+
+def model_version() -> int:
+    model = get_model()
+    return model.version if model is not None else 0
+
+
+def cache_key(user_id: int) -> tuple:
+    """
+    recommendation_cache key: the user plus the version of every input the
+    pipeline reads, except the trending counters, which move every few
+    seconds; RECO_CACHE_TTL bounds how stale the popular stage can be.
+    """
+    from .ann import get_index
+    from .catalogue import catalogue
+    from .coview import get_table
+
+    index, table = get_index(), get_table()
+    return (
+        user_id,
+        model_version(),
+        catalogue.current(),
+        table.version if table is not None else None,
+        index.version if index is not None else None,
+    )
+
+
+def invalidate_user(user_id: int) -> None:
+    """Forget a user's cached recommendations (e.g. after a new interaction)."""
+    recommendation_cache.invalidate(cache_key(user_id))
+
+
+def load_model(path: Path = RECO_MODEL_PATH) -> Optional[ItemItemModel]:
+    """
+    Load the model file if it changed since the last load (and remember
+    `path` for reloads); returns the serving model, None when there is none.
+    """
+    global _model_path, _model_file, _checked_at
+    path = Path(path)
+    with _load_lock:
+        _model_path, _checked_at = path, time.monotonic()
+        version = _file_version(path)
+        if version is None or version == _model_file:
+            return _model
+        model = ItemItemModel.load(path)
+        _model_file = version
+        set_model(model)
+        return model
+
+
+def publish_model(model: ItemItemModel, path: Optional[Path] = RECO_MODEL_PATH) -> None:
+    """Persist `model` for the other workers (they reload it from `path`), then serve it here."""
+    global _model_file
+    if path is not None:
+        with _load_lock:
+            model.save(path)
+            if _model_path == Path(path):
+                _model_file = _file_version(path)   # no reload of what this process just wrote
+    set_model(model)
+
+
+def rebuild_model(engine, neighbours: int = DEFAULT_NEIGHBOURS,
+                  path: Optional[Path] = RECO_MODEL_PATH) -> ItemItemModel:
+    """Rebuild from the database, persist it for other workers, then swap it in."""
+    with Session(engine) as db:
+        model = build_model(db, neighbours)
+    publish_model(model, path)
+    return model
+
+
+def recommend_for_user(user_id: int, k: int = 20) -> List[int]:
+    model = get_model()
+    if model is None:
+        return []
+    return model.recommend(user_id, k)
+
+
+# ======================
+# Candidate pipeline
+# ======================
+#
+# recommend() = candidate generators -> blend -> seen filter.
+#
+# Every registered generator (itemitem, coview, embedding, popular, recent,
+# or any other added with @candidate_generator) is submitted to a shared
+# thread pool at once. It returns (video ids, scores) for the user. A stage
+# that has not answered within its own budget, or by the overall
+# RECO_PIPELINE_BUDGET_MS deadline, is dropped for this request (counted in
+# recommender_stage_timeouts_total), so one slow source cannot set the p99.
+# A source still busy with earlier requests on half of the pool is skipped
+# outright rather than queued.
+# Blending is vectorized: each source's scores are scaled to [0, 1],
+# weighted, and summed per video with np.unique + np.bincount. Finally, the
+# videos the user already liked or completed are removed (SeenVideos).
+#
+# A user with no history (cold start) gets nothing from the history-based
+# stages, so popular and recent fill the list on their own.
+
+PIPELINE_BUDGET = RECO_PIPELINE_BUDGET_MS / 1000   # seconds
+HISTORY_SIZE = 20           # recent distinct videos the history-based stages start from
+CANDIDATES_PER_STAGE = 200
+
+SEEN_ACTIONS = (ActionEnum.like, ActionEnum.complete)
+
+Candidates = Tuple[np.ndarray, np.ndarray]   # (video ids int64, scores float32)
+
+STAGE_TIMEOUTS = Counter("recommender_stage_timeouts_total",
+                         "Candidate stages dropped for missing their budget.", ("stage",))
+STAGE_ERRORS = Counter("recommender_stage_errors_total", "Candidate stages that raised.", ("stage",))
+
+_EMPTY: Candidates = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+
+
+@dataclass(frozen=True)
+class UserContext:
+    user_id: int
+    history: Tuple[int, ...]     # distinct video ids, most recent first; () = cold start
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    fn: Callable[[UserContext, int], Candidates]
+    weight: float
+    budget: float                # seconds
+
+
+STAGES: Dict[str, Stage] = {}
+
+
+def candidate_generator(name: str, weight: float, budget_ms: float):
+    """Register fn(ctx, n) -> (ids, scores) as a pipeline stage (replaces one of the same name)."""
+    def register(fn):
+        STAGES[name] = Stage(name, fn, weight, budget_ms / 1000)
+        return fn
+    return register
+
+
+def _ranked(ids) -> Candidates:
+    """Scores for an already ordered list: 1 for the first, decreasing linearly."""
+    ids = np.asarray(ids, dtype=np.int64)
+    return ids, np.linspace(1.0, 1.0 / max(len(ids), 1), num=len(ids), dtype=np.float32)
+
+
+def _top(ids: np.ndarray, scores: np.ndarray, n: int) -> Candidates:
+    keep = scores > 0
+    ids, scores = ids[keep], scores[keep]
+    if len(ids) > n:
+        part = np.argpartition(-scores, n - 1)[:n]
+        ids, scores = ids[part], scores[part]
+    return ids, scores.astype(np.float32)
+
+
+@candidate_generator("itemitem", weight=1.0, budget_ms=60)
+def itemitem_candidates(ctx: UserContext, n: int) -> Candidates:
+    model = get_model()
+    scores = model.scores(ctx.user_id) if model is not None else None
+    if scores is None:
+        return _EMPTY
+    row = model._user_row[ctx.user_id]
+    scores[model.R.indices[model.R.indptr[row]:model.R.indptr[row + 1]]] = 0.0
+    return _top(model.video_ids, scores, n)
+
+
+@candidate_generator("coview", weight=0.8, budget_ms=30)
+def coview_candidates(ctx: UserContext, n: int) -> Candidates:
+    from .coview import get_table
+
+    table = get_table()
+    if table is None or not ctx.history:
+        return _EMPTY
+    parts = [table.scored_for(v) for v in ctx.history[:5]]
+    # what follows the latest video counts most
+    ids = np.concatenate([p[0] for p in parts])
+    scores = np.concatenate([p[1] / (p[1][0] if len(p[1]) else 1.0) / (i + 1) for i, p in enumerate(parts)])
+    if not len(ids):
+        return _EMPTY
+    uniq, inverse = np.unique(ids, return_inverse=True)
+    summed = np.bincount(inverse, weights=scores)
+    summed[np.isin(uniq, ctx.history)] = 0.0
+    return _top(uniq, summed, n)
+
+
+@candidate_generator("embedding", weight=0.6, budget_ms=60)
+def embedding_candidates(ctx: UserContext, n: int) -> Candidates:
+    from .ann import get_index
+
+    index = get_index()
+    if index is None or not ctx.history:
+        return _EMPTY
+    vectors = index.vector_for(list(ctx.history[:10]))
+    if not len(vectors):
+        return _EMPTY
+    ids, scores = index.search(vectors.mean(axis=0), k=n, exclude=ctx.history)
+    return _top(np.asarray(ids, dtype=np.int64), np.asarray(scores), n)
+
+
+@candidate_generator("popular", weight=0.3, budget_ms=20)
+def popular_candidates(ctx: UserContext, n: int) -> Candidates:
+    from .trending import trending
+
+    return _ranked(trending.top(("7d", None), n))
+
+
+# (catalogue version, rows queried, newest ids)
+_recent: Tuple[Optional[str], int, Tuple[int, ...]] = (None, 0, ())
+
+
+@candidate_generator("recent", weight=0.2, budget_ms=50)
+def recent_candidates(ctx: UserContext, n: int) -> Candidates:
+    """Newest uploads by Video.uploaded_at; queried once per catalogue version."""
+    global _recent
+    from . import database
+    from .catalogue import catalogue
+    from .models import Video
+
+    version = catalogue.current()
+    cached_version, depth, ids = _recent
+    # a catalogue smaller than `depth` returns fewer ids: still cached until the next change
+    if cached_version != version or n > depth:
+        depth = max(n, CANDIDATES_PER_STAGE)
+        with Session(database.read_engine) as db:
+            stmt = select(Video.id).order_by(Video.uploaded_at.desc(), Video.id.desc()).limit(depth)
+            ids = tuple(db.exec(stmt).all())
+        _recent = (version, depth, ids)
+    return _ranked(ids[:n])
+
+
+# ---- per-user seen set ----
+
+@dataclass
+class SeenVideos:
+    ids: set
+    loaded: bool     # False: only ids recorded since the entry was created, DB rows not read yet
+
+
+_seen_lock = threading.Lock()
+
+
+def seen_videos(db: Session, user_id: int) -> FrozenSet[int]:
+    """
+    Ids the user liked or completed: one query per user, then kept current in
+    memory. Returns a copy: record_feedback() keeps updating the cached set.
+    """
+    with _seen_lock:
+        entry = seen_cache.get(user_id)
+        if entry is not None and entry.loaded:
+            return frozenset(entry.ids)
+    stmt = (
+        select(Interaction.video_id)
+        .where(Interaction.user_id == user_id, Interaction.action.in_(SEEN_ACTIONS))
+    )
+    rows = set(db.exec(stmt).all())
+    with _seen_lock:
+        entry = seen_cache.get(user_id)
+        # keep what record_feedback() added meanwhile (write-behind rows may not be in the DB yet)
+        ids = rows | (entry.ids if entry is not None else set())
+        seen_cache.set(user_id, SeenVideos(ids, loaded=True))
+        return frozenset(ids)
+
+
+def record_feedback(user_id: int, events: Iterable[Tuple[int, ActionEnum]]) -> None:
+    """After new (video_id, action) events: drop cached results, extend the seen set."""
+    invalidate_user(user_id)
+    ids = {video_id for video_id, action in events if action in SEEN_ACTIONS}
+    if not ids:
+        return
+    with _seen_lock:
+        entry = seen_cache.get(user_id)
+        if entry is None:
+            seen_cache.set(user_id, SeenVideos(ids, loaded=False))
+        else:
+            entry.ids.update(ids)
+
+
+def user_context(db: Session, user_id: int) -> UserContext:
+    stmt = (
+        select(Interaction.video_id)
+        .where(Interaction.user_id == user_id)
+        .order_by(Interaction.timestamp.desc(), Interaction.id.desc())
+        .limit(HISTORY_SIZE * 3)
+    )
+    history = tuple(dict.fromkeys(db.exec(stmt).all()))[:HISTORY_SIZE]
+    return UserContext(user_id, history)
+
+
+# ---- fan-out and blend ----
+
+_pool = ThreadPoolExecutor(max_workers=RECO_PIPELINE_WORKERS, thread_name_prefix="reco-stage")
+
+
+# stage name -> calls submitted and not finished; a stuck source may hold at
+# most half the pool, so the other stages still get threads
+_in_flight: Dict[str, int] = {}
+_in_flight_lock = threading.Lock()
+
+
+def _run_stage(stage: Stage, ctx: UserContext, n: int) -> Candidates:
+    started = time.perf_counter()
+    try:
+        return stage.fn(ctx, n)
+    finally:
+        record_span("candidates", stage.name, time.perf_counter() - started)
+        with _in_flight_lock:
+            _in_flight[stage.name] -= 1
+
+
+def _submit(stage: Stage, ctx: UserContext, n: int):
+    with _in_flight_lock:
+        if _in_flight.get(stage.name, 0) >= max(1, RECO_PIPELINE_WORKERS // 2):
+            return None
+        _in_flight[stage.name] = _in_flight.get(stage.name, 0) + 1
+    # copy_context: DB time in the stage is attributed to the current request
+    return _pool.submit(contextvars.copy_context().run, _run_stage, stage, ctx, n)
+
+
+def gather_candidates(ctx: UserContext, n: int = CANDIDATES_PER_STAGE,
+                      budget: float = PIPELINE_BUDGET) -> Dict[str, Candidates]:
+    """Run every stage concurrently; stages that miss their budget are left out."""
+    started = time.perf_counter()
+    futures = [(s, _submit(s, ctx, n)) for s in STAGES.values()]
+    out: Dict[str, Candidates] = {}
+    for stage, future in sorted(futures, key=lambda sf: sf[0].budget):
+        remaining = started + min(stage.budget, budget) - time.perf_counter()
+        try:
+            if future is None:
+                raise FutureTimeout()
+            out[stage.name] = future.result(timeout=max(remaining, 0.0))
+        except FutureTimeout:
+            if future is not None and future.cancel():
+                with _in_flight_lock:
+                    _in_flight[stage.name] -= 1
+            STAGE_TIMEOUTS.inc((stage.name,))
+        except Exception:
+            log.exception("Candidate stage %s failed", stage.name)
+            STAGE_ERRORS.inc((stage.name,))
+    return out
+
+
+def blend(candidates: Dict[str, Candidates], exclude: Iterable[int], k: int) -> List[int]:
+    """Weighted sum of per-source scores scaled to [0, 1]; the top k ids not in `exclude`."""
+    parts = [(STAGES[name].weight, ids, scores) for name, (ids, scores) in candidates.items()
+             if len(ids) and name in STAGES]
+    if not parts:
+        return []
+    ids = np.concatenate([p[1] for p in parts])
+    scores = np.concatenate([w * s / max(float(s.max()), 1e-12) for w, _, s in parts])
+    uniq, inverse = np.unique(ids, return_inverse=True)
+    totals = np.bincount(inverse, weights=scores)
+    excluded = np.fromiter(exclude, dtype=np.int64)
+    if len(excluded):
+        totals[np.isin(uniq, excluded)] = 0.0
+    ranked, ranked_scores = _top(uniq, totals, k)
+    return ranked[np.argsort(-ranked_scores, kind="stable")].tolist()
+
+
+def recommend(db: Session, user_id: int, k: int = 20) -> List[int]:
+    """Blended top-k Video.id values for a user, new users included."""
+    ctx = user_context(db, user_id)
+    return blend(gather_candidates(ctx), seen_videos(db, user_id), k)
+
+
+def main():
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Build the item-item recommendation model")
+    parser.add_argument("--out", default=str(RECO_MODEL_PATH))
+    parser.add_argument("--neighbours", type=int, default=DEFAULT_NEIGHBOURS)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Apply only interactions newer than the saved watermark")
+    parser.add_argument("--state", default=str(RECO_STATE_PATH))
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.incremental:
+        model, applied = update_model_incremental(
+            engine, args.neighbours, Path(args.state), Path(args.out)
+        )
+        print(f"Applied {applied} new interactions")
+    else:
+        with Session(engine) as db:
+            model = build_model(db, args.neighbours)
+        model.save(Path(args.out))
+    print(
+        f"Built model v{model.version}: {len(model.user_ids)} users, "
+        f"{model.n_videos} videos, {model.S.nnz} neighbour pairs "
+        f"in {time.perf_counter() - t0:.2f}s -> {args.out}"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# app/responses.py
+"""
+JSON response for list endpoints that return crud's plain-dict rows.
+
+Handlers return RowsResponse directly, so FastAPI skips response_model
+validation/serialization (the rows already have exactly the schema's
+columns; response_model stays on the route for the OpenAPI docs).
+Rendering uses orjson when it is installed and the stdlib otherwise.
+"""
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from .metrics import span
+
+try:
+    import orjson
+except ImportError:   # optional speed-up
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class RowsResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        with span("serialize", "rows"):
+            if orjson is not None:
+                return orjson.dumps(content)
+            return json.dumps(content, default=_default, ensure_ascii=False,
+                              separators=(",", ":")).encode("utf-8")
+
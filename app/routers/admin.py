@@ -0,0 +1,24 @@
+# app/routers/admin.py
+from fastapi import APIRouter, Depends
+from sqlmodel import Session
+from ..database import get_session, pool_metrics
+from ..deps import require_admin
+from ..stats import rebuild, refresh
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/db/pool")
+def db_pool_metrics(_admin = Depends(require_admin)):
+    """Connection checkout wait times and live pool usage per engine."""
+    return pool_metrics()
+
+
+@router.post("/stats/refresh")
+def refresh_video_stats(
+    full: bool = False,
+    _admin = Depends(require_admin),
+    db: Session = Depends(get_session),
+):
+    """Fold new interactions into video_stats now; ?full=true rebuilds the table."""
+    return rebuild(db) if full else refresh(db)
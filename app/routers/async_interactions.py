@@ -0,0 +1,125 @@
+# app/routers/async_interactions.py
+# async def mirror of routers/interactions.py, mounted instead of it when RECONOVA_ASYNC_DB=1
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.async_database import get_async_session, get_async_read_session
+from ..schemas import (
+    InteractionCreate,
+    InteractionRead,
+    InteractionBatch,
+    InteractionBatchResult,
+)
+from ..async_crud import (
+    get_interactions_by_user,
+    list_interactions_by_video,
+)
+from ..ingest import video_ids, interaction_writer
+from ..responses import RowsResponse
+from ..pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, time_cursor
+from ..async_deps import CurrentUser, require_admin, ensure_self_or_admin, get_current_user
+from ..models import ActionEnum  # for typing
+from ..recommender import record_feedback
+
+router = APIRouter(tags=["interactions"])
+
+@router.post(
+    "/interactions",
+    response_model=InteractionBatchResult,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def add_interaction(
+    data: InteractionCreate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Write-behind, like /interactions/batch: the event is queued and inserted
+    by the background writer (a repeat of an existing event is ignored there).
+
+    Breaking change: this used to insert synchronously and answer 201 (200
+    for a repeat) with the stored InteractionRead. It now answers 202 with
+    InteractionBatchResult (accepted=1), or 503 with Retry-After when the
+    queue is full; the row shows up in the history after the next flush.
+    """
+    if not await video_ids.exists_async(db, data.video_id):
+        raise HTTPException(status_code=404, detail="Video not found")
+    if not interaction_writer.offer([(current_user.id, data.video_id, data.action)]):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingestion queue is full, retry later",
+            headers={"Retry-After": "1"},
+        )
+    record_feedback(current_user.id, [(data.video_id, data.action)])
+    return InteractionBatchResult(accepted=1)
+
+
+@router.post(
+    "/interactions/batch",
+    response_model=InteractionBatchResult,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def add_interactions_batch(
+    data: InteractionBatch,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Write-behind ingestion: events are validated against the in-memory video
+    id set, queued, and inserted in bulk by the background writer.
+    """
+    # one query for every id the in-memory set does not know
+    known = await video_ids.existing_async(db, (event.video_id for event in data.events))
+    accepted, rejected = [], []
+    for i, event in enumerate(data.events):
+        if event.video_id in known:
+            accepted.append((current_user.id, event.video_id, event.action))
+        else:
+            rejected.append(i)
+
+    if accepted and not interaction_writer.offer(accepted):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingestion queue is full, retry later",
+            headers={"Retry-After": "1"},
+        )
+    if accepted:
+        record_feedback(current_user.id, [(v, a) for _, v, a in accepted])
+    return InteractionBatchResult(accepted=len(accepted), rejected=rejected)
+
+
+@router.get("/users/{user_id}/interactions", response_model=List[InteractionRead])
+async def user_history(
+    user_id: int,
+    # optional filter, e.g. ?action=like or ?action=like&action=share
+    action: Optional[List[ActionEnum]] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[Tuple[datetime, int]] = Depends(time_cursor),
+    _ = Depends(ensure_self_or_admin),
+    db: AsyncSession = Depends(get_async_read_session),
+):
+    rows = await get_interactions_by_user(
+        db, user_id, skip=skip, limit=limit, after=after, actions=action
+    )
+    headers = {}
+    if len(rows) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    return RowsResponse(rows, headers=headers)
+
+
+@router.get("/videos/{video_id}/interactions", response_model=List[InteractionRead])
+async def video_events(
+    video_id: int,
+    action: Optional[List[ActionEnum]] = Query(None),   # optional filter, repeatable
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[Tuple[datetime, int]] = Depends(time_cursor),
+    _admin = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_read_session),
+):
+    rows = await list_interactions_by_video(db, video_id, limit=limit, after=after, actions=action)
+    headers = {}
+    if len(rows) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    return RowsResponse(rows, headers=headers)
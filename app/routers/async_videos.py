@@ -0,0 +1,129 @@
+# app/routers/async_videos.py
+# async def mirror of routers/videos.py, mounted instead of it when RECONOVA_ASYNC_DB=1
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.async_database import get_async_session, get_async_read_session
+from ..schemas import VideoCreate, VideoRead, VideoBulkResult, VideoStatsRead
+from ..async_crud import (
+    bulk_upsert_videos,
+    create_or_update_video,
+    delete_video,
+    get_video_by_id,
+    get_video_stats,
+    list_videos,
+)
+from ..async_deps import require_admin
+from ..ingest import video_ids
+from ..stats import stats_read, attach_stats
+from ..responses import RowsResponse
+from ..catalogue import lookup, store
+from ..pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, time_cursor
+
+router = APIRouter(tags=["videos"])
+
+@router.post("/videos", response_model=VideoRead, status_code=status.HTTP_201_CREATED)
+async def upload_video(
+    data: VideoCreate,
+    _admin = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Admin-only upsert by pixabay_id.
+    Stores local URLs (source_url, thumb_url) that your server will serve under /media/*.
+    """
+    video = await create_or_update_video(db, data)
+    video_ids.add(video.id)
+    return video
+
+@router.post("/videos/bulk", response_model=VideoBulkResult, status_code=status.HTTP_201_CREATED)
+async def upload_videos_bulk(
+    items: List[VideoCreate],
+    _admin = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Admin-only bulk upsert by pixabay_id; returns ids in request order."""
+    ids = await bulk_upsert_videos(db, items)
+    for video_id in ids:
+        video_ids.add(video_id)
+    return VideoBulkResult(ids=ids)
+
+@router.get("/videos", response_model=List[VideoRead])
+async def browse_videos(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[Tuple[datetime, int]] = Depends(time_cursor),
+    with_stats: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    primary: AsyncSession = Depends(get_async_session),
+    replica: AsyncSession = Depends(get_async_read_session),
+):
+    """
+    Pass the X-Next-Cursor response header back as ?cursor= for the next page;
+    skip/limit still work for older clients. ?with_stats=true embeds each
+    video's engagement stats (one extra query for the whole page).
+    Pages carry the catalogue ETag and are cached per catalogue version, so
+    they are rendered from the primary (a lagging replica would store an old
+    page under the new version); with_stats pages are not cached (stats
+    change without the catalogue) and read the replica.
+    """
+    key = ("videos", skip, limit, after)
+    db = replica if with_stats else primary
+    if not with_stats:
+        version, cached = lookup(key, if_none_match)
+        if cached is not None:
+            return cached
+    rows = await list_videos(db, skip, limit, after=after)
+    headers = {}
+    if len(rows) == limit:
+        last = rows[-1]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(last["uploaded_at"], last["id"])
+    if with_stats:
+        attach_stats(rows, await get_video_stats(db, [r["id"] for r in rows]))
+        return RowsResponse(rows, headers=headers)
+    return store(key, version, RowsResponse(rows, headers=headers))
+
+@router.get("/videos/{video_id}", response_model=VideoRead)
+async def fetch_video(
+    video_id: int,
+    with_stats: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    primary: AsyncSession = Depends(get_async_session),
+    replica: AsyncSession = Depends(get_async_read_session),
+):
+    # cached documents come from the primary, as in browse_videos
+    key = ("video", video_id)
+    db = replica if with_stats else primary
+    if not with_stats:
+        version, cached = lookup(key, if_none_match)
+        if cached is not None:
+            return cached
+    video = await get_video_by_id(db, video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if with_stats:
+        stats = (await get_video_stats(db, [video_id])).get(video_id)
+        return VideoRead.model_validate(video).model_copy(update={"stats": stats_read(stats)})
+    body = VideoRead.model_validate(video).model_dump_json()
+    return store(key, version, Response(body, media_type="application/json"))
+
+@router.get("/videos/{video_id}/stats", response_model=VideoStatsRead)
+async def video_stats(video_id: int, db: AsyncSession = Depends(get_async_read_session)):
+    """Engagement counts from video_stats (as of its last refresh)."""
+    stats = (await get_video_stats(db, [video_id])).get(video_id)
+    if stats is None and not await get_video_by_id(db, video_id):
+        raise HTTPException(status_code=404, detail="Video not found")
+    return stats_read(stats)
+
+@router.delete("/videos/{video_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_video(
+    video_id: int,
+    _admin = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_session),
+):
+    ok = await delete_video(db, video_id)
+    video_ids.discard(video_id)
+    if not ok:
+        raise HTTPException(status_code=404, detail="Video not found")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,25 +1,47 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session
 from ..database import get_session
-from ..models import User
-from ..crud import get_user_by_email
-from ..utils import verify
+from ..schemas import Token
+from ..crud import get_user_by_email, set_password_hash
+from ..utils import PasswordPoolBusy, verify_and_update_async
 from ..oauth2 import create_access_token
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 
 router = APIRouter(tags=["Authentication"])
 
-@router.post("/login", response_model=User)
-def login(
+def password_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent logins, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+def lookup_and_release(session: Session, email: str):
+    """get_user_by_email, then hand the connection back to the pool before hashing."""
+    user = get_user_by_email(session, email)
+    session.close()
+    return user
+
+@router.post("/login", response_model=Token)
+async def login(
     user_credentials: OAuth2PasswordRequestForm = Depends(),
     session: Session = Depends(get_session)
 ):
-    user = get_user_by_email(session, user_credentials.username)
+    # async: bcrypt runs in utils.password_pool, so a waiting login holds
+    # no request thread and no DB connection; DB calls go to the threadpool
+    user = await run_in_threadpool(lookup_and_release, session, user_credentials.username)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    if not verify(user_credentials.password, user.password):
+    try:
+        valid, new_hash = await verify_and_update_async(user_credentials.password, user.hashed_password)
+    except PasswordPoolBusy:
+        raise password_pool_busy()
+    if not valid:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid credentials")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made: store the upgraded one
+        await run_in_threadpool(set_password_hash, session, user, new_hash)
 
-    access_token = create_access_token(data={"user_id": user.id})
+    access_token = create_access_token(data={"user_id": user.id, "is_admin": user.is_admin})
     return {"access_token": access_token, "token_type": "bearer"}
-
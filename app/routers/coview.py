@@ -0,0 +1,36 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlmodel import Session
+from app.database import get_session
+from ..catalogue import lookup, store
+from ..coview import COVIEW_TOP_K, get_table
+from ..crud import get_video_rows_by_ids
+from ..ingest import video_ids
+from ..responses import RowsResponse
+from ..schemas import VideoRead
+
+router = APIRouter(tags=["videos"])
+
+
+@router.get("/videos/{video_id}/next", response_model=List[VideoRead])
+def up_next(
+    video_id: int,
+    limit: int = Query(10, ge=1, le=COVIEW_TOP_K),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_session),
+):
+    """
+    What viewers of this video watched next, best first (see app/coview.py);
+    [] until the co-view job has run. The ETag and page cache follow both the
+    catalogue version and the co-view build; pages are read from the primary.
+    """
+    table = get_table()
+    key = ("next", video_id, limit)
+    version, cached = lookup(key, if_none_match, build=f"cv{table.version if table is not None else 0}")
+    if cached is not None:
+        return cached
+    if not video_ids.exists(db, video_id):
+        raise HTTPException(status_code=404, detail="Video not found")
+    # every stored target is fetched: deleted videos drop out before the page is cut
+    ids = table.next_for(video_id) if table is not None else []
+    return store(key, version, RowsResponse(get_video_rows_by_ids(db, ids)[:limit]))
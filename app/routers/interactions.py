@@ -1,77 +1,123 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import Session
-from app.database import get_session
-from ..schemas import InteractionCreate, InteractionRead
+from app.database import get_session, get_read_session
+from ..schemas import (
+    InteractionCreate,
+    InteractionRead,
+    InteractionBatch,
+    InteractionBatchResult,
+)
 from ..crud import (
-    create_interaction,
     get_interactions_by_user,
     list_interactions_by_video,
-    get_interaction,
-    get_video_by_id,
 )
-from ..deps import require_admin, ensure_self_or_admin, get_current_user
-from ..models import User  # for typing
+from ..ingest import video_ids, interaction_writer
+from ..responses import RowsResponse
+from ..pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, time_cursor
+from ..deps import CurrentUser, require_admin, ensure_self_or_admin, get_current_user
+from ..models import ActionEnum  # for typing
+from ..recommender import record_feedback
 
 router = APIRouter(tags=["interactions"])
 
-@router.post("/interactions", response_model=InteractionRead)
+@router.post(
+    "/interactions",
+    response_model=InteractionBatchResult,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 def add_interaction(
     data: InteractionCreate,
-    response: Response,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_session),
 ):
-    # (Optional) ensure target video exists for a clean 404
-    if not get_video_by_id(db, data.video_id):
+    """
+    Write-behind, like /interactions/batch: the event is queued and inserted
+    by the background writer (a repeat of an existing event is ignored there).
+
+    Breaking change: this used to insert synchronously and answer 201 (200
+    for a repeat) with the stored InteractionRead. It now answers 202 with
+    InteractionBatchResult (accepted=1), or 503 with Retry-After when the
+    queue is full; the row shows up in the history after the next flush.
+    """
+    if not video_ids.exists(db, data.video_id):
         raise HTTPException(status_code=404, detail="Video not found")
+    if not interaction_writer.offer([(current_user.id, data.video_id, data.action)]):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingestion queue is full, retry later",
+            headers={"Retry-After": "1"},
+        )
+    record_feedback(current_user.id, [(data.video_id, data.action)])
+    return InteractionBatchResult(accepted=1)
 
-    # Fast path: return existing with 200 OK
-    existing = get_interaction(
-        db,
-        user_id=current_user.id,
-        video_id=data.video_id,
-        action=data.action,
-    )
-    if existing:
-        response.status_code = status.HTTP_200_OK
-        return existing
 
-    # Create; crud will also be safe against races via UniqueConstraint+IntegrityError
-    inter = create_interaction(
-        db,
-        user_id=current_user.id,
-        video_id=data.video_id,
-        action=data.action,
-    )
-    response.status_code = status.HTTP_201_CREATED
-    return inter
+@router.post(
+    "/interactions/batch",
+    response_model=InteractionBatchResult,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def add_interactions_batch(
+    data: InteractionBatch,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_session),
+):
+    """
+    Write-behind ingestion: events are validated against the in-memory video
+    id set, queued, and inserted in bulk by the background writer.
+    """
+    # one query for every id the in-memory set does not know
+    known = video_ids.existing(db, (event.video_id for event in data.events))
+    accepted, rejected = [], []
+    for i, event in enumerate(data.events):
+        if event.video_id in known:
+            accepted.append((current_user.id, event.video_id, event.action))
+        else:
+            rejected.append(i)
+
+    if accepted and not interaction_writer.offer(accepted):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingestion queue is full, retry later",
+            headers={"Retry-After": "1"},
+        )
+    if accepted:
+        record_feedback(current_user.id, [(v, a) for _, v, a in accepted])
+    return InteractionBatchResult(accepted=len(accepted), rejected=rejected)
 
 
 @router.get("/users/{user_id}/interactions", response_model=List[InteractionRead])
 def user_history(
     user_id: int,
-    action: Optional[str] = None,   # optional filter, e.g. ?action=like
-    skip: int = 0,
-    limit: int = 50,
+    # optional filter, e.g. ?action=like or ?action=like&action=share
+    action: Optional[List[ActionEnum]] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[Tuple[datetime, int]] = Depends(time_cursor),
     _ = Depends(ensure_self_or_admin),
-    db: Session = Depends(get_session),
+    db: Session = Depends(get_read_session),
 ):
-    items = get_interactions_by_user(db, user_id, skip=skip, limit=limit)
-    if action:
-        items = [i for i in items if i.action == action]
-    return items
+    rows = get_interactions_by_user(
+        db, user_id, skip=skip, limit=limit, after=after, actions=action
+    )
+    headers = {}
+    if len(rows) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    return RowsResponse(rows, headers=headers)
 
 
 @router.get("/videos/{video_id}/interactions", response_model=List[InteractionRead])
 def video_events(
     video_id: int,
-    action: Optional[str] = None,   # optional filter
-    limit: int = 50,
+    action: Optional[List[ActionEnum]] = Query(None),   # optional filter, repeatable
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[Tuple[datetime, int]] = Depends(time_cursor),
     _admin = Depends(require_admin),
-    db: Session = Depends(get_session),
+    db: Session = Depends(get_read_session),
 ):
-    items = list_interactions_by_video(db, video_id, limit=limit)
-    if action:
-        items = [i for i in items if i.action == action]
-    return items
+    rows = list_interactions_by_video(db, video_id, limit=limit, after=after, actions=action)
+    headers = {}
+    if len(rows) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    return RowsResponse(rows, headers=headers)
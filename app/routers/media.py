@@ -0,0 +1,33 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from ..config import MEDIA_ROOT
+from ..media import media_response, resolve
+from ..thumbnails import get_variant
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+
+@router.api_route("/{kind}/{name}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_media(
+    kind: str,
+    name: str,
+    request: Request,
+    w: Optional[int] = Query(None, description="Thumbnail width (160, 320, 480 or 640)"),
+    fmt: Optional[str] = Query(None, description="Thumbnail format: jpg or webp"),
+):
+    """Thumbnails and clips with Range, ETag/Last-Modified and long-lived caching."""
+    f = None
+    if w is not None or fmt is not None:
+        if kind != "thumbs":
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="w/fmt only apply to thumbnails")
+        try:
+            f = await get_variant(name, w, fmt, MEDIA_ROOT)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if f is None:
+        # no variant requested, or it could not be rendered: the original
+        f = resolve(kind, name, MEDIA_ROOT)
+    if f is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return media_response(f, request.headers, request.method)
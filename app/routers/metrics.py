@@ -0,0 +1,13 @@
+# app/routers/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from ..metrics import CONTENT_TYPE, render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint for this worker process."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
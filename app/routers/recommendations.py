@@ -0,0 +1,50 @@
+# app/routers/recommendations.py
+from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, status
+from sqlmodel import Session
+from app.database import engine, get_session
+from ..schemas import VideoRead
+from ..crud import get_videos_by_ids
+from ..deps import require_admin, ensure_self_or_admin
+from ..cache import recommendation_cache
+from .. import recommender
+
+router = APIRouter(tags=["recommendations"])
+
+# Results are cached at this depth; smaller `limit`s are served by slicing
+MAX_RECOMMENDATIONS = 100
+
+
+@router.get("/users/{user_id}/recommendations", response_model=List[VideoRead])
+def recommendations_for_user(
+    user_id: int,
+    limit: int = Query(20, ge=1, le=MAX_RECOMMENDATIONS),
+    _ = Depends(ensure_self_or_admin),
+    db: Session = Depends(get_session),
+):
+    """
+    Blended candidates (item-item, co-view, embedding neighbours, popular,
+    recent), minus what the user already liked or completed; new users get
+    popular and recent. Served from an LRU+TTL cache keyed by the user and
+    the model, catalogue, co-view and ANN versions; a hit never touches the
+    database.
+    """
+    key = recommender.cache_key(user_id)
+    cached = recommendation_cache.get(key)
+    if cached is not None:
+        return cached[:limit]
+
+    ids = recommender.recommend(db, user_id, MAX_RECOMMENDATIONS)
+    items = [VideoRead.model_validate(v) for v in get_videos_by_ids(db, ids)]
+    recommendation_cache.set(key, items)
+    return items[:limit]
+
+
+@router.post("/recommendations/rebuild", status_code=status.HTTP_202_ACCEPTED)
+def rebuild_recommendations(
+    background: BackgroundTasks,
+    _admin = Depends(require_admin),
+):
+    """Admin-only: rebuild the model in the background; the cache flips when it lands."""
+    background.add_task(recommender.rebuild_model, engine)
+    return {"status": "scheduled", "current_version": recommender.model_version()}
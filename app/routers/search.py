@@ -0,0 +1,32 @@
+# app/routers/search.py
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, Query
+from sqlmodel import Session
+from app.database import get_session
+from ..catalogue import lookup, store
+from ..crud import search_videos
+from ..responses import RowsResponse
+from ..schemas import VideoRead
+from ..search import SEARCH_MAX_LIMIT, query_tokens
+
+router = APIRouter(tags=["videos"])
+
+
+@router.get("/videos/search", response_model=List[VideoRead])
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_session),
+):
+    """
+    Ranked tag/title search, e.g. ?q=ocean wav (every word must match, as a
+    prefix). Results are cached and ETagged per catalogue version, so they
+    are read from the primary, not a replica that may lag that version.
+    """
+    key = ("search", tuple(query_tokens(q)), skip, limit)
+    version, cached = lookup(key, if_none_match)
+    if cached is not None:
+        return cached
+    return store(key, version, RowsResponse(search_videos(db, q, skip, limit, version)))
@@ -0,0 +1,48 @@
+# app/routers/trending.py
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+from app.database import get_read_session
+from ..schemas import VideoRead
+from ..crud import get_videos_by_ids
+from ..models import ActionEnum
+from ..cache import trending_cache
+from ..trending import TRENDING_TOP_N, WINDOWS, trending
+
+router = APIRouter(tags=["videos"])
+
+Window = Literal[tuple(WINDOWS)]
+
+
+def _rail(rail, limit: int, db: Session) -> List[VideoRead]:
+    # snapshot ids are precomputed; VideoRead lists are cached per snapshot version
+    key = (*rail, trending.version)
+    items = trending_cache.get(key)
+    if items is None:
+        ids = trending.top(rail, TRENDING_TOP_N)
+        items = [VideoRead.model_validate(v) for v in get_videos_by_ids(db, list(ids))]
+        trending_cache.set(key, items)
+    return items[:limit]
+
+
+@router.get("/videos/trending", response_model=List[VideoRead])
+def trending_videos(
+    limit: int = Query(20, ge=1, le=TRENDING_TOP_N),
+    db: Session = Depends(get_read_session),
+):
+    """The "Trending now" rail: action-weighted engagement with exponential time decay."""
+    return _rail(("trending", None), limit, db)
+
+
+@router.get("/videos/popular", response_model=List[VideoRead])
+def popular_videos(
+    window: Window = "7d",
+    action: Optional[ActionEnum] = None,
+    limit: int = Query(20, ge=1, le=TRENDING_TOP_N),
+    db: Session = Depends(get_read_session),
+):
+    """
+    Most engaged videos in a sliding window, e.g. ?window=7d&action=like for
+    "most liked this week"; without `action`, actions are weighted.
+    """
+    return _rail((window, action.value if action else None), limit, db)
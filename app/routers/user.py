@@ -1,34 +1,52 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session
 from app.database import get_session
 from ..schemas import UserCreate, UserOut
-from ..crud import create_user, list_users, get_user_by_id, get_user_by_email
+from .. import crud
+from ..crud import create_user, get_user_by_id
 from ..deps import require_admin, ensure_self_or_admin
+from ..responses import RowsResponse
+from ..pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, id_cursor
+from ..utils import PasswordPoolBusy, hash_password_async
+from .auth import lookup_and_release, password_pool_busy
 
 router = APIRouter(tags=["Users"])
 
 
 @router.post("/users", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register_user(user: UserCreate, db: Session = Depends(get_session)):
+async def register_user(user: UserCreate, db: Session = Depends(get_session)):
     # Check if user already exists
-    existing_user = get_user_by_email(db, user.email)
+    existing_user = await run_in_threadpool(lookup_and_release, db, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
+    # bcrypt off the request threads (see routers/auth.py login)
+    try:
+        hashed = await hash_password_async(user.password)
+    except PasswordPoolBusy:
+        raise password_pool_busy()
+
     # Create new user
-    new_user = create_user(db, user)
+    new_user = await run_in_threadpool(create_user, db, user, hashed)
     return new_user
 
 
 @router.get("/users", response_model=List[UserOut])
 def list_users(
-    skip: int = 0,
-    limit: int = 20,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = Depends(id_cursor),
     _admin = Depends(require_admin),
     db: Session = Depends(get_session),
 ):
-    return list_users(db, skip, limit)
+    # crud.list_users: this handler shares its name
+    rows = crud.list_users(db, skip, limit, after_id=after_id)
+    headers = {}
+    if len(rows) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1]["id"])
+    return RowsResponse(rows, headers=headers)
 
 
 @router.get("/users/{user_id}", response_model=UserOut)
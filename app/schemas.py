@@ -1,7 +1,7 @@
 from __future__ import annotations
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, EmailStr
+from typing import List, Optional
+from pydantic import BaseModel, EmailStr, Field, computed_field
 from enum import Enum
 
 class ActionEnum(str, Enum):
@@ -55,9 +55,31 @@ class VideoCreate(BaseModel):
     source_url: str                 # e.g., "/media/clips/12345.mp4"
     thumb_url: Optional[str] = None # e.g., "/media/thumbs/12345.jpg"
 
+class VideoBulkResult(BaseModel):
+    ids: List[int]                  # Video.id per submitted item, same order
+
+class VideoStatsRead(BaseModel):
+    views: int = 0
+    likes: int = 0
+    completes: int = 0
+    bookmarks: int = 0
+    shares: int = 0
+    unique_viewers: int = 0
+    last_interaction_at: Optional[datetime] = None
+
+    @computed_field
+    @property
+    def completion_rate(self) -> float:
+        """Completes per unique viewer."""
+        return self.completes / self.unique_viewers if self.unique_viewers else 0.0
+
+    class Config:
+        from_attributes = True
+
 class VideoRead(VideoCreate):
     id: int
     uploaded_at: datetime
+    stats: Optional[VideoStatsRead] = None   # only with ?with_stats=true
 
     class Config:
         from_attributes = True
@@ -70,6 +92,13 @@ class InteractionCreate(BaseModel):
     video_id: int
     action: ActionEnum              # safer than raw str
 
+class InteractionBatch(BaseModel):
+    events: List[InteractionCreate] = Field(min_length=1, max_length=1000)
+
+class InteractionBatchResult(BaseModel):
+    accepted: int
+    rejected: List[int] = []        # indexes into `events` (unknown video_id)
+
 class InteractionRead(BaseModel):
     id: int
     user_id: int
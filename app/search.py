@@ -0,0 +1,185 @@
+# app/search.py
+"""
+Ranked search over video titles (the Pixabay tag strings) and descriptions.
+
+Postgres: the `ix_video_search` GIN index on models.VIDEO_SEARCH_DOCUMENT,
+matched with a prefix tsquery ("ocean wav" -> 'ocean:* & wav:*') and
+ranked by ts_rank. No ILIKE, no sequential scan.
+
+Other backends (SQLite in dev): an in-process inverted index, token ->
+posting set of video ids, built on the first search. crud's video writes
+update it in place (apply()); writes from another process show up as a
+catalogue version it has not seen and trigger a rebuild.
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import itertools
+import math
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, literal_column
+from sqlmodel import Session, select
+
+from .config import SEARCH_BACKEND
+from .models import VIDEO_SEARCH_DOCUMENT, Video
+
+SEARCH_MAX_LIMIT = 100
+SEARCH_MAX_TOKENS = 8
+
+_TOKEN = re.compile(r"\w+")
+
+Doc = Tuple[int, str, Optional[str]]   # (video id, title, description)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+def query_tokens(q: str) -> List[str]:
+    """Distinct query words, at most SEARCH_MAX_TOKENS of them."""
+    return list(dict.fromkeys(tokenize(q)))[:SEARCH_MAX_TOKENS]
+
+
+def use_postgres(db: Session) -> bool:
+    if SEARCH_BACKEND != "auto":
+        return SEARCH_BACKEND == "postgres"
+    return db.get_bind().dialect.name == "postgresql"
+
+
+# ======================
+# Postgres
+# ======================
+
+def search_stmt(tokens: List[str], skip: int, limit: int, columns=(Video.id,)):
+    document = literal_column(VIDEO_SEARCH_DOCUMENT)
+    # tokens are \w+ only, so they cannot inject tsquery operators
+    query = func.to_tsquery(literal_column("'simple'::regconfig"),
+                            " & ".join(f"{t}:*" for t in tokens))
+    return (
+        select(*columns)
+        .where(document.op("@@")(query))
+        .order_by(func.ts_rank(document, query).desc(), Video.id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+
+
+# ======================
+# In-process inverted index
+# ======================
+
+class InvertedIndex:
+    def __init__(self):
+        self._postings: Dict[str, Set[int]] = {}
+        self._docs: Dict[int, frozenset] = {}
+        self._vocab: List[str] = []     # sorted tokens, for prefix expansion
+        self._lock = threading.Lock()
+        self.version: Optional[str] = None   # catalogue version reflected; None = not built
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _add(self, video_id: int, title: str, description: Optional[str],
+             sorted_vocab: bool = True) -> None:
+        self._remove(video_id)
+        tokens = frozenset(tokenize(title) + tokenize(description))
+        self._docs[video_id] = tokens
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                if sorted_vocab:
+                    bisect.insort(self._vocab, token)
+            posting.add(video_id)
+
+    def _remove(self, video_id: int) -> None:
+        for token in self._docs.pop(video_id, ()):
+            posting = self._postings[token]
+            posting.discard(video_id)
+            if not posting:
+                del self._postings[token]
+                del self._vocab[bisect.bisect_left(self._vocab, token)]
+
+    def load(self, db: Session, version: str) -> int:
+        """Rebuild from the video table; searches keep using the old index meanwhile."""
+        fresh = InvertedIndex()
+        for doc in db.exec(select(Video.id, Video.title, Video.description)).all():
+            fresh._add(*doc, sorted_vocab=False)
+        fresh._vocab = sorted(fresh._postings)
+        with self._lock:
+            self._postings, self._docs, self._vocab = fresh._postings, fresh._docs, fresh._vocab
+            self.version = version
+        return len(fresh._docs)
+
+    def apply(self, before: str, after: str, upserted: Iterable[Doc] = (),
+              deleted: Iterable[int] = ()) -> None:
+        """One committed catalogue write (version before -> after)."""
+        if self.version is None:
+            return
+        with self._lock:
+            for doc in upserted:
+                self._add(*doc)
+            for video_id in deleted:
+                self._remove(video_id)
+            # if another process wrote in between, stay stale so memory_search() reloads
+            if self.version == before:
+                self.version = after
+
+    def _expand(self, prefix: str) -> Set[int]:
+        lo = bisect.bisect_left(self._vocab, prefix)
+        hi = bisect.bisect_left(self._vocab, prefix + "\uffff")
+        if hi - lo == 1:
+            return self._postings[self._vocab[lo]]
+        return set().union(*(self._postings[t] for t in self._vocab[lo:hi]))
+
+    def search(self, tokens: List[str], skip: int, limit: int) -> List[int]:
+        """
+        Ids matching every token as a prefix, best first: sum over tokens of
+        idf, halved when the match is only a prefix; newer ids break ties.
+
+        A score depends only on which tokens match exactly, so candidates are
+        split into at most 2^len(tokens) score classes with set operations and
+        only the classes needed for this page are ordered.
+        """
+        with self._lock:
+            n = len(self._docs)
+            expanded = sorted(((t, self._expand(t)) for t in tokens), key=lambda e: len(e[1]))
+            if not expanded[0][1]:
+                return []
+            # intersect starting from the rarest token
+            candidates = expanded[0][1].intersection(*(m for _, m in expanded[1:]))
+            terms = [(self._postings.get(t, set()), math.log(1 + n / len(m))) for t, m in expanded]
+
+            classes: Dict[float, List[Tuple[bool, ...]]] = {}
+            for exact in itertools.product((True, False), repeat=len(terms)):
+                score = sum(w if e else w / 2 for e, (_, w) in zip(exact, terms))
+                classes.setdefault(round(score, 9), []).append(exact)
+
+            need, page = skip + limit, []
+            for score in sorted(classes, reverse=True):
+                members: Set[int] = set()
+                for exact in classes[score]:
+                    cls = candidates
+                    for e, (posting, _) in zip(exact, terms):
+                        cls = cls & posting if e else cls - posting
+                        if not cls:
+                            break
+                    members |= cls
+                page.extend(heapq.nlargest(need - len(page), members))
+                if len(page) >= need:
+                    break
+            return page[skip:]
+
+
+search_index = InvertedIndex()
+
+
+def memory_search(db: Session, tokens: List[str], skip: int, limit: int, version: str) -> List[int]:
+    """Ids for one page from the in-process index, (re)built when it lags `version`."""
+    if search_index.version != version:
+        search_index.load(db, version)
+    return search_index.search(tokens, skip, limit)
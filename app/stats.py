@@ -0,0 +1,309 @@
+# app/stats.py
+"""
+Materialized per-video engagement stats (table video_stats).
+
+Request handlers never aggregate interactions. Instead:
+  * refresh() folds interactions with id in (watermark, hi] into video_stats
+    with one GROUP BY plus an upsert that adds to the existing counts, then
+    moves the watermark to hi. `hi` never passes the committed bound (see
+    committed_interaction_id), so an id still in flight in another transaction
+    cannot be skipped for good.
+  * rebuild() recomputes the whole table from scratch; use it after bulk
+    deletes/backfills, or whenever the incremental path is in doubt.
+
+Both lock the watermark row, so concurrent runs (several API workers, the
+CLI) serialize instead of double counting.
+
+    python -m app.stats [--full]
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, case, delete, distinct, exists, func, insert, literal, text
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+
+from .config import STATS_BATCH_ROWS, STATS_REFRESH_INTERVAL
+from .crud import BULK_CHUNK_SIZE, committed_interaction_id, dialect_insert
+from .models import ActionEnum, Interaction, StatsWatermark, VideoStats
+from .schemas import VideoStatsRead
+
+log = logging.getLogger(__name__)
+
+WATERMARK = "video_stats"
+
+ACTION_COLUMNS = {
+    ActionEnum.view: "views",
+    ActionEnum.like: "likes",
+    ActionEnum.complete: "completes",
+    ActionEnum.bookmark: "bookmarks",
+    ActionEnum.share: "shares",
+}
+COUNT_COLUMNS = tuple(ACTION_COLUMNS.values())
+
+
+# ======================
+# Aggregation
+# ======================
+
+def _lock_watermark(db: Session) -> StatsWatermark:
+    wm = db.exec(
+        select(StatsWatermark).where(StatsWatermark.name == WATERMARK).with_for_update()
+    ).first()
+    if wm is None:
+        db.add(StatsWatermark(name=WATERMARK, last_id=0))
+        db.flush()
+        wm = db.exec(
+            select(StatsWatermark).where(StatsWatermark.name == WATERMARK).with_for_update()
+        ).one()
+    return wm
+
+
+def _action_counts():
+    return [
+        func.coalesce(func.sum(case((Interaction.action == action, 1), else_=0)), 0).label(col)
+        for action, col in ACTION_COLUMNS.items()
+    ]
+
+
+def _greatest(db: Session, a, b):
+    # sqlite's two-argument max() is its scalar greatest()
+    fn = func.greatest if db.get_bind().dialect.name == "postgresql" else func.max
+    return fn(func.coalesce(a, b), b)
+
+
+def _batch_upper(db: Session, lo: int, bound: int, batch: int) -> Optional[int]:
+    """Last id of the next `batch` interactions in (lo, bound] (None: nothing new)."""
+    ids = (
+        select(Interaction.id)
+        .where(Interaction.id > lo, Interaction.id <= bound)
+        .order_by(Interaction.id)
+        .limit(batch)
+        .subquery()
+    )
+    return db.exec(select(func.max(ids.c.id))).one()
+
+
+def refresh(db: Session, batch: int = STATS_BATCH_ROWS) -> dict:
+    """Fold interactions newer than the watermark into video_stats; one transaction."""
+    bound = committed_interaction_id(db)
+    wm = _lock_watermark(db)
+    lo = wm.last_id
+    hi = _batch_upper(db, lo, bound, batch)
+    if hi is None:
+        db.commit()
+        return {"full": False, "videos": 0, "watermark": lo}
+
+    in_batch = and_(Interaction.id > lo, Interaction.id <= hi)
+    deltas: Dict[int, dict] = {}
+    for row in db.exec(
+        select(Interaction.video_id, *_action_counts(), func.max(Interaction.timestamp))
+        .where(in_batch)
+        .group_by(Interaction.video_id)
+    ).all():
+        video_id, *counts, last = row
+        deltas[video_id] = dict(zip(COUNT_COLUMNS, map(int, counts)),
+                                video_id=video_id, unique_viewers=0, last_interaction_at=last)
+
+    # users whose first interaction with the video is in this batch
+    prior = aliased(Interaction)
+    seen_before = exists().where(
+        prior.user_id == Interaction.user_id,
+        prior.video_id == Interaction.video_id,
+        prior.id <= lo,
+    )
+    for video_id, n in db.exec(
+        select(Interaction.video_id, func.count(distinct(Interaction.user_id)))
+        .where(in_batch, ~seen_before)
+        .group_by(Interaction.video_id)
+    ).all():
+        deltas[video_id]["unique_viewers"] = n
+
+    now = datetime.utcnow()
+    rows = list(deltas.values())
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        stmt = dialect_insert(db, VideoStats).values(
+            [dict(r, updated_at=now) for r in rows[start:start + BULK_CHUNK_SIZE]]
+        )
+        added = {
+            col: getattr(VideoStats, col) + getattr(stmt.excluded, col)
+            for col in COUNT_COLUMNS + ("unique_viewers",)
+        }
+        db.exec(stmt.on_conflict_do_update(
+            index_elements=[VideoStats.video_id],
+            set_=dict(
+                added,
+                last_interaction_at=_greatest(db, VideoStats.last_interaction_at,
+                                              stmt.excluded.last_interaction_at),
+                updated_at=stmt.excluded.updated_at,
+            ),
+        ))
+
+    wm.last_id, wm.updated_at = hi, now
+    db.add(wm)
+    db.commit()
+    return {"full": False, "videos": len(rows), "watermark": hi}
+
+
+def rebuild(db: Session) -> dict:
+    """Recompute video_stats from the whole interactions table; one transaction."""
+    hi = committed_interaction_id(db)
+    wm = _lock_watermark(db)
+    now = datetime.utcnow()
+
+    aggregate = (
+        select(
+            Interaction.video_id,
+            *_action_counts(),
+            func.count(distinct(Interaction.user_id)),
+            func.max(Interaction.timestamp),
+            literal(now),
+        )
+        .where(Interaction.id <= hi)
+        .group_by(Interaction.video_id)
+    )
+    db.exec(delete(VideoStats))
+    result = db.exec(insert(VideoStats).from_select(
+        ["video_id", *COUNT_COLUMNS, "unique_viewers", "last_interaction_at", "updated_at"],
+        aggregate,
+    ))
+
+    wm.last_id, wm.updated_at = hi, now
+    db.add(wm)
+    db.commit()
+    return {"full": True, "videos": result.rowcount, "watermark": hi}
+
+
+# ======================
+# Reads
+# ======================
+
+def video_stats_stmt(ids: Iterable[int]):
+    return select(VideoStats).where(VideoStats.video_id.in_(list(ids)))
+
+
+def get_video_stats(db: Session, ids: List[int]) -> Dict[int, VideoStats]:
+    if not ids:
+        return {}
+    return {s.video_id: s for s in db.exec(video_stats_stmt(ids)).all()}
+
+
+def stats_read(stats: Optional[VideoStats]) -> VideoStatsRead:
+    """No row yet (no interactions, or not refreshed since) reads as zeros."""
+    return VideoStatsRead.model_validate(stats) if stats is not None else VideoStatsRead()
+
+
+def attach_stats(rows: List[dict], stats: Dict[int, VideoStats]) -> List[dict]:
+    """Add a `stats` dict to each VideoRead row (crud.list_videos)."""
+    for row in rows:
+        row["stats"] = stats_read(stats.get(row["id"])).model_dump()
+    return rows
+
+
+# ======================
+# Background refresh
+# ======================
+
+# pg advisory lock held by the one worker whose StatsRefresher runs refresh()
+REFRESHER_LOCK_KEY = 0x7265636F   # "reco"
+
+
+class StatsRefresher:
+    """
+    Background refresh() loop. On Postgres only one process runs it at a time:
+    the leader holds a session-level advisory lock on its own connection
+    (released when the process exits), so committed_interaction_id() takes
+    its table lock once per interval, not once per API worker. The others
+    retry the lock each interval.
+    """
+
+    def __init__(self, interval: float = STATS_REFRESH_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._engine = None
+        self._leader = None      # connection holding REFRESHER_LOCK_KEY
+
+    def start(self, engine) -> None:
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._engine = engine
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="video-stats", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _is_leader(self) -> bool:
+        if self._engine.dialect.name != "postgresql":
+            return True
+        if self._leader is not None and self._leader.invalidated:
+            self._release()
+        if self._leader is None:
+            conn = self._engine.connect()
+            try:
+                got = conn.execute(text("SELECT pg_try_advisory_lock(:key)"),
+                                   {"key": REFRESHER_LOCK_KEY}).scalar()
+                conn.commit()
+            except Exception:
+                conn.close()
+                raise
+            if not got:
+                conn.close()
+                return False
+            self._leader = conn
+        return True
+
+    def _release(self) -> None:
+        if self._leader is None:
+            return
+        # the connection goes back to the pool: unlock first, or drop it if that fails
+        try:
+            self._leader.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": REFRESHER_LOCK_KEY})
+            self._leader.commit()
+        except Exception:
+            self._leader.invalidate()
+        self._leader.close()
+        self._leader = None
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                try:
+                    if self._is_leader():
+                        with Session(self._engine) as db:
+                            refresh(db)
+                except Exception:
+                    log.exception("Video stats refresh failed")
+                    self._release()
+                self._stop.wait(self.interval)
+        finally:
+            self._release()
+
+
+stats_refresher = StatsRefresher()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the video_stats table.")
+    parser.add_argument("--full", action="store_true", help="rebuild from scratch instead of incrementally")
+    args = parser.parse_args()
+
+    from .database import create_db_and_tables, engine
+    create_db_and_tables()
+    with Session(engine) as db:
+        print(rebuild(db) if args.full else refresh(db))
+
+
+if __name__ == "__main__":
+    main()
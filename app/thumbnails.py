@@ -0,0 +1,221 @@
+# app/thumbnails.py
+"""
+Resized / WebP derivatives of /media/thumbs/{pixabay_id}.jpg.
+
+    /media/thumbs/123.jpg?w=320&fmt=webp
+
+A variant is rendered with Pillow on first request, in a process pool (the
+event loop only awaits the future), written to MEDIA_ROOT/derived/thumbs/
+and served from there afterwards like any other media file. The derived
+directory is an LRU disk cache capped at THUMB_CACHE_MAX_BYTES; each API
+worker tracks what it has seen and evicts the least recently served files.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .config import MEDIA_ROOT, THUMB_CACHE_MAX_BYTES, THUMB_PREGENERATE, THUMB_WORKERS
+from .media import IMMUTABLE_CACHE_CONTROL, MediaFile, safe_name, stat_file
+
+log = logging.getLogger(__name__)
+
+THUMB_WIDTHS = (160, 320, 480, 640)
+THUMB_FORMATS = {"jpg": ("JPEG", {"quality": 80, "optimize": True, "progressive": True}),
+                 "webp": ("WEBP", {"quality": 75, "method": 4})}
+
+DERIVED_REL = "derived/thumbs"
+
+
+# ======================
+# Rendering (runs in the pool)
+# ======================
+
+def render(src: str, dest: str, width: int, fmt: str) -> int:
+    """Write one variant of src to dest atomically; returns its size. width 0 = keep size."""
+    from PIL import Image
+
+    with Image.open(src) as im:
+        if width and im.width > width:
+            height = max(1, round(im.height * width / im.width))
+            # JPEG: decode at a reduced DCT scale first, then resample the rest
+            im.draft("RGB", (width, height))
+            im = im.convert("RGB").resize((width, height), Image.Resampling.LANCZOS)
+        else:
+            im = im.convert("RGB")
+        encoder, options = THUMB_FORMATS[fmt]
+        tmp = f"{dest}.{os.getpid()}.tmp"
+        im.save(tmp, encoder, **options)
+    os.replace(tmp, dest)
+    return os.path.getsize(dest)
+
+
+def variant_name(name: str, width: int, fmt: str) -> str:
+    return f"{Path(name).stem}.w{width}.{fmt}"
+
+
+def parse_variants(spec: str) -> List[Tuple[int, str]]:
+    """Parse a variant spec: "320:webp,480:jpg" -> [(320, "webp"), (480, "jpg")]."""
+    out = []
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        width, _, fmt = item.partition(":")
+        out.append(check_variant(int(width), fmt or "jpg"))
+    return out
+
+
+def check_variant(width: Optional[int], fmt: Optional[str]) -> Tuple[int, str]:
+    """Normalise (w, fmt) query values; ValueError for anything not allowed."""
+    width = width or 0
+    fmt = fmt or "jpg"
+    if width and width not in THUMB_WIDTHS:
+        raise ValueError(f"w must be one of {', '.join(map(str, THUMB_WIDTHS))}")
+    if fmt not in THUMB_FORMATS:
+        raise ValueError(f"fmt must be one of {', '.join(THUMB_FORMATS)}")
+    return width, fmt
+
+
+# ======================
+# Size-capped disk cache
+# ======================
+
+class DiskLRU:
+    """
+    Least-recently-served eviction over the files in one directory.
+    Files written by other processes (other workers, ingest) are adopted
+    the first time this process serves them.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = THUMB_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def load(self) -> int:
+        """Adopt what is already on disk, oldest access first."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                st = entry.stat()
+                entries.append((st.st_atime, entry.name, st.st_size))
+        with self._lock:
+            self._sizes = OrderedDict((name, size) for _, name, size in sorted(entries))
+            self._total = sum(self._sizes.values())
+            self._evict_locked()
+        return len(self._sizes)
+
+    def touch(self, name: str, size: int) -> None:
+        with self._lock:
+            old = self._sizes.pop(name, None)
+            if old is not None:
+                self._total -= old
+            self._sizes[name] = size
+            self._total += size
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        while self._total > self.max_bytes and len(self._sizes) > 1:
+            name, size = self._sizes.popitem(last=False)
+            self._total -= size
+            self.evicted += 1
+            try:
+                os.unlink(self.directory / name)
+            except FileNotFoundError:
+                pass
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+
+# ======================
+# Serving
+# ======================
+
+derived_cache = DiskLRU(MEDIA_ROOT / DERIVED_REL)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def get_pool() -> ProcessPoolExecutor:
+    # spawn: forking a process that runs DB/writer threads is not safe
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=THUMB_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+async def get_variant(name: str, width: Optional[int], fmt: Optional[str],
+                      root: Path = MEDIA_ROOT) -> Optional[MediaFile]:
+    """
+    Serve-ready variant of thumbs/{name}, rendering it on a miss. None when
+    the source is missing or cannot be rendered (callers fall back to the
+    original). Concurrent misses for one variant share a single render.
+    """
+    width, fmt = check_variant(width, fmt)
+    if not safe_name(name) or (not width and fmt == "jpg"):
+        return None   # the original already is a full-size JPEG
+    root = Path(root)
+    source = stat_file(root, f"thumbs/{name}")
+    if source is None:
+        return None
+    immutable = source.cache_control == IMMUTABLE_CACHE_CONTROL
+    rel = f"{DERIVED_REL}/{variant_name(name, width, fmt)}"
+
+    f = stat_file(root, rel, immutable=immutable)
+    if f is None:
+        task = _inflight.get(rel)
+        if task is None:
+            (root / DERIVED_REL).mkdir(parents=True, exist_ok=True)
+            task = asyncio.get_running_loop().run_in_executor(
+                get_pool(), render, str(source.path), str(root / rel), width, fmt
+            )
+            _inflight[rel] = task
+            task.add_done_callback(lambda _t, key=rel: _inflight.pop(key, None))
+        try:
+            # shield: a client hanging up must not cancel a render others wait on
+            await asyncio.shield(task)
+        except Exception:
+            log.exception("Thumbnail variant %s failed", rel)
+            return None
+        f = stat_file(root, rel, immutable=immutable)
+        if f is None:
+            return None
+    derived_cache.touch(f.path.name, f.size)
+    return f
+
+
+def pregenerate(thumb: Path, variants: Iterable[Tuple[int, str]]) -> int:
+    """Render missing variants of one thumbnail in this process (ingest workers); returns bytes written."""
+    out_dir = thumb.parent.parent / DERIVED_REL
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for width, fmt in variants:
+        dest = out_dir / variant_name(thumb.name, width, fmt)
+        if not dest.exists():
+            written += render(str(thumb), str(dest), width, fmt)
+    return written
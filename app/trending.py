@@ -0,0 +1,324 @@
+# app/trending.py
+"""
+"Trending now" and "most <action> this <window>" rails without GROUP BY
+per page load.
+
+Every new interaction bumps in-process counters keyed by (video_id, action):
+  * sliding windows 1h / 24h / 7d, bucketed by minute (1h) or hour (24h, 7d);
+    a running total per window is kept and expired buckets are subtracted,
+    so window edges are exact to one bucket
+  * an exponentially decayed, action-weighted score per video (half-life
+    TRENDING_HALF_LIFE). Scores are stored scaled by exp(rate * (t - t0)),
+    so an old event never needs touching: ranking compares raw values.
+
+A background thread re-ranks every TRENDING_REFRESH seconds into immutable
+top-N snapshots (requests only slice a tuple) and every TRENDING_RECONCILE
+seconds rebuilds the counters from the interactions table. That folds in
+writes made by other API workers and corrects anything lost in between.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from .config import TRENDING_HALF_LIFE, TRENDING_RECONCILE, TRENDING_REFRESH
+from .models import ActionEnum, Interaction
+from .recommender import ACTION_WEIGHTS
+
+log = logging.getLogger(__name__)
+
+TRENDING_TOP_N = 200
+
+MINUTE, HOUR = 60, 3600
+# window -> (span, bucket width) in seconds
+WINDOWS: Dict[str, Tuple[int, int]] = {
+    "1h": (HOUR, MINUTE),
+    "24h": (24 * HOUR, HOUR),
+    "7d": (168 * HOUR, HOUR),
+}
+
+Key = Tuple[int, ActionEnum]   # (video_id, action)
+
+
+# ======================
+# Counters
+# ======================
+
+class SlidingWindow:
+    """Counts per key over the last `span` seconds, in `width`-second buckets."""
+
+    def __init__(self, span: int, width: int):
+        self.width = width
+        self.n_buckets = span // width
+        self._buckets: Dict[int, Counter] = {}
+        self.totals: Counter = Counter()
+        self._head: Optional[int] = None     # newest bucket index seen
+
+    def add(self, key: Key, ts: float, n: int = 1) -> None:
+        b = int(ts // self.width)
+        if self._head is not None and b <= self._head - self.n_buckets:
+            return   # already outside the window
+        self._buckets.setdefault(b, Counter())[key] += n
+        self.totals[key] += n
+        if self._head is None or b > self._head:
+            self.advance(ts)
+
+    def advance(self, now: float) -> None:
+        """Drop buckets that slid out of the window (runs once per bucket width)."""
+        head = int(now // self.width)
+        if self._head is not None and head <= self._head:
+            return
+        self._head = head
+        cutoff = head - self.n_buckets
+        for b in [b for b in self._buckets if b <= cutoff]:
+            expired = self._buckets.pop(b)
+            self.totals.subtract(expired)
+            for key in expired:
+                if self.totals[key] <= 0:
+                    del self.totals[key]
+
+
+class DecayedScores:
+    """Per-video sum of weight * 2^(-age / half_life), updated in O(1)."""
+
+    # rebase before exp() gets anywhere near float overflow
+    _MAX_EXPONENT = 60.0
+
+    def __init__(self, half_life: float, t0: float):
+        self.rate = math.log(2) / half_life
+        self.t0 = t0
+        self.scaled: Dict[int, float] = {}
+
+    def add(self, video_id: int, weight: float, ts: float) -> None:
+        exponent = (ts - self.t0) * self.rate
+        if exponent > self._MAX_EXPONENT:
+            self._rebase(ts)
+            exponent = 0.0
+        self.scaled[video_id] = self.scaled.get(video_id, 0.0) + weight * math.exp(exponent)
+
+    def _rebase(self, ts: float) -> None:
+        factor = math.exp(-(ts - self.t0) * self.rate)
+        # scores that decayed to nothing are dropped, which bounds memory
+        self.scaled = {v: s * factor for v, s in self.scaled.items() if s * factor > 1e-6}
+        self.t0 = ts
+
+    def value(self, video_id: int, now: float) -> float:
+        return self.scaled.get(video_id, 0.0) * math.exp(-(now - self.t0) * self.rate)
+
+
+class TrendingCounters:
+    def __init__(self, half_life: float = TRENDING_HALF_LIFE, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self.windows = {name: SlidingWindow(span, width) for name, (span, width) in WINDOWS.items()}
+        self.decayed = DecayedScores(half_life, now)
+
+    def add(self, video_id: int, action: ActionEnum, ts: float, n: int = 1,
+            windows: Iterable[str] = tuple(WINDOWS), decay: bool = True) -> None:
+        key = (video_id, action)
+        for name in windows:
+            self.windows[name].add(key, ts, n)
+        if decay:
+            self.decayed.add(video_id, ACTION_WEIGHTS.get(action, 1.0) * n, ts)
+
+    def advance(self, now: float) -> None:
+        for w in self.windows.values():
+            w.advance(now)
+
+
+# ======================
+# Reconcile from the DB
+# ======================
+
+def _truncate(db: Session, column, unit: str):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(unit, column)
+    fmt = "%Y-%m-%d %H:00:00" if unit == "hour" else "%Y-%m-%d %H:%M:00"
+    return func.strftime(fmt, column)
+
+
+def _epoch(value) -> float:
+    # Interaction.timestamp is naive UTC (datetime.utcnow)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _since(now: float, seconds: int) -> datetime:
+    return datetime.fromtimestamp(now - seconds, tz=timezone.utc).replace(tzinfo=None)
+
+
+def load_counters(db: Session, now: Optional[float] = None,
+                  half_life: float = TRENDING_HALF_LIFE) -> TrendingCounters:
+    """
+    Counters as the interactions table sees them: two GROUP BY queries
+    (per hour over 7 days, per minute over the last hour) instead of raw rows.
+    """
+    now = time.time() if now is None else now
+    counters = TrendingCounters(half_life, now=now - WINDOWS["7d"][0])
+
+    hour = _truncate(db, Interaction.timestamp, "hour").label("bucket")
+    rows = db.exec(
+        select(Interaction.video_id, Interaction.action, hour, func.count())
+        .where(Interaction.timestamp >= _since(now, WINDOWS["7d"][0]))
+        .group_by(Interaction.video_id, Interaction.action, hour)
+        .order_by(hour)
+    ).all()
+    for video_id, action, bucket, n in rows:
+        start = _epoch(bucket)
+        # decayed score: events taken at the middle of their hour
+        counters.decayed.add(video_id, ACTION_WEIGHTS.get(action, 1.0) * n,
+                             min(start + HOUR / 2, now))
+        counters.add(video_id, action, start, n, windows=("24h", "7d"), decay=False)
+
+    minute = _truncate(db, Interaction.timestamp, "minute").label("bucket")
+    rows = db.exec(
+        select(Interaction.video_id, Interaction.action, minute, func.count())
+        .where(Interaction.timestamp >= _since(now, WINDOWS["1h"][0]))
+        .group_by(Interaction.video_id, Interaction.action, minute)
+        .order_by(minute)
+    ).all()
+    for video_id, action, bucket, n in rows:
+        counters.add(video_id, action, _epoch(bucket), n, windows=("1h",), decay=False)
+
+    counters.advance(now)
+    return counters
+
+
+# ======================
+# Service
+# ======================
+
+RailKey = Tuple[str, Optional[str]]   # ("trending", None) or (window, action value | None)
+
+
+class TrendingService:
+    def __init__(self, refresh: float = TRENDING_REFRESH, reconcile: float = TRENDING_RECONCILE,
+                 top_n: int = TRENDING_TOP_N, half_life: float = TRENDING_HALF_LIFE,
+                 clock=time.time):
+        self.refresh_interval = refresh
+        self.reconcile_interval = reconcile
+        self.top_n = top_n
+        self.half_life = half_life
+        self._clock = clock
+        self._counters = TrendingCounters(half_life, now=clock())
+        self._lock = threading.Lock()
+        self._replay: Optional[list] = None     # events recorded while reconcile() queries
+        self._snapshots: Dict[RailKey, Tuple[int, ...]] = {}
+        self.version = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._engine = None
+
+    # ---- write path ----
+
+    def record(self, video_id: int, action: ActionEnum, ts: Optional[float] = None) -> None:
+        ts = self._clock() if ts is None else ts
+        with self._lock:
+            self._counters.add(video_id, action, ts)
+            if self._replay is not None:
+                self._replay.append((video_id, action, ts))
+
+    def record_many(self, events: Iterable[Tuple[int, int, ActionEnum]]) -> None:
+        """(user_id, video_id, action) tuples, as queued for the InteractionWriter."""
+        now = self._clock()
+        with self._lock:
+            for _, video_id, action in events:
+                self._counters.add(video_id, action, now)
+                if self._replay is not None:
+                    self._replay.append((video_id, action, now))
+
+    # ---- read path ----
+
+    def top(self, rail: RailKey, limit: int) -> Tuple[int, ...]:
+        return self._snapshots.get(rail, ())[:limit]
+
+    def refresh(self) -> None:
+        """Rank every rail into a fresh snapshot dict, swapped in atomically."""
+        now = self._clock()
+        with self._lock:
+            self._counters.advance(now)
+            decayed = dict(self._counters.decayed.scaled)
+            totals = {name: dict(w.totals) for name, w in self._counters.windows.items()}
+
+        n = self.top_n
+        snapshots: Dict[RailKey, Tuple[int, ...]] = {
+            ("trending", None): tuple(heapq.nlargest(n, decayed, key=decayed.__getitem__)),
+        }
+        for name, counts in totals.items():
+            weighted: Dict[int, float] = {}
+            per_action: Dict[ActionEnum, Dict[int, int]] = {a: {} for a in ActionEnum}
+            for (video_id, action), c in counts.items():
+                weighted[video_id] = weighted.get(video_id, 0.0) + ACTION_WEIGHTS.get(action, 1.0) * c
+                per_action[action][video_id] = c
+            snapshots[(name, None)] = tuple(heapq.nlargest(n, weighted, key=weighted.__getitem__))
+            for action, by_video in per_action.items():
+                snapshots[(name, action.value)] = tuple(
+                    heapq.nlargest(n, by_video, key=by_video.__getitem__)
+                )
+        self._snapshots = snapshots
+        self.version += 1
+
+    def reconcile(self, engine=None) -> None:
+        """
+        Replace the counters with the DB's view. Events recorded meanwhile are
+        replayed on top (one committed just before the query may count twice
+        until the next reconcile).
+        """
+        engine = engine or self._engine
+        with self._lock:
+            self._replay = []
+        try:
+            with Session(engine) as db:
+                fresh = load_counters(db, self._clock(), self.half_life)
+        finally:
+            with self._lock:
+                replay, self._replay = self._replay, None
+        with self._lock:
+            for video_id, action, ts in replay:
+                fresh.add(video_id, action, ts)
+            self._counters = fresh
+        self.refresh()
+
+    # ---- background thread ----
+
+    def start(self, engine) -> None:
+        if self._thread is not None:
+            return
+        self._engine = engine
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="trending", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        next_reconcile = 0.0   # first pass loads the DB state
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() >= next_reconcile:
+                    self.reconcile()
+                    next_reconcile = time.monotonic() + self.reconcile_interval
+                else:
+                    self.refresh()
+            except Exception:
+                log.exception("Trending refresh failed")
+            self._stop.wait(self.refresh_interval)
+
+
+trending = TrendingService()
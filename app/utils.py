@@ -1,9 +1,97 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 
-pwd = CryptContext(schemes=["bcrypt"], deprecated="auto") # Password hashing context
+from .config import BCRYPT_ROUNDS, PASSWORD_MAX_PENDING, PASSWORD_WORKER_NICE, PASSWORD_WORKERS
+
+# Password hashing context. Hashes made with other rounds are flagged by
+# needs_update() and re-hashed on the next successful login.
+pwd = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd.hash(password)
 
 def verify(plain_password: str, hashed_password: str) -> bool:
     return pwd.verify(plain_password, hashed_password)
+
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash); new_hash is set when the stored hash uses outdated parameters."""
+    return pwd.verify_and_update(plain_password, hashed_password)
+
+
+# ======================
+# Off-thread hashing
+# ======================
+
+class PasswordPoolBusy(Exception):
+    """More hashing work queued than PASSWORD_MAX_PENDING; shed the request."""
+
+
+def _init_worker() -> None:
+    # below the API processes: under CPU contention, requests win over bcrypt
+    try:
+        os.nice(PASSWORD_WORKER_NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+class PasswordPool:
+    """
+    bcrypt in a small process pool, so a login burst uses at most `workers`
+    cores and no request threads. Admission is bounded: running + queued
+    jobs never exceed `max_pending`, extra callers get PasswordPoolBusy.
+    """
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, max_pending: int = PASSWORD_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs DB/writer threads is not safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    def submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordPoolBusy()
+            self.pending += 1
+            future = self._get_executor().submit(fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future: Future) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_pool = PasswordPool()
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(hash_password, password)
+
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await password_pool.run(verify_and_update, plain_password, hashed_password)
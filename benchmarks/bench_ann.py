@@ -0,0 +1,73 @@
+"""
+Recall@K and query latency of the IVF index versus brute force.
+
+    python -m benchmarks.bench_ann --n 500000 --dim 64 --k 20 --nprobe 4 8 16 32
+
+Vectors are synthetic and clustered (like real embeddings); the index is
+built into a temporary directory and searched through its memory-mapped
+files, exactly as the API workers use it.
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.ann import IVFIndex, brute_force, normalize
+
+
+def synth(n: int, dim: int, clusters: int = 1000, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    return normalize(centers[labels] + 0.8 * rng.normal(size=(n, dim)).astype(np.float32))
+
+
+def percentile_ms(samples, p):
+    return float(np.percentile(samples, p) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    X = synth(args.n, args.dim)
+    ids = np.arange(1, args.n + 1, dtype=np.int64)
+    rng = np.random.default_rng(1)
+    queries = X[rng.choice(args.n, args.queries, replace=False)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        IVFIndex.build(X, ids, n_lists=args.lists, path=tmp)
+        t_build = time.perf_counter() - t0
+        index = IVFIndex.load(tmp)
+        print(f"n={args.n:,} dim={args.dim} lists={len(index.centroids)} build={t_build:.2f}s")
+
+        truth, brute_lat = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            truth.append(set(brute_force(X, ids, q, args.k).tolist()))
+            brute_lat.append(time.perf_counter() - t0)
+        print(f"{'brute':>8}  recall@{args.k}=1.000  "
+              f"p50={percentile_ms(brute_lat, 50):.2f}ms p99={percentile_ms(brute_lat, 99):.2f}ms")
+
+        for nprobe in args.nprobe:
+            hits, lat = 0, []
+            for q, true in zip(queries, truth):
+                t0 = time.perf_counter()
+                found, _ = index.search(q, args.k, nprobe=nprobe)
+                lat.append(time.perf_counter() - t0)
+                hits += len(true.intersection(found.tolist()))
+            recall = hits / (args.k * len(queries))
+            print(f"{'nprobe=' + str(nprobe):>8}  recall@{args.k}={recall:.3f}  "
+                  f"p50={percentile_ms(lat, 50):.2f}ms p99={percentile_ms(lat, 99):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
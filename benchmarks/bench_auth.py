@@ -0,0 +1,81 @@
+"""
+Per-request cost of the authentication dependency, before and after the token cache.
+
+    python -m benchmarks.bench_auth [--users 10000] [--calls 20000]
+
+Runs against a throwaway SQLite file, calling the dependency functions
+directly with a fresh Session per call (what FastAPI does per request):
+  * before:        verify the JWT, then session.get(User, id)  (the old get_current_user)
+  * claims, cold:  JWT verified, snapshot from its is_admin/iat claims, no DB
+  * legacy token:  JWT without is_admin claim, so a DB lookup on every miss
+  * cached:        token -> snapshot hit in deps' LRU+TTL cache
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import HTTPException
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.cache import auth_cache
+from app.deps import get_current_user
+from app.models import User
+from app.oauth2 import create_access_token, verify_access_token
+
+
+def legacy_get_current_user(token: str, session: Session):
+    token_data = verify_access_token(token, HTTPException(status_code=401))
+    return session.get(User, int(token_data.id))
+
+
+def seed(engine, users: int) -> None:
+    with Session(engine) as db:
+        db.add_all(User(email=f"u{i}@example.com", hashed_password="x") for i in range(users))
+        db.commit()
+
+
+def per_call_us(fn, tokens, engine, calls: int, clear_cache: bool) -> float:
+    started = time.perf_counter()
+    for i in range(calls):
+        if clear_cache:
+            auth_cache.clear()
+        with Session(engine) as session:
+            fn(tokens[i % len(tokens)], session)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--active", type=int, default=1_000, help="distinct tokens in the request mix")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'auth.db'}")
+        SQLModel.metadata.create_all(engine)
+        seed(engine, args.users)
+
+        ids = random.sample(range(1, args.users + 1), min(args.active, args.users))
+        claim_tokens = [create_access_token({"user_id": i, "is_admin": False}) for i in ids]
+        legacy_tokens = [create_access_token({"user_id": i}) for i in ids]
+
+        cases = [
+            ("before (JWT + DB)", legacy_get_current_user, legacy_tokens, False),
+            ("claims, cold cache", get_current_user, claim_tokens, True),
+            ("legacy token, cold", get_current_user, legacy_tokens, True),
+            ("cached", get_current_user, claim_tokens, False),
+        ]
+        print(f"{args.calls} calls over {len(ids)} tokens, SQLite file DB")
+        print(f"{'path':<22} {'us/call':>9}")
+        for name, fn, tokens, clear in cases:
+            auth_cache.clear()
+            if name == "cached":
+                per_call_us(fn, tokens, engine, len(tokens), False)   # warm up
+            print(f"{name:<22} {per_call_us(fn, tokens, engine, args.calls, clear):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Per-row create_or_update_video versus bulk_upsert_videos.
+
+    python -m benchmarks.bench_bulk_upsert --n 5000 [--url postgresql+psycopg2://...]
+
+Without --url a throwaway SQLite file is used. Each path runs an insert pass
+(new pixabay_ids) and an update pass (same ids, new titles) on empty tables.
+Point --url at a scratch database: the video table is emptied between runs.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import delete
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.crud import bulk_upsert_videos, create_or_update_video
+from app.models import Video
+from app.schemas import VideoCreate
+
+
+def payloads(n: int, offset: int, tag: str):
+    return [
+        VideoCreate(
+            pixabay_id=offset + i,
+            title=f"{tag} nature, ocean, waves {i}",
+            description="By bench",
+            source_url=f"/media/clips/{offset + i}.mp4",
+            thumb_url=f"/media/thumbs/{offset + i}.jpg",
+        )
+        for i in range(n)
+    ]
+
+
+def per_row(engine, items):
+    with Session(engine) as db:
+        for item in items:
+            create_or_update_video(db, item)
+
+
+def bulk(engine, items):
+    with Session(engine) as db:
+        bulk_upsert_videos(db, items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=5000)
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+
+    tmp = None
+    if args.url is None:
+        fd, tmp = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        args.url = f"sqlite:///{tmp}"
+    engine = create_engine(args.url)
+    SQLModel.metadata.create_all(engine)
+
+    print(f"{'path':<10} {'pass':<8} {'seconds':>9} {'videos/s':>10}")
+    try:
+        for name, fn in (("per-row", per_row), ("bulk", bulk)):
+            with Session(engine) as db:
+                db.exec(delete(Video))
+                db.commit()
+            for label, tag in (("insert", "v1"), ("update", "v2")):
+                items = payloads(args.n, 10_000_000, tag)
+                t0 = time.perf_counter()
+                fn(engine, items)
+                dt = time.perf_counter() - t0
+                print(f"{name:<10} {label:<8} {dt:>9.2f} {args.n / dt:>10.0f}")
+    finally:
+        engine.dispose()
+        if tmp:
+            os.remove(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Co-view "up next" build: streaming pass vs loading the table, and lookup latency.
+
+    python -m benchmarks.datagen --url sqlite:///bench.db --interactions 5000000
+    python -m benchmarks.bench_coview --url sqlite:///bench.db [--lookups 100000] [--naive]
+
+Reports the build throughput and the peak RSS growth of coview.build(),
+which streams rows with yield_per. With --naive, it also reports the same
+build after fetching every row with .all() first, as a one-shot script
+would, and how far the two builds' top-10 lists agree. They can differ:
+space-saving is approximate, and each build merges the transitions in
+different batches. It then times CoviewTable.next_for() on the mmapped
+build over random video ids. That is the work GET /videos/{id}/next does
+before its catalogue-cached page.
+Each build runs in a child process, so its peak RSS is its own.
+"""
+import argparse
+import multiprocessing as mp
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlmodel import Session, select
+
+from app.coview import CoviewBuilder, CoviewTable, build
+from app.models import Interaction
+
+
+def _peak_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _build(url: str, naive: bool, out: str, queue) -> None:
+    base = _peak_mb()
+    started = time.perf_counter()
+    with Session(create_engine(url)) as db:
+        if naive:
+            rows = db.exec(
+                select(Interaction.user_id, Interaction.video_id, Interaction.action, Interaction.timestamp)
+                .order_by(Interaction.timestamp, Interaction.id)
+            ).all()
+            builder = CoviewBuilder()
+            builder.add_rows(rows)
+            table = builder.finish()
+        else:
+            table, builder = build(db)
+    elapsed = time.perf_counter() - started
+    table.save(Path(out))
+    queue.put((builder.rows, elapsed, _peak_mb() - base, table.version))
+
+
+def run_build(url: str, naive: bool, out: str):
+    queue = mp.get_context("fork").Queue()
+    proc = mp.get_context("fork").Process(target=_build, args=(url, naive, out, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--naive", action="store_true", help="also time the load-everything build")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        modes = [("streamed", False)] + ([("load all", True)] if args.naive else [])
+        tables = {}
+        for name, naive in modes:
+            out = str(Path(tmp) / name.replace(" ", "_"))
+            rows, elapsed, peak, version = run_build(args.url, naive, out)
+            tables[name] = CoviewTable.load(out, version)
+            print(f"{name:<9} {rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s), "
+                  f"peak RSS +{peak:.0f} MB")
+        if args.naive:
+            a, b = tables["streamed"], tables["load all"]
+            overlap = [len(set(a.next_for(v, 10)) & set(b.next_for(v, 10))) / max(1, len(b.next_for(v, 10)))
+                       for v in range(len(b.offsets) - 1) if b.next_for(v, 1)]
+            print(f"top-10 overlap with the load-all build: {np.mean(overlap):.1%}")
+
+        table = tables["streamed"]
+        ids = np.random.default_rng(0).integers(1, len(table.offsets), size=args.lookups).tolist()
+        samples = np.empty(len(ids))
+        for i, video_id in enumerate(ids):
+            started = time.perf_counter()
+            table.next_for(video_id, 10)
+            samples[i] = time.perf_counter() - started
+        us = samples * 1e6
+        print(f"next_for: p50 {np.percentile(us, 50):.2f} us  p99 {np.percentile(us, 99):.2f} us  "
+              f"({len(table)} videos with lists)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Full rebuild vs incremental update of the item-item model.
+
+Synthetic interactions (Zipf-distributed video popularity) are generated in
+memory, so no database is needed:
+
+    python -m benchmarks.bench_incremental --sizes 1000000 10000000 --batch 10000
+
+For each size N the script times
+  * full:        fit() over all N rows (what a scheduled rebuild costs)
+  * incremental: IncrementalState.apply() of `--batch` new rows on top of a
+                 state that already holds N rows, plus re-deriving neighbours
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.recommender import ACTION_WEIGHTS, IncrementalState, fit
+
+
+def synth(n: int, n_users: int, n_videos: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    users = rng.integers(1, n_users + 1, n, dtype=np.int64)
+    videos = np.minimum(rng.zipf(1.3, n), n_videos).astype(np.int64)
+    weights = rng.choice(np.asarray(list(ACTION_WEIGHTS.values()), dtype=np.float32), n)
+    return users, videos, weights
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--videos", type=int, default=50_000)
+    parser.add_argument("--rows-per-user", type=int, default=20)
+    parser.add_argument("--neighbours", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'N':>12} {'full (s)':>10} {'state (s)':>10} {'incr apply (s)':>15} {'incr total (s)':>15}")
+    for n in args.sizes:
+        n_users = max(1, n // args.rows_per_user)
+        u, v, w = synth(n + args.batch, n_users, args.videos)
+        base, new = slice(0, n), slice(n, n + args.batch)
+
+        _, t_full = timed(fit, u[base], v[base], w[base], args.neighbours)
+
+        state = IncrementalState()
+        _, t_state = timed(state.apply, u[base], v[base], w[base])
+        _, t_apply = timed(state.apply, u[new], v[new], w[new])
+        _, t_model = timed(state.to_model, args.neighbours)
+
+        print(f"{n:>12,} {t_full:>10.2f} {t_state:>10.2f} {t_apply:>15.3f} {t_apply + t_model:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
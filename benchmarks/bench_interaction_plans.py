@@ -0,0 +1,101 @@
+"""
+Query plans for interaction history/events with and without the composite indexes.
+
+    python -m benchmarks.bench_interaction_plans --url postgresql+psycopg2://... \
+        [--seed 1000000] [--user-id 42] [--video-id 7]
+
+For each query the script prints EXPLAIN (ANALYZE, BUFFERS) twice:
+  * "old":  the previous shape (LIMIT then filter `action` in Python), run
+            with the composite indexes dropped inside a rolled-back transaction
+  * "new":  the `action` filter pushed into SQL, with the composite indexes
+
+--seed inserts synthetic users/videos/interactions with generate_series;
+point it at a scratch database, never at production.
+"""
+import argparse
+
+from sqlalchemy import create_engine, text
+
+COMPOSITE_INDEXES = (
+    "ix_interactions_user_id_timestamp_id",
+    "ix_interactions_video_id_action_timestamp",
+)
+
+QUERIES = {
+    "user history ?action=like": (
+        # old: fetch a page, then filter in Python
+        "SELECT * FROM interactions WHERE user_id = :user_id "
+        "ORDER BY timestamp DESC LIMIT 50",
+        "SELECT * FROM interactions WHERE user_id = :user_id AND action IN ('like') "
+        "ORDER BY timestamp DESC, id DESC LIMIT 50",
+    ),
+    "video events ?action=complete&action=share": (
+        "SELECT * FROM interactions WHERE video_id = :video_id "
+        "ORDER BY timestamp DESC LIMIT 50",
+        "SELECT * FROM interactions WHERE video_id = :video_id "
+        "AND action IN ('complete', 'share') ORDER BY timestamp DESC, id DESC LIMIT 50",
+    ),
+}
+
+SEED_SQL = """
+INSERT INTO users (email, hashed_password, is_admin)
+SELECT 'bench' || g || '@example.com', 'x', false
+FROM generate_series(1, :users) g ON CONFLICT DO NOTHING;
+
+INSERT INTO video (pixabay_id, title, source_url, uploaded_at)
+SELECT 900000000 + g, 'bench ' || g, '/media/clips/' || g || '.mp4', now()
+FROM generate_series(1, :videos) g ON CONFLICT DO NOTHING;
+
+INSERT INTO interactions (user_id, video_id, action, timestamp)
+SELECT ub.lo + (random() * (:users - 1))::int,
+       vb.lo + (power(random(), 3) * (:videos - 1))::int,    -- skewed video popularity
+       (ARRAY['view','like','complete','bookmark','share'])[1 + (random() * 4)::int]::actionenum,
+       now() - random() * interval '30 days'
+FROM generate_series(1, :rows) g,
+     (SELECT min(id) AS lo FROM users WHERE email LIKE 'bench%@example.com') ub,
+     (SELECT min(id) AS lo FROM video WHERE pixabay_id > 900000000) vb
+ON CONFLICT DO NOTHING;
+ANALYZE interactions;
+"""
+
+
+def explain(conn, sql: str, params: dict) -> str:
+    rows = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + sql), params).all()
+    return "\n".join("    " + r[0] for r in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--seed", type=int, default=0, help="insert this many synthetic interactions first")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--video-id", type=int, default=1)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    if args.seed:
+        with engine.begin() as conn:
+            for stmt in filter(str.strip, SEED_SQL.split(";")):
+                conn.execute(text(stmt), {
+                    "rows": args.seed,
+                    "users": max(1, args.seed // 50),
+                    "videos": max(1, args.seed // 20),
+                })
+
+    params = {"user_id": args.user_id, "video_id": args.video_id}
+    for name, (old_sql, new_sql) in QUERIES.items():
+        print(f"== {name}")
+        with engine.connect() as conn:
+            trans = conn.begin()
+            for ix in COMPOSITE_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {ix}"))
+            print("  old (no composite index, filter in Python):")
+            print(explain(conn, old_sql, params))
+            trans.rollback()
+        with engine.connect() as conn:
+            print("  new (filter in SQL, composite index):")
+            print(explain(conn, new_sql, params))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Seek-heavy clip playback against the old StaticFiles mount and app.media.
+
+    python -m benchmarks.bench_media [--size-mb 64] [--requests 2000] \
+        [--window-kb 1024] [--concurrency 16]
+
+Both handlers serve the same synthetic clip from a temporary MEDIA_ROOT
+through httpx's ASGITransport (in-process, no sockets), so the numbers
+compare handler overhead and bytes moved, not the network. Each simulated
+player seeks to random offsets and asks for a `--window-kb` range, the
+way MSE/HLS players fetch fixed-size segments; a second pass revalidates
+thumbnails with If-None-Match.
+
+Useful bytes are the requested windows; "sent" counts whatever came back
+(a handler without Range support returns the whole clip every time).
+Zero-copy sendfile is not exercised here: ASGITransport offers no
+`zerocopysend`/`pathsend` extension, so app.media uses its threaded reads.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.staticfiles import StaticFiles
+
+from app.media import media_response, resolve
+
+
+def make_media_root(root: Path, size_mb: int, thumbs: int) -> None:
+    (root / "clips").mkdir(parents=True)
+    (root / "thumbs").mkdir(parents=True)
+    with open(root / "clips" / "1.mp4", "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(1024 * 1024))
+    for i in range(thumbs):
+        (root / "thumbs" / f"{i}.jpg").write_bytes(os.urandom(30_000))
+
+
+def static_app(root: Path) -> FastAPI:
+    app = FastAPI()
+    app.mount("/media", StaticFiles(directory=str(root)), name="media")
+    return app
+
+
+def media_app(root: Path) -> FastAPI:
+    app = FastAPI()
+
+    @app.api_route("/media/{kind}/{name}", methods=["GET", "HEAD"])
+    async def serve(kind: str, name: str, request: Request):
+        f = resolve(kind, name, root)
+        if f is None:
+            raise HTTPException(status_code=404)
+        return media_response(f, request.headers, request.method, x_accel_prefix=None)
+
+    return app
+
+
+async def _player(client, size, window, n, useful, sent, latencies, statuses):
+    for _ in range(n):
+        start = random.randrange(0, max(1, size - window))
+        t0 = time.perf_counter()
+        r = await client.get("/media/clips/1.mp4",
+                             headers={"Range": f"bytes={start}-{start + window - 1}"})
+        latencies.append(time.perf_counter() - t0)
+        statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+        useful[0] += window
+        sent[0] += len(r.content)
+
+
+async def seek_run(app, size, window, total, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    useful, sent, latencies, statuses = [0], [0], [], {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        per_player = max(1, total // concurrency)
+        t0 = time.perf_counter()
+        await asyncio.gather(*(
+            _player(client, size, window, per_player, useful, sent, latencies, statuses)
+            for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - t0
+    lat = np.asarray(latencies) * 1000
+    return {
+        "rps": len(lat) / elapsed,
+        "useful_mb_s": useful[0] / elapsed / 2**20,
+        "sent_mb": sent[0] / 2**20,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "statuses": statuses,
+    }
+
+
+async def revalidate_run(app, thumbs, rounds):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        etags = {}
+        for i in range(thumbs):
+            r = await client.get(f"/media/thumbs/{i}.jpg")
+            etags[i] = r.headers.get("etag", "")
+        not_modified = 0
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for i in range(thumbs):
+                r = await client.get(f"/media/thumbs/{i}.jpg", headers={"If-None-Match": etags[i]})
+                not_modified += r.status_code == 304
+        elapsed = time.perf_counter() - t0
+    return {"rps": rounds * thumbs / elapsed, "304_ratio": not_modified / (rounds * thumbs),
+            "cache_control": r.headers.get("cache-control")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--window-kb", type=int, default=1024)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--thumbs", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_media_root(root, args.size_mb, args.thumbs)
+        size = args.size_mb * 2**20
+        window = args.window_kb * 1024
+        apps = {"StaticFiles": static_app(root), "app.media": media_app(root)}
+
+        print(f"seek: {args.requests} x {args.window_kb} KiB ranges in a {args.size_mb} MiB clip, "
+              f"{args.concurrency} players")
+        print(f"{'handler':<12} {'req/s':>8} {'useful MB/s':>12} {'sent MB':>9} "
+              f"{'p50 ms':>8} {'p99 ms':>8}  statuses")
+        for name, app in apps.items():
+            res = asyncio.run(seek_run(app, size, window, args.requests, args.concurrency))
+            print(f"{name:<12} {res['rps']:>8.0f} {res['useful_mb_s']:>12.1f} {res['sent_mb']:>9.0f} "
+                  f"{res['p50_ms']:>8.2f} {res['p99_ms']:>8.2f}  {res['statuses']}")
+
+        print(f"\nrevalidate: {args.thumbs} thumbnails x 10 rounds with If-None-Match")
+        for name, app in apps.items():
+            res = asyncio.run(revalidate_run(app, args.thumbs, 10))
+            print(f"{name:<12} {res['rps']:>8.0f} req/s  304s {res['304_ratio']:.0%}  "
+                  f"Cache-Control: {res['cache_control']}")
+
+
+if __name__ == "__main__":
+    main()
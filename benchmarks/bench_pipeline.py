@@ -0,0 +1,93 @@
+"""
+Recommendation pipeline latency: warm vs cold users, and a flaky source under the budget.
+
+    python -m benchmarks.datagen --url sqlite:///bench.db
+    python -m benchmarks.bench_pipeline --url sqlite:///bench.db [--requests 500]
+
+Builds the item-item model, the co-view table and a text ANN index from
+the database, in memory and a temporary directory, then times
+recommender.recommend() (the work behind a recommendations cache miss):
+  * warm: random users that have history
+  * cold: a user id with no interactions (popular + recent only)
+  * flaky: warm again, with an extra stage that sleeps 10x the overall
+    budget on 10% of calls; its p99 should stay near RECO_PIPELINE_BUDGET_MS
+It also reports how many candidates each stage returns, and how often a
+stage timed out or was skipped because earlier calls were still running.
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine, func
+from sqlmodel import Session, select
+
+from app import ann, coview, database, recommender
+from app.metrics import REGISTRY
+from app.models import Interaction
+from app.trending import trending
+
+
+def timings(db: Session, users, requests: int):
+    samples = []
+    for _ in range(requests):
+        user_id = random.choice(users)
+        started = time.perf_counter()
+        recommender.recommend(db, user_id, 20)
+        samples.append(time.perf_counter() - started)
+    return np.percentile(np.asarray(samples) * 1000, [50, 95, 99])
+
+
+def timeouts() -> dict:
+    metric = next(m for m in REGISTRY if m.name == "recommender_stage_timeouts_total")
+    return {stage: int(n) for (stage,), n in metric._values.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    random.seed(0)
+
+    engine = create_engine(args.url)
+    database.read_engine = engine   # the "recent" stage opens its own session
+    with tempfile.TemporaryDirectory() as tmp, Session(engine) as db:
+        started = time.perf_counter()
+        recommender.rebuild_model(engine, path=None)
+        table, _ = coview.build(db)
+        table.save(Path(tmp) / "coview")
+        coview.load_coview(Path(tmp) / "coview")
+        ann.build_from_db(db, "text", path=Path(tmp) / "ann")
+        ann.load_index(Path(tmp) / "ann")
+        trending.reconcile(engine)
+        trending.refresh()
+        print(f"models built in {time.perf_counter() - started:.1f}s")
+
+        warm = db.exec(select(Interaction.user_id).distinct().limit(5000)).all()
+        cold = [(db.exec(select(func.max(Interaction.user_id))).one() or 0) + 1_000_000]
+        ctx = recommender.user_context(db, warm[0])
+        sizes = {name: len(ids) for name, (ids, _) in recommender.gather_candidates(ctx).items()}
+        print(f"candidates per stage for user {warm[0]}: {sizes}")
+
+        budget_ms = recommender.PIPELINE_BUDGET * 1000
+        print(f"{'users':<6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}   (budget {budget_ms:.0f} ms)")
+        for name, users in (("warm", warm), ("cold", cold)):
+            p50, p95, p99 = timings(db, users, args.requests)
+            print(f"{name:<6} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f}")
+
+        @recommender.candidate_generator("flaky", weight=1.0, budget_ms=budget_ms)
+        def flaky(ctx, n):
+            if random.random() < 0.1:
+                time.sleep(recommender.PIPELINE_BUDGET * 10)
+            return recommender._ranked([])
+
+        p50, p95, p99 = timings(db, warm, args.requests)
+        print(f"{'flaky':<6} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f}")
+        print(f"stage timeouts: {timeouts()}")
+
+
+if __name__ == "__main__":
+    main()
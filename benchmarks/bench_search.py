@@ -0,0 +1,128 @@
+"""
+GET /videos/search latency: indexed search vs a naive substring scan.
+
+    python -m benchmarks.bench_search [--sizes 100000,1000000] [--queries 200]
+        [--url postgresql+psycopg2://...]
+
+Generates Pixabay-like titles (3-6 tags drawn from a Zipf-skewed vocabulary)
+and, per catalogue size, times a mix of queries (common tag, rare tag, two
+tags, prefix) through crud.search_videos, first page of 20:
+  * without --url: a throwaway SQLite file and the in-process inverted index
+    (build time reported separately), vs `title LIKE '%tag%'`
+  * with --url: Postgres and the GIN tsvector index, vs `title ILIKE '%tag%'`
+    (the video table is emptied first: use a scratch database)
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import delete, insert
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.crud import VIDEO_READ_COLUMNS, as_rows, search_videos
+from app.models import Video
+from app.search import search_index
+
+VOCAB_SIZE = 5000
+PAGE = 20
+
+
+def vocabulary(rng: random.Random):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < VOCAB_SIZE:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 9))))
+    return sorted(words)
+
+
+def titles(n: int, words, rng: np.random.Generator):
+    # Zipf-like: tag rank r drawn with weight 1/r
+    weights = 1.0 / np.arange(1, len(words) + 1)
+    weights /= weights.sum()
+    picks = rng.choice(len(words), size=(n, 6), p=weights)
+    lengths = rng.integers(3, 7, size=n)
+    for row, k in zip(picks, lengths):
+        yield ", ".join(dict.fromkeys(words[i] for i in row[:k]))
+
+
+def seed(engine, n: int, words) -> None:
+    rng = np.random.default_rng(0)
+    with Session(engine) as db:
+        db.exec(delete(Video))
+        batch = []
+        for i, title in enumerate(titles(n, words, rng)):
+            batch.append({"pixabay_id": 800_000_000 + i, "title": title, "description": "By bench",
+                          "source_url": f"/media/clips/{i}.mp4"})
+            if len(batch) == 10_000:
+                db.execute(insert(Video), batch)
+                batch = []
+        if batch:
+            db.execute(insert(Video), batch)
+        db.commit()
+
+
+def query_mix(words, rng: random.Random, n: int):
+    common, rare = words[:20], words[-2000:]
+    kinds = [
+        lambda: rng.choice(common),
+        lambda: rng.choice(rare),
+        lambda: f"{rng.choice(common)} {rng.choice(words[:500])}",
+        lambda: rng.choice(words[:1000])[:3],
+    ]
+    return [kinds[i % len(kinds)]() for i in range(n)]
+
+
+def naive(db: Session, q: str, postgres: bool):
+    column = Video.title.ilike if postgres else Video.title.like
+    stmt = select(*VIDEO_READ_COLUMNS).where(*(column(f"%{t}%") for t in q.split()))
+    return as_rows(db.exec(stmt.order_by(Video.id.desc()).limit(PAGE)))
+
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return np.percentile(ms, 50), np.percentile(ms, 95), ms.max()
+
+
+def run(engine, n: int, queries, words, postgres: bool) -> None:
+    seed(engine, n, words)
+    with Session(engine) as db:
+        if not postgres:
+            started = time.perf_counter()
+            search_index.load(db, "bench")
+            print(f"{n:>9} inverted index built in {time.perf_counter() - started:.1f}s")
+        for name, fn in (
+            ("indexed", lambda q: search_videos(db, q, 0, PAGE, "bench")),
+            ("naive scan", lambda q: naive(db, q, postgres)),
+        ):
+            samples, hits = [], 0
+            for q in queries:
+                started = time.perf_counter()
+                hits += bool(fn(q))
+                samples.append(time.perf_counter() - started)
+            p50, p95, worst = percentiles(samples)
+            print(f"{n:>9} {name:<11} p50 {p50:>8.2f} ms  p95 {p95:>8.2f} ms  max {worst:>8.2f} ms"
+                  f"  ({hits}/{len(queries)} with results)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="100000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    words = vocabulary(rng)
+    queries = query_mix(words, rng, args.queries)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.url or f"sqlite:///{Path(tmp) / 'search.db'}")
+        SQLModel.metadata.create_all(engine)
+        for n in (int(s) for s in args.sizes.split(",")):
+            run(engine, n, queries, words, postgres=args.url is not None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+CPU per page of the list endpoints: ORM objects + response_model vs rows + RowsResponse.
+
+    python -m benchmarks.bench_serialization [--limits 20,100,500] [--requests 200]
+
+Mounts the real GET /videos, /users and /users/{id}/interactions handlers
+next to copies of their previous versions (select the ORM entity, return it
+and let FastAPI validate/serialize through response_model) on one app
+backed by a throwaway SQLite file, and reports process CPU time per request
+through TestClient. Client overhead is the same for both and is included.
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.database import get_read_session, get_session
+from app.deps import ensure_self_or_admin, require_admin
+from app.models import ActionEnum, Interaction, User, Video
+from app.oauth2 import create_access_token
+from app.routers import interactions, user, videos
+from app.schemas import InteractionRead, UserOut, VideoRead
+
+legacy = APIRouter(prefix="/legacy")
+
+
+@legacy.get("/videos", response_model=List[VideoRead])
+def legacy_videos(limit: int = 20, db: Session = Depends(get_read_session)):
+    stmt = select(Video).order_by(Video.uploaded_at.desc(), Video.id.desc()).limit(limit)
+    return db.exec(stmt).all()
+
+
+@legacy.get("/users", response_model=List[UserOut])
+def legacy_users(limit: int = 20, _admin=Depends(require_admin), db: Session = Depends(get_session)):
+    return db.exec(select(User).order_by(User.id).limit(limit)).all()
+
+
+@legacy.get("/users/{user_id}/interactions", response_model=List[InteractionRead])
+def legacy_history(user_id: int, limit: int = 50, _=Depends(ensure_self_or_admin),
+                   db: Session = Depends(get_read_session)):
+    stmt = (
+        select(Interaction)
+        .where(Interaction.user_id == user_id)
+        .order_by(Interaction.timestamp.desc(), Interaction.id.desc())
+        .limit(limit)
+    )
+    return db.exec(stmt).all()
+
+
+def seed(engine, n: int) -> int:
+    start = datetime(2024, 1, 1)
+    with Session(engine) as db:
+        db.add_all(User(email=f"u{i}@example.com", hashed_password="x", full_name=f"User {i}",
+                        is_admin=(i == 0)) for i in range(n))
+        db.add_all(Video(pixabay_id=i, title=f"nature, ocean, waves {i}", description="By bench",
+                         source_url=f"/media/clips/{i}.mp4", thumb_url=f"/media/thumbs/{i}.jpg",
+                         uploaded_at=start + timedelta(minutes=i)) for i in range(n))
+        db.commit()
+        admin = db.exec(select(User.id).order_by(User.id)).first()
+        video_ids = db.exec(select(Video.id)).all()
+        actions = list(ActionEnum)
+        db.add_all(Interaction(user_id=admin, video_id=v, action=actions[i % len(actions)],
+                               timestamp=start + timedelta(seconds=i))
+                   for i, v in enumerate(video_ids))
+        db.commit()
+    return admin
+
+
+def cpu_ms(client: TestClient, path: str, headers: dict, requests: int) -> float:
+    client.get(path, headers=headers)   # warm up
+    started = time.process_time()
+    for _ in range(requests):
+        client.get(path, headers=headers).raise_for_status()
+    return (time.process_time() - started) / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--limits", default="20,100,500")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    limits = [int(x) for x in args.limits.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'ser.db'}")
+        SQLModel.metadata.create_all(engine)
+        admin = seed(engine, max(limits))
+
+        def session():
+            with Session(engine) as db:
+                yield db
+
+        app = FastAPI()
+        for router in (videos.router, user.router, interactions.router, legacy):
+            app.include_router(router)
+        app.dependency_overrides[get_session] = session
+        app.dependency_overrides[get_read_session] = session
+        headers = {"Authorization": "Bearer " + create_access_token({"user_id": admin, "is_admin": True})}
+
+        endpoints = {
+            "videos": "/videos?limit={}",
+            "users": "/users?limit={}",
+            "history": f"/users/{admin}/interactions?limit={{}}",
+        }
+        print(f"CPU ms per request, {args.requests} requests each")
+        print(f"{'endpoint':<9} {'limit':>5} {'before':>8} {'after':>8} {'speedup':>8}")
+        with TestClient(app) as client:
+            for name, path in endpoints.items():
+                for limit in limits:
+                    new = path.format(limit)
+                    before = cpu_ms(client, "/legacy" + new, headers, args.requests)
+                    after = cpu_ms(client, new, headers, args.requests)
+                    print(f"{name:<9} {limit:>5} {before:>8.2f} {after:>8.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
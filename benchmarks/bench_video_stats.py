@@ -0,0 +1,97 @@
+"""
+video_stats: full rebuild vs incremental refresh, and feed pages with stats.
+
+    python -m benchmarks.bench_video_stats --url postgresql+psycopg2://... \
+        [--seed 10000000] [--new 100000] [--page 20] [--pages 200]
+
+Steps (point it at a scratch database, never at production):
+  1. --seed inserts synthetic users/videos/interactions (bench_interaction_plans' SEED_SQL)
+  2. rebuild():  GROUP BY over the whole interactions table
+  3. --new more interactions, then refresh(): only the rows past the watermark
+  4. a feed page of --page videos with stats, averaged over --pages pages:
+       * per video: one aggregate query on interactions per video (N+1)
+       * video_stats: one `video_id IN (...)` lookup for the page
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import create_engine, func, text
+from sqlmodel import Session, SQLModel, select
+
+from app.models import Interaction, Video
+from app.stats import get_video_stats, rebuild, refresh
+
+from .bench_interaction_plans import SEED_SQL
+
+
+def seed(engine, rows: int) -> None:
+    with engine.begin() as conn:
+        for stmt in filter(str.strip, SEED_SQL.split(";")):
+            conn.execute(text(stmt), {
+                "rows": rows,
+                "users": max(1, rows // 50),
+                "videos": max(1, rows // 20),
+            })
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def per_video_aggregates(db: Session, ids) -> dict:
+    out = {}
+    for video_id in ids:
+        out[video_id] = db.exec(
+            select(Interaction.action, func.count(), func.count(func.distinct(Interaction.user_id)),
+                   func.max(Interaction.timestamp))
+            .where(Interaction.video_id == video_id)
+            .group_by(Interaction.action)
+        ).all()
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--seed", type=int, default=10_000_000, help="interactions to insert first (0: none)")
+    parser.add_argument("--new", type=int, default=100_000, help="interactions added before the incremental run")
+    parser.add_argument("--page", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    SQLModel.metadata.create_all(engine)
+    if args.seed:
+        secs, _ = timed(lambda: seed(engine, args.seed))
+        print(f"seeded {args.seed} interactions in {secs:.1f}s")
+
+    with Session(engine) as db:
+        total = db.exec(select(func.count()).select_from(Interaction)).one()
+        secs, res = timed(lambda: rebuild(db))
+        print(f"rebuild       {secs:>8.2f}s  {total} interactions -> {res['videos']} videos")
+
+    if args.new:
+        seed(engine, args.new)
+    with Session(engine) as db:
+        secs, res = timed(lambda: refresh(db))
+        print(f"refresh       {secs:>8.2f}s  +{args.new} interactions -> {res['videos']} videos")
+        secs, res = timed(lambda: refresh(db))
+        print(f"refresh (idle){secs:>8.4f}s")
+
+    with Session(engine) as db:
+        ids = db.exec(select(Video.id)).all()
+    pages = [random.sample(ids, min(args.page, len(ids))) for _ in range(args.pages)]
+    for name, fn in (("per video (N+1)", per_video_aggregates), ("video_stats IN", get_video_stats)):
+        with Session(engine) as db:
+            started = time.perf_counter()
+            for page in pages:
+                fn(db, page)
+            ms = (time.perf_counter() - started) / len(pages) * 1000
+        print(f"page of {args.page:<4} {name:<16} {ms:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
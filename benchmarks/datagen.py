@@ -0,0 +1,278 @@
+"""
+Synthetic users, videos and power-law interactions for load tests and benchmarks.
+
+    python -m benchmarks.datagen --url sqlite:///bench.db \
+        [--users 10000] [--videos 50000] [--interactions 1000000] [--alpha 1.1] \
+        [--days 30] [--seed 0] [--reset] [--stats] [--manifest benchmarks/results/dataset.json]
+
+Reproducible: the same --seed and sizes give the same rows. How the data
+is shaped:
+  * video popularity and user activity are Zipf-like (rank r drawn with
+    weight 1/r^alpha), with popularity shuffled across video ids
+  * actions are drawn over every ActionEnum value (ACTION_WEIGHTS)
+  * timestamps span the last --days days, and rows are inserted in
+    timestamp order, so interaction ids grow with time as they do in production
+  * (user, video, action) triples are distinct, as the unique constraint requires
+
+Loading uses COPY FROM STDIN on Postgres (psycopg2). On SQLite it uses one
+executemany transaction with synchronous=OFF. Every user shares PASSWORD,
+which is hashed once. Generated rows are recognisable: emails are
+load<i>@example.com and pixabay_id >= PIXABAY_BASE. --reset deletes them
+first. The schema is created if missing.
+
+The manifest written at the end is what benchmarks.harness reads: sizes,
+seed, the id ranges and the login password. Start (or restart) the API
+after loading, so that its in-memory id sets see the new rows.
+"""
+import argparse
+import csv
+import io
+import json
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, List, Sequence
+
+import numpy as np
+from sqlalchemy import delete, func, or_, text
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.catalogue import catalogue
+from app.models import ActionEnum, Interaction, User, Video, VideoStats
+from app.utils import hash_password
+
+EMAIL_FORMAT = "load{}@example.com"
+EMAIL_LIKE = "load%@example.com"
+PASSWORD = "load-password"
+PIXABAY_BASE = 700_000_000
+CHUNK_ROWS = 100_000
+DEFAULT_MANIFEST = Path(__file__).parent / "results" / "dataset.json"
+
+ACTIONS: List[ActionEnum] = list(ActionEnum)
+ACTION_WEIGHTS = {
+    ActionEnum.view: 0.62,
+    ActionEnum.complete: 0.2,
+    ActionEnum.like: 0.1,
+    ActionEnum.bookmark: 0.05,
+    ActionEnum.share: 0.03,
+}
+TAGS = ("nature ocean waves beach sunset mountain forest snow city night street car "
+        "people dance music food coffee rain storm sky clouds animal dog cat bird "
+        "flower spring autumn water river lake desert travel sport football abstract").split()
+
+
+def zipf_weights(n: int, alpha: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** alpha
+    return weights / weights.sum()
+
+
+def action_probabilities() -> np.ndarray:
+    p = np.array([ACTION_WEIGHTS[a] for a in ACTIONS])
+    return p / p.sum()
+
+
+# ======================
+# Generation
+# ======================
+
+def user_rows(n: int, password_hash: str) -> Iterable[tuple]:
+    for i in range(n):
+        yield EMAIL_FORMAT.format(i), password_hash, f"Load User {i}", False
+
+
+def video_rows(n: int, days: int, rng: np.random.Generator) -> Iterable[tuple]:
+    tag_p = zipf_weights(len(TAGS), 1.0)
+    tags = rng.choice(len(TAGS), size=(n, 4), p=tag_p)
+    # the catalogue grows over a year; the newest uploads are the last ids
+    start = datetime.utcnow() - timedelta(days=max(days, 365))
+    offsets = np.sort(rng.uniform(0, max(days, 365) * 86400, size=n))
+    for i in range(n):
+        title = ", ".join(dict.fromkeys(TAGS[t] for t in tags[i]))
+        uploaded_at = start + timedelta(seconds=float(offsets[i]))
+        yield (PIXABAY_BASE + i, title, "By datagen", f"/media/clips/{i}.mp4",
+               f"/media/thumbs/{i}.jpg", uploaded_at.isoformat(sep=" ", timespec="microseconds"))
+
+
+def interaction_arrays(n: int, users: int, videos: int, alpha: float, days: int,
+                       rng: np.random.Generator):
+    """
+    n distinct (user index, video index, action index) triples as arrays,
+    plus unix seconds, in time order. Popular pairs collide, so draws are
+    repeated until n distinct triples exist (or the space is saturated).
+    """
+    user_p, video_p, action_p = zipf_weights(users, alpha), zipf_weights(videos, alpha), action_probabilities()
+    # popularity rank -> user/video index, so the hot rows are spread over the id space
+    user_of_rank, video_of_rank = rng.permutation(users), rng.permutation(videos)
+    keys = np.empty(0, dtype=np.int64)
+    for _ in range(20):
+        deficit = n - len(keys)
+        if deficit <= 0:
+            break
+        draw = deficit * 2
+        u = user_of_rank[rng.choice(users, size=draw, p=user_p)].astype(np.int64)
+        v = video_of_rank[rng.choice(videos, size=draw, p=video_p)]
+        a = rng.choice(len(ACTIONS), size=draw, p=action_p)
+        keys = np.unique(np.concatenate([keys, (u * videos + v) * len(ACTIONS) + a]))
+    if len(keys) > n:
+        keys = rng.choice(keys, size=n, replace=False)
+
+    now = time.time()
+    seconds = np.sort(rng.uniform(now - days * 86400, now, size=len(keys)))
+    keys = rng.permutation(keys)
+    pair, action_idx = np.divmod(keys, len(ACTIONS))
+    user_idx, video_idx = np.divmod(pair, videos)
+    return user_idx, video_idx, action_idx, seconds
+
+
+def timestamps(seconds: np.ndarray) -> np.ndarray:
+    # "YYYY-MM-DD HH:MM:SS.ffffff": what SQLAlchemy stores on SQLite, and valid COPY input
+    us = (seconds * 1e6).astype("datetime64[us]")
+    return np.char.replace(np.datetime_as_string(us, unit="us"), "T", " ")
+
+
+# ======================
+# Loading
+# ======================
+
+def load_rows(engine, table: str, columns: Sequence[str], rows: Iterable[tuple]) -> int:
+    """COPY on Postgres, executemany on SQLite, CHUNK_ROWS at a time."""
+    raw = engine.raw_connection()
+    total = 0
+    try:
+        cursor = raw.cursor()
+        postgres = engine.dialect.name == "postgresql"
+        if postgres:
+            copy = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        else:
+            cursor.execute("PRAGMA synchronous = OFF")
+            insert = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                      f"VALUES ({', '.join('?' * len(columns))})")
+        chunk: List[tuple] = []
+
+        def flush():
+            if postgres:
+                buf = io.StringIO()
+                csv.writer(buf).writerows(chunk)
+                buf.seek(0)
+                cursor.copy_expert(copy, buf)
+            else:
+                cursor.executemany(insert, chunk)
+            chunk.clear()
+
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == CHUNK_ROWS:
+                total += len(chunk)
+                flush()
+        total += len(chunk)
+        if chunk:
+            flush()
+        raw.commit()
+    finally:
+        raw.close()
+    return total
+
+
+def generated_ids(db: Session, users: int, videos: int):
+    """Ids of the generated users/videos, indexed like the generator (email / pixabay_id order)."""
+    user_ids = np.zeros(users, dtype=np.int64)
+    for uid, email in db.exec(select(User.id, User.email).where(User.email.like(EMAIL_LIKE))):
+        i = int(email[len("load"):-len("@example.com")])
+        if i < users:
+            user_ids[i] = uid
+    video_ids = np.asarray(db.exec(
+        select(Video.id).where(Video.pixabay_id >= PIXABAY_BASE).order_by(Video.pixabay_id)
+    ).all(), dtype=np.int64)
+    assert user_ids.all() and len(video_ids) == videos, "generated users/videos went missing"
+    return user_ids, video_ids
+
+
+def reset(db: Session) -> None:
+    users = select(User.id).where(User.email.like(EMAIL_LIKE))
+    videos = select(Video.id).where(Video.pixabay_id >= PIXABAY_BASE)
+    db.exec(delete(Interaction).where(or_(Interaction.user_id.in_(users),
+                                          Interaction.video_id.in_(videos))))
+    db.exec(delete(VideoStats).where(VideoStats.video_id.in_(videos)))
+    db.exec(delete(Video).where(Video.pixabay_id >= PIXABAY_BASE))
+    db.exec(delete(User).where(User.email.like(EMAIL_LIKE)))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", required=True, help="SQLAlchemy URL (sqlite:///... or postgresql+psycopg2://...)")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--videos", type=int, default=50_000)
+    parser.add_argument("--interactions", type=int, default=1_000_000)
+    parser.add_argument("--alpha", type=float, default=1.1, help="Zipf exponent for users and videos")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reset", action="store_true", help="delete previously generated rows first")
+    parser.add_argument("--stats", action="store_true", help="rebuild video_stats afterwards")
+    parser.add_argument("--manifest", type=Path, default=DEFAULT_MANIFEST)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    engine = create_engine(args.url)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        if args.reset:
+            reset(db)
+        if db.exec(select(func.count()).select_from(User).where(User.email.like(EMAIL_LIKE))).one():
+            raise SystemExit("generated rows already exist: rerun with --reset")
+    timings = {}
+
+    started = time.perf_counter()
+    load_rows(engine, "users", ("email", "hashed_password", "full_name", "is_admin"),
+              user_rows(args.users, hash_password(PASSWORD)))
+    load_rows(engine, "video", ("pixabay_id", "title", "description", "source_url", "thumb_url",
+                                "uploaded_at"), video_rows(args.videos, args.days, rng))
+    timings["users_videos_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with Session(engine) as db:
+        user_ids, video_ids = generated_ids(db, args.users, args.videos)
+    u, v, a, seconds = interaction_arrays(args.interactions, args.users, args.videos,
+                                          args.alpha, args.days, rng)
+    names = np.array([action.name for action in ACTIONS])
+    rows = zip(user_ids[u].tolist(), video_ids[v].tolist(), names[a].tolist(), timestamps(seconds).tolist())
+    timings["generate_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    loaded = load_rows(engine, "interactions", ("user_id", "video_id", "action", "timestamp"), rows)
+    timings["interactions_s"] = time.perf_counter() - started
+    print(f"{args.users} users, {args.videos} videos, {loaded} interactions "
+          f"loaded in {timings['interactions_s']:.1f}s "
+          f"({loaded / max(timings['interactions_s'], 1e-9):,.0f} rows/s)")
+
+    started = time.perf_counter()
+    with Session(engine) as db:
+        if engine.dialect.name == "postgresql":
+            db.exec(text("ANALYZE users, video, interactions"))
+            db.commit()
+        if args.stats:
+            from app.stats import rebuild
+            rebuild(db)
+    timings["post_load_s"] = time.perf_counter() - started
+    catalogue.bump()   # running API workers drop their cached catalogue pages
+
+    args.manifest.parent.mkdir(parents=True, exist_ok=True)
+    args.manifest.write_text(json.dumps({
+        "generated_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "dialect": engine.dialect.name,
+        "users": args.users,
+        "videos": args.videos,
+        "interactions": loaded,
+        "alpha": args.alpha,
+        "days": args.days,
+        "seed": args.seed,
+        "email_format": EMAIL_FORMAT,
+        "password": PASSWORD,
+        "video_id_range": [int(video_ids.min()), int(video_ids.max())],
+        "timings": {k: round(s, 3) for k, s in timings.items()},
+    }, indent=2) + "\n")
+    print(f"manifest: {args.manifest}")
+
+
+if __name__ == "__main__":
+    main()
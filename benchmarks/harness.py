@@ -0,0 +1,345 @@
+"""
+Load-test the real routers against a datagen dataset; save and compare results as JSON.
+
+    python -m benchmarks.datagen --url sqlite:///bench.db
+    python -m benchmarks.harness run --serve sqlite:///bench.db \
+        [--scenarios login,videos,interactions,history] [--concurrency 1,16,64] \
+        [--duration 15] [--warmup 3] [--label baseline] [--out results/x.json]
+    python -m benchmarks.harness compare results/old.json results/new.json [--threshold 0.1]
+
+`run` drives a running API (--url, default http://localhost:8000). With
+--serve DATABASE_URL it instead starts `uvicorn app.main:app` on that
+database for the duration of the run (--workers, --port). Before the
+timed scenarios, --users dataset users log in once and their tokens are
+reused. For every scenario and concurrency level, that many closed-loop
+clients send requests back to back: --warmup seconds that are not
+recorded, then --duration seconds that are. Request parameters come from
+the dataset manifest:
+  * login         POST /login as a random dataset user
+  * videos        GET /videos?limit=20, the first 10 pages (anonymous)
+  * interactions  POST /interactions, Zipf-skewed video ids, any action
+  * history       GET /users/{id}/interactions?limit=50 for the caller
+
+The results hold throughput, p50/p95/p99/max, status counts, and DB
+queries per request (taken from the server's /metrics when it exposes it;
+per-process numbers, so only exact with one worker).
+The git commit and the dataset manifest are recorded too. `compare`
+prints the change for every (scenario, concurrency) pair both files have.
+It exits 1 when the throughput dropped, or p95/p99 rose, by more than
+--threshold.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from .datagen import ACTIONS, DEFAULT_MANIFEST, zipf_weights
+
+RESULTS_DIR = Path(__file__).parent / "results"
+SCENARIOS = ("login", "videos", "interactions", "history")
+PAGE = 20
+
+Request = Tuple[str, str, dict]   # (method, path, httpx keyword arguments)
+
+
+# ======================
+# Dataset and sessions
+# ======================
+
+def jwt_user_id(token: str) -> int:
+    payload = token.split(".")[1]
+    return int(json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))["user_id"])
+
+
+class Workload:
+    """Request generators for each scenario, drawn from the dataset manifest."""
+
+    def __init__(self, manifest: dict, seed: int = 0):
+        self.manifest = manifest
+        self.rng = random.Random(seed)
+        lo, hi = manifest["video_id_range"]
+        self._videos = np.arange(lo, hi + 1)
+        self._video_cdf = np.cumsum(zipf_weights(len(self._videos), manifest["alpha"]))
+        np.random.default_rng(seed).shuffle(self._videos)
+        self.sessions: List[Tuple[int, dict]] = []   # (user id, auth header)
+
+    def email(self) -> str:
+        return self.manifest["email_format"].format(self.rng.randrange(self.manifest["users"]))
+
+    def video_id(self) -> int:
+        i = int(np.searchsorted(self._video_cdf, self.rng.random()))
+        return int(self._videos[min(i, len(self._videos) - 1)])
+
+    def login_form(self) -> dict:
+        return {"data": {"username": self.email(), "password": self.manifest["password"]}}
+
+    async def log_in(self, client: httpx.AsyncClient, n: int) -> None:
+        while len(self.sessions) < n:
+            r = await client.post("/login", **self.login_form())
+            if r.status_code == 503:
+                await asyncio.sleep(float(r.headers.get("Retry-After", "1")))
+                continue
+            r.raise_for_status()
+            token = r.json()["access_token"]
+            self.sessions.append((jwt_user_id(token), {"Authorization": f"Bearer {token}"}))
+
+    def request(self, scenario: str) -> Request:
+        if scenario == "login":
+            return "POST", "/login", self.login_form()
+        if scenario == "videos":
+            return "GET", "/videos", {"params": {"limit": PAGE, "skip": PAGE * self.rng.randrange(10)}}
+        user_id, headers = self.rng.choice(self.sessions)
+        if scenario == "interactions":
+            body = {"video_id": self.video_id(), "action": self.rng.choice(ACTIONS).value}
+            return "POST", "/interactions", {"json": body, "headers": headers}
+        if scenario == "history":
+            return "GET", f"/users/{user_id}/interactions", {"params": {"limit": 50}, "headers": headers}
+        raise ValueError(f"unknown scenario {scenario!r}")
+
+
+# ======================
+# Load generation
+# ======================
+
+async def _client(client: httpx.AsyncClient, make: Callable[[], Request], record_after: float,
+                  deadline: float, latencies: List[float], statuses: Dict[str, int]) -> None:
+    while True:
+        started = time.perf_counter()
+        if started >= deadline:
+            return
+        method, path, kwargs = make()
+        try:
+            status = str((await client.request(method, path, **kwargs)).status_code)
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        if started >= record_after:
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+
+def _summary(latencies: List[float], statuses: Dict[str, int], duration: float) -> dict:
+    ms = np.asarray(latencies) * 1000
+    pct = (lambda q: round(float(np.percentile(ms, q)), 3)) if len(ms) else (lambda q: None)
+    return {
+        "requests": len(ms),
+        "throughput_rps": round(len(ms) / duration, 2),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(float(ms.max()), 3) if len(ms) else None,
+        "errors": sum(n for s, n in statuses.items() if not (s.isdigit() and int(s) < 400)),
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+async def scrape_queries(client: httpx.AsyncClient) -> Dict[str, Tuple[float, float]]:
+    """route -> (DB queries, requests) so far, from GET /metrics; {} when unavailable."""
+    try:
+        r = await client.get("/metrics")
+    except httpx.HTTPError:
+        return {}
+    if r.status_code != 200:
+        return {}
+    out: Dict[str, List[float]] = {}
+    for m in re.finditer(r'^http_request_db_queries_(sum|count)\{route="([^"]*)"\} (\S+)$', r.text, re.M):
+        pair = out.setdefault(m.group(2), [0.0, 0.0])
+        pair[m.group(1) == "count"] = float(m.group(3))
+    return {route: (q, n) for route, (q, n) in out.items()}
+
+
+def queries_per_request(before: dict, after: dict, route: str) -> Optional[float]:
+    q0, n0 = before.get(route, (0.0, 0.0))
+    q1, n1 = after.get(route, (0.0, 0.0))
+    return round((q1 - q0) / (n1 - n0), 3) if n1 > n0 else None
+
+
+ROUTES = {
+    "login": "/login",
+    "videos": "/videos",
+    "interactions": "/interactions",
+    "history": "/users/{user_id}/interactions",
+}
+
+
+async def run_scenario(base_url: str, workload: Workload, scenario: str, concurrency: int,
+                       warmup: float, duration: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        before = await scrape_queries(client)
+        now = time.perf_counter()
+        await asyncio.gather(*(
+            _client(client, lambda: workload.request(scenario), now + warmup,
+                    now + warmup + duration, latencies, statuses)
+            for _ in range(concurrency)
+        ))
+        after = await scrape_queries(client)
+    result = _summary(latencies, statuses, duration)
+    result["db_queries_per_request"] = queries_per_request(before, after, ROUTES[scenario])
+    return result
+
+
+# ======================
+# Server under test
+# ======================
+
+def serve(database_url: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=database_url)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, cwd=Path(__file__).resolve().parent.parent,
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"uvicorn exited with {proc.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/videos?limit=1", timeout=2).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise SystemExit("uvicorn did not come up within 120s")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ======================
+# Commands
+# ======================
+
+def cmd_run(args) -> None:
+    manifest = json.loads(args.dataset.read_text())
+    scenarios = args.scenarios.split(",")
+    levels = [int(c) for c in args.concurrency.split(",")]
+    proc = serve(args.serve, args.port, args.workers) if args.serve else None
+    base_url = f"http://127.0.0.1:{args.port}" if args.serve else args.url
+    workload = Workload(manifest, args.seed)
+
+    results = []
+    try:
+        if any(s in ("interactions", "history") for s in scenarios):
+            async def log_in():
+                async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+                    await workload.log_in(client, args.users)
+            asyncio.run(log_in())
+
+        print(f"{'scenario':<13} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'errors':>7} {'q/req':>6}")
+        for scenario in scenarios:
+            for concurrency in levels:
+                res = asyncio.run(run_scenario(base_url, workload, scenario, concurrency,
+                                               args.warmup, args.duration))
+                results.append({"scenario": scenario, "concurrency": concurrency, **res})
+                qpr = res["db_queries_per_request"]
+                print(f"{scenario:<13} {concurrency:>5} {res['throughput_rps']:>9.1f} "
+                      f"{res['p50_ms'] or 0:>8.2f} {res['p95_ms'] or 0:>8.2f} {res['p99_ms'] or 0:>8.2f} "
+                      f"{res['errors']:>7} {qpr if qpr is not None else '-':>6}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    started = datetime.utcnow()
+    out = args.out or RESULTS_DIR / f"{started:%Y%m%d-%H%M%S}-{args.label or 'run'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({
+        "label": args.label,
+        "created_at": started.isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "target": {"served": bool(args.serve), "url": base_url, "database": manifest["dialect"],
+                   "workers": args.workers if args.serve else None},
+        "config": {"duration_s": args.duration, "warmup_s": args.warmup, "users": args.users,
+                   "seed": args.seed},
+        "dataset": manifest,
+        "results": results,
+    }, indent=2) + "\n")
+    print(f"results: {out}")
+
+
+def _pct_change(old: Optional[float], new: Optional[float]) -> Optional[float]:
+    if old is None or new is None or old == 0:
+        return None
+    return (new - old) / old
+
+
+def cmd_compare(args) -> None:
+    old, new = (json.loads(p.read_text()) for p in (args.old, args.new))
+    if old["dataset"].get("seed") != new["dataset"].get("seed") or \
+            old["dataset"].get("interactions") != new["dataset"].get("interactions"):
+        print("warning: the two runs used different datasets")
+    index = {(r["scenario"], r["concurrency"]): r for r in old["results"]}
+
+    regressions = 0
+    print(f"{old.get('label') or args.old.name} -> {new.get('label') or args.new.name}")
+    print(f"{'scenario':<13} {'conc':>5} {'req/s':>16} {'p95 ms':>18} {'p99 ms':>18}")
+    for r in new["results"]:
+        before = index.get((r["scenario"], r["concurrency"]))
+        if before is None:
+            continue
+        cells, flagged = [], False
+        for key, worse in (("throughput_rps", -1), ("p95_ms", 1), ("p99_ms", 1)):
+            change = _pct_change(before[key], r[key])
+            if change is not None and change * worse > args.threshold:
+                flagged = True
+            cells.append(f"{r[key] or 0:>9.1f} {'' if change is None else f'{change:+.0%}':>6}")
+        regressions += flagged
+        print(f"{r['scenario']:<13} {r['concurrency']:>5} {' '.join(cells)}{'  REGRESSION' if flagged else ''}")
+    if regressions:
+        print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="load-test and write a results file")
+    run.add_argument("--url", default="http://localhost:8000")
+    run.add_argument("--serve", metavar="DATABASE_URL", help="start uvicorn on this database for the run")
+    run.add_argument("--port", type=int, default=8100, help="port for --serve")
+    run.add_argument("--workers", type=int, default=1, help="uvicorn workers for --serve")
+    run.add_argument("--dataset", type=Path, default=DEFAULT_MANIFEST, help="datagen manifest")
+    run.add_argument("--scenarios", default=",".join(SCENARIOS))
+    run.add_argument("--concurrency", default="1,16,64", help="comma-separated levels")
+    run.add_argument("--duration", type=float, default=15.0)
+    run.add_argument("--warmup", type=float, default=3.0)
+    run.add_argument("--users", type=int, default=32, help="logged-in users for authenticated scenarios")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--label")
+    run.add_argument("--out", type=Path)
+    run.set_defaults(fn=cmd_run)
+
+    compare = sub.add_parser("compare", help="diff two results files")
+    compare.add_argument("old", type=Path)
+    compare.add_argument("new", type=Path)
+    compare.add_argument("--threshold", type=float, default=0.10)
+    compare.set_defaults(fn=cmd_compare)
+
+    args = parser.parse_args()
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
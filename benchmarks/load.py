@@ -0,0 +1,84 @@
+"""
+Closed-loop load test of GET /videos and POST /interactions.
+
+Start the API twice (sync and async DB mode) and point the script at both:
+
+    RECONOVA_ASYNC_DB=0 uvicorn app.main:app --port 8000 --workers 1
+    RECONOVA_ASYNC_DB=1 uvicorn app.main:app --port 8001 --workers 1
+    python -m benchmarks.load --url sync=http://localhost:8000 \
+        --url async=http://localhost:8001 --token <JWT> --concurrency 256 --duration 20
+
+Each of `--concurrency` workers sends requests back to back for `--duration`
+seconds; the script prints requests/sec and p50/p99 latency per route.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+import numpy as np
+
+
+async def _worker(client, method, path, make_body, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            r = await client.request(method, path, json=make_body() if make_body else None)
+            ok = r.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        latencies.append(time.perf_counter() - t0)
+        if not ok:
+            errors[0] += 1
+
+
+async def run_route(base_url, token, method, path, make_body, concurrency, duration):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies, errors = [], [0]
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits,
+                                 timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            _worker(client, method, path, make_body, deadline, latencies, errors)
+            for _ in range(concurrency)
+        ))
+    lat = np.asarray(latencies) * 1000
+    return {
+        "rps": len(lat) / duration,
+        "p50_ms": float(np.percentile(lat, 50)) if len(lat) else float("nan"),
+        "p99_ms": float(np.percentile(lat, 99)) if len(lat) else float("nan"),
+        "errors": errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", action="append", required=True,
+                        help="label=base_url, repeatable (e.g. sync=http://localhost:8000)")
+    parser.add_argument("--token", help="bearer token for POST /interactions")
+    parser.add_argument("--concurrency", type=int, default=128)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--max-video-id", type=int, default=1000)
+    args = parser.parse_args()
+
+    routes = [("GET /videos", "GET", "/videos?limit=20", None)]
+    if args.token:
+        routes.append((
+            "POST /interactions", "POST", "/interactions",
+            lambda: {"video_id": random.randint(1, args.max_video_id), "action": "view"},
+        ))
+
+    print(f"{'target':<10} {'route':<20} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for spec in args.url:
+        label, _, base_url = spec.partition("=")
+        for name, method, path, body in routes:
+            res = asyncio.run(run_route(base_url, args.token, method, path, body,
+                                        args.concurrency, args.duration))
+            print(f"{label:<10} {name:<20} {res['rps']:>9.0f} {res['p50_ms']:>9.1f} "
+                  f"{res['p99_ms']:>9.1f} {res['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+GET /videos latency before and during a login storm.
+
+    uvicorn app.main:app --port 8000 --workers 1
+    python -m benchmarks.login_storm --url new=http://localhost:8000 \
+        [--url old=http://localhost:8001] [--logins 64] [--readers 16] [--duration 15]
+
+Against each target the script registers a storm user (if missing), then
+runs `--readers` clients looping on GET /videos for `--duration` seconds
+alone ("baseline") and again while `--logins` clients hammer POST /login
+("storm"). With bcrypt on the request threads, /videos p99 grows with the
+storm; with the password pool it should stay flat while excess logins are
+shed with 503 + Retry-After.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+STORM_EMAIL = "storm@example.com"
+STORM_PASSWORD = "storm-password"
+
+
+async def _reader(client, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            ok = (await client.get("/videos?limit=20")).status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        latencies.append(time.perf_counter() - t0)
+        if not ok:
+            errors[0] += 1
+
+
+async def _login(client, deadline, statuses):
+    form = {"username": STORM_EMAIL, "password": STORM_PASSWORD}
+    while time.perf_counter() < deadline:
+        try:
+            r = await client.post("/login", data=form)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+            if r.status_code == 503:
+                await asyncio.sleep(float(r.headers.get("Retry-After", "1")))
+        except httpx.HTTPError:
+            statuses["error"] = statuses.get("error", 0) + 1
+
+
+async def run_phase(base_url, readers, logins, duration):
+    limits = httpx.Limits(max_connections=readers + logins + 1)
+    latencies, errors, statuses = [], [0], {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await client.post("/users", json={"email": STORM_EMAIL, "password": STORM_PASSWORD})
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *(_reader(client, deadline, latencies, errors) for _ in range(readers)),
+            *(_login(client, deadline, statuses) for _ in range(logins)),
+        )
+    lat = np.asarray(latencies) * 1000
+    return {
+        "rps": len(lat) / duration,
+        "p50_ms": float(np.percentile(lat, 50)) if len(lat) else float("nan"),
+        "p99_ms": float(np.percentile(lat, 99)) if len(lat) else float("nan"),
+        "errors": errors[0],
+        "logins": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", action="append", required=True,
+                        help="label=base_url, repeatable (e.g. new=http://localhost:8000)")
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15.0)
+    args = parser.parse_args()
+
+    print(f"{'target':<8} {'phase':<9} {'videos/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}  logins")
+    for spec in args.url:
+        label, _, base_url = spec.partition("=")
+        for phase, logins in (("baseline", 0), ("storm", args.logins)):
+            res = asyncio.run(run_phase(base_url, args.readers, logins, args.duration))
+            print(f"{label:<8} {phase:<9} {res['rps']:>9.0f} {res['p50_ms']:>8.1f} "
+                  f"{res['p99_ms']:>8.1f} {res['errors']:>7}  {res['logins'] or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Bearer-token snapshots: cache lifetime and invalidation after user changes.
+
+    python -m pytest tests
+"""
+import time
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app import deps
+from app.cache import auth_cache
+from app.models import User
+from app.oauth2 import ALGORITHM, SECRET_KEY
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(auth_cache, "_clock", clock)
+    auth_cache.clear()
+    yield clock
+    auth_cache.clear()
+
+
+@pytest.fixture
+def epoch(tmp_path, monkeypatch):
+    monkeypatch.setattr(deps, "auth_epoch", deps.AuthEpoch(tmp_path / ".auth_epoch"))
+    monkeypatch.setattr(deps, "_user_changed_at", {})
+    return deps.auth_epoch
+
+
+@pytest.fixture
+def db(epoch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def make_user(db: Session, is_admin: bool) -> User:
+    user = User(email="a@example.com", hashed_password="x", is_admin=is_admin)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def make_token(user: User, expires_in: float, issued_ago: float = 0) -> str:
+    now = time.time()
+    claims = {"user_id": user.id, "is_admin": user.is_admin,
+              "iat": int(now - issued_ago), "exp": int(now + expires_in)}
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def authenticate(token: str, db: Session) -> deps.CurrentUser:
+    return deps.get_current_user(token=token, session=db)
+
+
+def test_admin_snapshot_does_not_outlive_the_token(db, clock):
+    admin = make_user(db, is_admin=True)
+    expires_in = auth_cache.ttl / 4
+    token = make_token(admin, expires_in)
+
+    current = authenticate(token, db)
+    assert current.from_claims
+    confirmed = deps.require_admin(token=token, current=current, session=db)
+    assert confirmed.is_admin and not confirmed.from_claims
+
+    clock.now += expires_in + 1   # token expired, AUTH_CACHE_TTL not yet over
+    assert deps.cached_user(token) is None
+
+
+def test_admin_flag_change_drops_cached_snapshots(db, clock, epoch):
+    admin = make_user(db, is_admin=True)
+    token = make_token(admin, expires_in=600, issued_ago=5)
+    current = deps.require_admin(token=token, current=authenticate(token, db), session=db)
+    assert deps.cached_user(token) == current
+
+    admin.is_admin = False
+    db.add(admin)
+    db.flush()
+    assert deps.cached_user(token) is not None, "invalidated before commit"
+    db.commit()
+
+    assert epoch.current() > 0
+    assert deps.cached_user(token) is None
+    with pytest.raises(HTTPException) as exc:
+        deps.require_admin(token=token, current=authenticate(token, db), session=db)
+    assert exc.value.status_code == 403
+
+
+def test_rolled_back_change_keeps_snapshots(db, clock, epoch):
+    admin = make_user(db, is_admin=True)
+    token = make_token(admin, expires_in=600)
+    authenticate(token, db)
+
+    admin.is_admin = False
+    db.add(admin)
+    db.flush()
+    db.rollback()
+
+    assert epoch.current() == 0
+    assert deps.cached_user(token) is not None
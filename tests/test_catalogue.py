@@ -0,0 +1,98 @@
+"""
+Catalogue ETags, 304s and the page cache for GET /videos[/{id}].
+
+    python -m pytest tests
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app import catalogue, crud
+from app.cache import catalogue_cache
+from app.database import get_read_session, get_session
+from app.models import Video
+from app.routers import videos
+from app.schemas import VideoCreate
+
+
+def memory_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def sessions(engine):
+    def session():
+        with Session(engine) as db:
+            yield db
+    return session
+
+
+@pytest.fixture
+def primary():
+    return memory_engine()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, primary):
+    monkeypatch.setattr(catalogue, "catalogue", catalogue.CatalogueVersion(tmp_path / "catalogue.version"))
+    catalogue_cache.clear()
+    replica = memory_engine()   # a replica that has not caught up with anything yet
+    app = FastAPI()
+    app.include_router(videos.router)
+    app.dependency_overrides[get_session] = sessions(primary)
+    app.dependency_overrides[get_read_session] = sessions(replica)
+    yield TestClient(app)
+    catalogue_cache.clear()
+
+
+def add_video(engine, pixabay_id: int) -> None:
+    with Session(engine) as db:
+        db.add(Video(pixabay_id=pixabay_id, title=f"v{pixabay_id}",
+                     source_url=f"/media/clips/{pixabay_id}.mp4"))
+        db.commit()
+    catalogue.catalogue.bump()
+
+
+def test_matching_if_none_match_gets_304(client, primary):
+    add_video(primary, 1)
+    first = client.get("/videos")
+    etag = first.headers["ETag"]
+
+    again = client.get("/videos", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert client.get("/videos", headers={"If-None-Match": f'W/{etag}'}).status_code == 304
+
+
+def test_catalogue_change_changes_the_etag(client, primary):
+    add_video(primary, 1)
+    etag = client.get("/videos").headers["ETag"]
+
+    add_video(primary, 2)
+    resp = client.get("/videos", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+    assert [v["pixabay_id"] for v in resp.json()] == [2, 1]
+
+
+def test_cached_pages_are_not_rendered_from_a_lagging_replica(client, primary):
+    add_video(primary, 1)
+
+    assert [v["pixabay_id"] for v in client.get("/videos").json()] == [1]
+    video_id = client.get("/videos").json()[0]["id"]
+    assert client.get(f"/videos/{video_id}").status_code == 200
+
+
+def test_empty_bulk_upsert_keeps_the_version(primary, tmp_path, monkeypatch):
+    version = catalogue.CatalogueVersion(tmp_path / "catalogue.version")
+    monkeypatch.setattr(crud, "catalogue", version)
+    before = version.current()
+    with Session(primary) as db:
+        assert crud.bulk_upsert_videos(db, []) == []
+        assert version.current() == before
+        crud.bulk_upsert_videos(db, [VideoCreate(pixabay_id=1, title="t", source_url="/media/clips/1.mp4")])
+    assert version.current() != before
@@ -0,0 +1,80 @@
+"""
+Write-behind interaction ingestion: id validation, flush, and stop.
+
+    python -m pytest tests
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app import ingest
+from app.models import ActionEnum, Interaction, User, Video
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(User(email="u@example.com", hashed_password="x"))
+        db.add_all([Video(pixabay_id=i, title="t", source_url=f"/media/clips/{i}.mp4")
+                    for i in (1, 2, 3)])
+        db.commit()
+    recorded = []
+    monkeypatch.setattr(ingest.trending, "record_many", recorded.extend)
+    engine.recorded = recorded
+    return engine
+
+
+def count_queries(engine) -> list:
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_unknown_ids_are_resolved_in_one_query(engine):
+    ids = ingest.VideoIdSet()
+    ids.add(1)
+    statements = count_queries(engine)
+    with Session(engine) as db:
+        assert ids.existing(db, [1, 2, 3, *range(100, 1100)]) == {1, 2, 3}
+        assert len(statements) == 1
+        assert ids.existing(db, [2, 3]) == {2, 3}
+        assert len(statements) == 1   # remembered
+        assert not ids.exists(db, 100)
+
+
+def test_flush_inserts_each_event_once(engine):
+    writer = ingest.InteractionWriter()
+    writer.start(engine)
+    try:
+        assert writer.offer([(1, 1, ActionEnum.like), (1, 1, ActionEnum.like), (1, 2, ActionEnum.view)])
+    finally:
+        writer.stop()
+    assert writer.flush([{"user_id": 1, "video_id": 1, "action": ActionEnum.like,
+                          "timestamp": datetime.utcnow()}]) == 0
+
+    with Session(engine) as db:
+        rows = db.exec(select(Interaction.video_id, Interaction.action)).all()
+    assert sorted(rows) == [(1, ActionEnum.like), (2, ActionEnum.view)]
+    assert sorted(v for _, v, _ in engine.recorded) == [1, 2]   # trending counts inserted rows only
+    assert writer.flushed == 2
+
+
+def test_offer_after_stop_is_written_synchronously(engine):
+    writer = ingest.InteractionWriter(flush_interval=60)
+    writer.start(engine)
+    writer.stop()
+    writer._stopping = True   # as during shutdown, before the process exits
+
+    assert writer.offer([(1, 3, ActionEnum.complete)])
+    with Session(engine) as db:
+        assert db.exec(select(Interaction.video_id)).all() == [3]
+
+
+def test_offer_before_start_is_refused(engine):
+    assert not ingest.InteractionWriter().offer([(1, 1, ActionEnum.view)])
@@ -0,0 +1,78 @@
+"""
+/media responses: byte ranges, If-Range and conditional GET.
+
+    python -m pytest tests
+"""
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.media import RangeNotSatisfiable, media_response, parse_range, stat_file
+
+BODY = bytes(range(256)) * 4   # 1 KiB
+
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / "clip.mp4").write_bytes(BODY)
+    (tmp_path / "empty.mp4").write_bytes(b"")
+    app = FastAPI()
+
+    @app.get("/media/{name}")
+    def serve(name: str, request: Request):
+        f = stat_file(tmp_path, name, immutable=False)
+        return media_response(f, request.headers, request.method, x_accel_prefix=None)
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 1023)),
+    ("bytes=-24", (1000, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("bytes=9-3", None),            # invalid: whole file
+    ("bytes=0-1,5-9", None),        # multi-range: whole file
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, len(BODY)) == expected
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1024-", 1024),
+    ("bytes=-0", 1024),
+    ("bytes=-5", 0),
+    ("bytes=0-", 0),
+])
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, size)
+
+
+def test_range_request_gets_206(client):
+    resp = client.get("/media/clip.mp4", headers={"Range": "bytes=10-19"})
+    assert resp.status_code == 206
+    assert resp.headers["content-range"] == f"bytes 10-19/{len(BODY)}"
+    assert resp.content == BODY[10:20]
+
+
+def test_suffix_range_of_an_empty_file_is_416(client):
+    resp = client.get("/media/empty.mp4", headers={"Range": "bytes=-5"})
+    assert resp.status_code == 416
+    assert resp.headers["content-range"] == "bytes */0"
+
+
+def test_stale_if_range_gets_the_whole_file(client):
+    resp = client.get("/media/clip.mp4", headers={"Range": "bytes=10-19", "If-Range": '"stale"'})
+    assert resp.status_code == 200
+    assert resp.content == BODY
+
+
+def test_if_none_match_gets_304(client):
+    etag = client.get("/media/clip.mp4").headers["etag"]
+    resp = client.get("/media/clip.mp4", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
@@ -0,0 +1,67 @@
+"""
+Paged list endpoints: limit bounds and keyset cursors.
+
+    python -m pytest tests
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app import catalogue
+from app.database import get_read_session, get_session
+from app.models import Video
+from app.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from app.routers import videos
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalogue, "catalogue", catalogue.CatalogueVersion(tmp_path / "catalogue.version"))
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    with Session(engine) as db:
+        db.add_all([
+            Video(pixabay_id=i, title=f"v{i}", source_url=f"/media/clips/{i}.mp4",
+                  uploaded_at=start + timedelta(minutes=i))
+            for i in range(1, 6)
+        ])
+        db.commit()
+
+    def session():
+        with Session(engine) as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(videos.router)
+    app.dependency_overrides[get_session] = session
+    app.dependency_overrides[get_read_session] = session
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("limit", [0, -1, MAX_PAGE_SIZE + 1])
+def test_out_of_range_limit_is_rejected(client, limit):
+    assert client.get("/videos", params={"limit": limit}).status_code == 422
+
+
+def test_negative_skip_is_rejected(client):
+    assert client.get("/videos", params={"skip": -1}).status_code == 422
+
+
+def test_cursor_walks_every_video_once(client):
+    seen, params = [], {"limit": 2}
+    while True:
+        resp = client.get("/videos", params=params)
+        assert resp.status_code == 200
+        seen += [v["pixabay_id"] for v in resp.json()]
+        cursor = resp.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+        params = {"limit": 2, "cursor": cursor}
+
+    assert seen == [5, 4, 3, 2, 1]
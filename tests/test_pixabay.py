@@ -0,0 +1,177 @@
+"""
+Resumable media downloads and verify-media, against a local HTTP server.
+
+    python -m pytest tests
+"""
+import hashlib
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app import pixabay
+from app.models import Video
+
+BODY = bytes(range(256)) * 1024   # 256 KiB
+
+
+class MediaServer(ThreadingHTTPServer):
+    """
+    Serves `files` (path -> bytes) with Range support. `truncate` maps a path
+    to how many more responses are cut short: the full Content-Length is
+    sent, then the connection closes halfway through the body. `lie` adds
+    that many bytes to Content-Length on every response.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), MediaHandler)
+        self.files = {}
+        self.truncate = {}
+        self.lie = 0
+        self.requests = []   # (path, Range header or None)
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get("Range")))
+        body = server.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        m = re.match(r"bytes=(\d+)-$", self.headers.get("Range") or "")
+        start = int(m.group(1)) if m else 0
+        if start >= len(body) and m:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(body)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        chunk = body[start:]
+        self.send_response(206 if m else 200)
+        if m:
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        self.send_header("Content-Length", str(len(chunk) + server.lie))
+        self.end_headers()
+        if server.truncate.get(self.path, 0) > 0:
+            server.truncate[self.path] -= 1
+            chunk = chunk[:len(chunk) // 2]
+        self.wfile.write(chunk)
+        self.close_connection = True
+
+
+@pytest.fixture
+def server():
+    srv = MediaServer()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    monkeypatch.setattr(pixabay, "THUMBS_DIR", tmp_path / "thumbs")
+    monkeypatch.setattr(pixabay, "CLIPS_DIR", tmp_path / "clips")
+    monkeypatch.setattr(pixabay.time, "sleep", lambda s: None)   # retry back-off
+    pixabay.ensure_dirs()
+    return tmp_path
+
+
+@pytest.fixture
+def catalogue(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(pixabay, "engine", engine)
+    return engine
+
+
+def test_truncated_download_resumes_with_range(server, media):
+    server.files["/clip.mp4"] = BODY
+    server.truncate["/clip.mp4"] = 1
+    dest = pixabay.CLIPS_DIR / "1.mp4"
+
+    fetched = pixabay._download(server.url("/clip.mp4"), dest)
+
+    assert dest.read_bytes() == BODY
+    assert fetched == len(BODY)
+    assert [r for _, r in server.requests] == [None, f"bytes={len(BODY) // 2}-"]
+    assert not dest.with_name("1.mp4.part").exists()
+    meta = pixabay.read_meta(dest)
+    assert meta["size"] == len(BODY)
+    assert meta["sha256"] == hashlib.sha256(BODY).hexdigest()
+    assert pixabay.verify_file(dest)
+
+
+def test_stale_partial_file_starts_over_after_416(server, media):
+    server.files["/thumb.jpg"] = BODY[:1000]
+    dest = pixabay.THUMBS_DIR / "1.jpg"
+    dest.with_name("1.jpg.part").write_bytes(b"x" * 5000)   # longer than the file
+
+    pixabay._download(server.url("/thumb.jpg"), dest)
+
+    assert dest.read_bytes() == BODY[:1000]
+    assert [r for _, r in server.requests] == ["bytes=5000-", None]
+
+
+def test_content_length_mismatch_is_rejected(server, media):
+    server.files["/clip.mp4"] = BODY
+    server.lie = 100   # Content-Length promises more than is ever sent
+    dest = pixabay.CLIPS_DIR / "1.mp4"
+
+    with pytest.raises(RuntimeError):
+        pixabay._download(server.url("/clip.mp4"), dest, retries=3)
+
+    assert not dest.exists()
+    assert "sha256" not in pixabay.read_meta(dest)
+    assert len(server.requests) == 3
+
+
+def test_verify_media_refetches_corrupted_file(server, media, catalogue):
+    server.files["/clip.mp4"] = BODY
+    server.files["/thumb.jpg"] = BODY[:1000]
+    with Session(catalogue) as db:
+        db.add(Video(pixabay_id=7, title="t", source_url="/media/clips/7.mp4"))
+        db.commit()
+    clip, thumb = pixabay.CLIPS_DIR / "7.mp4", pixabay.THUMBS_DIR / "7.jpg"
+    pixabay._download(server.url("/clip.mp4"), clip)
+    pixabay._download(server.url("/thumb.jpg"), thumb)
+
+    corrupted = bytearray(BODY)
+    corrupted[1000] ^= 0xFF
+    clip.write_bytes(bytes(corrupted))
+    server.requests.clear()
+
+    stats = pixabay.verify_media(workers=2)
+
+    assert (stats.ok, stats.repaired, stats.failed) == (1, 1, 0)
+    assert clip.read_bytes() == BODY
+    assert server.requests == [("/clip.mp4", None)]
+
+
+def test_verify_media_counts_missing_thumbnail_as_failed(server, media, catalogue, monkeypatch):
+    # no sidecars: both files are looked up on Pixabay, and the hit has no thumbnail url
+    server.files["/clip.mp4"] = BODY
+    with Session(catalogue) as db:
+        db.add(Video(pixabay_id=8, title="t", source_url="/media/clips/8.mp4"))
+        db.commit()
+    hit = {"id": 8, "tags": "t", "videos": {"tiny": {"url": server.url("/clip.mp4")}}}
+    monkeypatch.setattr(pixabay, "fetch_pixabay_hit", lambda px_id: hit)
+
+    stats = pixabay.verify_media(workers=2)
+
+    assert (pixabay.CLIPS_DIR / "8.mp4").read_bytes() == BODY
+    assert not (pixabay.THUMBS_DIR / "8.jpg").exists()
+    assert (stats.ok, stats.repaired, stats.failed) == (0, 0, 2)
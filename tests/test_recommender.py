@@ -0,0 +1,182 @@
+"""
+Item-item model: scoring, incremental updates, the consume() watermark and
+the candidate pipeline (fan-out, budgets, blending, seen filter).
+
+    python -m pytest tests
+"""
+import threading
+
+import numpy as np
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app import recommender
+from app.cache import seen_cache
+from app.models import ActionEnum, Interaction, User, Video
+
+# (user, video, action): users 1 and 2 share taste, user 3 only saw video 1
+EVENTS = [
+    (1, 1, ActionEnum.like), (1, 2, ActionEnum.complete),
+    (2, 1, ActionEnum.like), (2, 2, ActionEnum.view), (2, 3, ActionEnum.complete),
+    (3, 1, ActionEnum.view),
+]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([User(email=f"u{i}@example.com", hashed_password="x") for i in (1, 2, 3)])
+        session.add_all([Video(pixabay_id=i, title="t", source_url=f"/media/clips/{i}.mp4")
+                         for i in (1, 2, 3)])
+        session.commit()
+        yield session
+
+
+def add_events(db: Session, events, first_id: int = 1) -> None:
+    for i, (user_id, video_id, action) in enumerate(events, start=first_id):
+        db.add(Interaction(id=i, user_id=user_id, video_id=video_id, action=action))
+    db.commit()
+
+
+def test_recommends_unseen_videos_by_neighbour_score(db):
+    add_events(db, EVENTS)
+    model = recommender.build_model(db)
+
+    assert model.recommend(3, k=5) == [2, 3]
+    assert 1 not in model.recommend(1, k=5)
+    assert model.recommend(99) == []
+
+
+def test_incremental_state_matches_a_full_build(db):
+    add_events(db, EVENTS[:3])
+    state = recommender.IncrementalState()
+    assert state.consume(db) == 3
+    add_events(db, EVENTS[3:], first_id=4)
+    assert state.consume(db) == 3
+
+    full = recommender.build_model(db)
+    incremental = state.to_model()
+    for user_id in (1, 2, 3):
+        np.testing.assert_allclose(
+            np.sort(incremental.scores(user_id)), np.sort(full.scores(user_id)), rtol=1e-5
+        )
+        assert incremental.recommend(user_id) == full.recommend(user_id)
+
+
+def test_consume_stops_at_the_committed_bound(db, monkeypatch):
+    # id 2 was allocated before id 3 but commits after it
+    add_events(db, [EVENTS[0]], first_id=1)
+    add_events(db, [EVENTS[2]], first_id=3)
+    monkeypatch.setattr(recommender, "committed_interaction_id", lambda db: 1)
+    state = recommender.IncrementalState()
+    assert state.consume(db) == 1
+    assert state.watermark == 1
+
+    add_events(db, [EVENTS[1]], first_id=2)
+    monkeypatch.setattr(recommender, "committed_interaction_id", lambda db: 3)
+    assert state.consume(db) == 2
+    assert state.watermark == 3
+    assert state.R.sum() == pytest.approx(3.0 + 5.0 + 3.0)
+
+
+def test_save_replaces_the_model_file_atomically(db, tmp_path):
+    add_events(db, EVENTS)
+    model = recommender.build_model(db)
+    path = tmp_path / "itemitem.npz"
+    path.write_bytes(b"previous model")
+    inode = path.stat().st_ino
+
+    model.save(path)
+
+    assert path.stat().st_ino != inode   # a new file renamed over the old one
+    assert not path.with_name(path.name + ".tmp").exists()
+    loaded = recommender.ItemItemModel.load(path)
+    assert loaded.version == model.version
+    assert loaded.recommend(3) == model.recommend(3)
+
+
+def test_workers_reload_a_model_published_elsewhere(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(recommender, "_model", None)
+    monkeypatch.setattr(recommender, "_model_path", None)
+    monkeypatch.setattr(recommender, "_model_file", None)
+    path = tmp_path / "itemitem.npz"
+    assert recommender.load_model(path) is None
+
+    add_events(db, EVENTS)
+    first = recommender.build_model(db)
+    first.save(path)   # e.g. `python -m app.recommender` or another worker's rebuild
+    monkeypatch.setattr(recommender, "_checked_at", float("-inf"))
+    assert recommender.get_model().version == first.version
+
+    second = recommender.build_model(db)
+    second.save(path)
+    assert recommender.get_model().version == first.version   # not due for a check yet
+    monkeypatch.setattr(recommender, "_checked_at", float("-inf"))
+    assert recommender.model_version() == second.version
+
+    third = recommender.build_model(db)
+    recommender.publish_model(third, path)
+    assert recommender.get_model() is third
+    monkeypatch.setattr(recommender, "_checked_at", float("-inf"))
+    assert recommender.get_model() is third   # its own file is not loaded again
+
+
+def stage(name: str, weight: float, fn, budget: float = 1.0) -> recommender.Stage:
+    return recommender.Stage(name, fn, weight, budget)
+
+
+def test_blend_weights_sources_and_drops_seen_videos(monkeypatch):
+    monkeypatch.setattr(recommender, "STAGES", {
+        "a": stage("a", 1.0, None), "b": stage("b", 0.5, None),
+    })
+    candidates = {
+        "a": (np.array([10, 11, 12]), np.array([4.0, 2.0, 1.0], dtype=np.float32)),
+        "b": (np.array([12, 13]), np.array([9.0, 9.0], dtype=np.float32)),
+        "gone": (np.array([14]), np.array([1.0], dtype=np.float32)),   # unregistered source
+    }
+    # 10: 1.0, 11: 0.5, 12: 0.25 + 0.5, 13: 0.5
+    assert recommender.blend(candidates, exclude=[], k=10) == [10, 12, 11, 13]
+    assert recommender.blend(candidates, exclude={10, 13}, k=2) == [12, 11]
+    assert recommender.blend({}, exclude=[], k=5) == []
+
+
+def test_slow_and_failing_stages_are_left_out(monkeypatch):
+    release = threading.Event()
+
+    def slow(ctx, n):
+        release.wait(5)
+        return recommender._ranked([1])
+
+    def broken(ctx, n):
+        raise RuntimeError("source down")
+
+    monkeypatch.setattr(recommender, "STAGES", {
+        "fast": stage("fast", 1.0, lambda ctx, n: recommender._ranked([7, 8][:n])),
+        "slow": stage("slow", 1.0, slow, budget=0.05),
+        "broken": stage("broken", 1.0, broken),
+    })
+    before = recommender.STAGE_TIMEOUTS._values.get(("slow",), 0.0)
+    try:
+        out = recommender.gather_candidates(recommender.UserContext(1, ()), n=2, budget=1.0)
+    finally:
+        release.set()
+    assert set(out) == {"fast"}
+    assert out["fast"][0].tolist() == [7, 8]
+    assert recommender.STAGE_TIMEOUTS._values[("slow",)] == before + 1
+
+
+def test_seen_set_follows_feedback_without_sharing_state(db):
+    seen_cache.clear()
+    add_events(db, EVENTS)
+    recommender.record_feedback(3, [(2, ActionEnum.like), (3, ActionEnum.view)])
+    seen = recommender.seen_videos(db, 3)
+    assert seen == {2}   # user 3 only viewed video 1; the pending like counts
+
+    recommender.record_feedback(3, [(3, ActionEnum.complete)])
+    assert seen == {2}   # the returned set is a snapshot
+    assert recommender.seen_videos(db, 3) == {2, 3}
+    seen_cache.clear()
@@ -0,0 +1,61 @@
+"""
+video_stats incremental refresh: the watermark never passes an id still in flight.
+
+    python -m pytest tests
+"""
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app import stats
+from app.models import ActionEnum, Interaction, StatsWatermark, User, Video, VideoStats
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([User(email=f"u{i}@example.com", hashed_password="x") for i in (1, 2)])
+        session.add(Video(pixabay_id=1, title="t", source_url="/media/clips/1.mp4"))
+        session.commit()
+        yield session
+
+
+def add(db: Session, id: int, user_id: int, action: ActionEnum) -> None:
+    db.add(Interaction(id=id, user_id=user_id, video_id=1, action=action))
+    db.commit()
+
+
+def counts(db: Session) -> tuple:
+    row = db.exec(select(VideoStats)).one()
+    return row.views, row.likes, row.unique_viewers
+
+
+def test_late_commit_below_the_watermark_is_counted(db, monkeypatch):
+    # ids 1 and 3 are visible; 2 was allocated first but commits last, so
+    # the committed bound (Postgres: max(id) under the table lock) is 1
+    add(db, 1, 1, ActionEnum.view)
+    add(db, 3, 2, ActionEnum.view)
+    monkeypatch.setattr(stats, "committed_interaction_id", lambda db: 1)
+    assert stats.refresh(db)["watermark"] == 1
+
+    add(db, 2, 1, ActionEnum.like)
+    monkeypatch.setattr(stats, "committed_interaction_id", lambda db: 3)
+    assert stats.refresh(db)["watermark"] == 3
+
+    assert counts(db) == (2, 1, 2)
+    stats.rebuild(db)
+    assert counts(db) == (2, 1, 2)
+
+
+def test_sqlite_bound_is_the_newest_id(db):
+    add(db, 1, 1, ActionEnum.view)
+    add(db, 2, 2, ActionEnum.like)
+
+    assert stats.refresh(db, batch=1)["watermark"] == 1
+    assert stats.refresh(db, batch=1)["watermark"] == 2
+    assert stats.refresh(db)["videos"] == 0
+    assert db.exec(select(StatsWatermark.last_id)).one() == 2
+    assert counts(db) == (1, 1, 2)